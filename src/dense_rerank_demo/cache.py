@@ -0,0 +1,196 @@
+
+"""LRU + TTL query cache for query embeddings, dense recall and rerank results.
+
+Entries that depend on collection contents carry the collection's *generation*, a token that
+ingest rewrites (``bump_generation``) whenever the collection is rebuilt or changed, so stale
+results simply stop matching. The generation lives in ``CACHE_DIR``, so invalidation is
+automatic for processes that share that directory with the ingest.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib, json, os, pickle, sqlite3, threading, time, uuid
+from .config import (CACHE_ENABLED, CACHE_SIZE, CACHE_TTL, CACHE_DIR, CACHE_DISK, CACHE_DISK_SIZE,
+                     COLLECTION, EMB_MODEL, TOPK_RECALL)
+from .logging import get_logger
+logger=get_logger(__name__)
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.split())
+
+def _generation_path(collection: str) -> str:
+    return os.path.join(CACHE_DIR, f"generation_{collection}")
+
+def bump_generation(collection: str = COLLECTION) -> str:
+    """Mark ``collection`` as changed; cached recall/rerank results for it no longer match."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    gen=uuid.uuid4().hex; path=_generation_path(collection); tmp=path+".tmp"
+    with open(tmp,"w") as f: f.write(gen)
+    os.replace(tmp, path)
+    return gen
+
+def collection_generation(collection: str = COLLECTION) -> str:
+    try:
+        with open(_generation_path(collection)) as f: return f.read().strip()
+    except OSError:
+        return ""
+
+class _DiskStore:
+    """sqlite-backed second level; values are pickled, eviction is least-recently-used by access time."""
+    def __init__(self, path: str, maxsize: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.maxsize=maxsize; self.lock=threading.Lock()
+        self.db=sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL, atime REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS cache_atime ON cache(atime)")
+    def get(self, key: str) -> Any:
+        now=time.time()
+        with self.lock:
+            row=self.db.execute("SELECT value, expires FROM cache WHERE key=?", (key,)).fetchone()
+            if row is None: return None
+            if row[1]<now:
+                self.db.execute("DELETE FROM cache WHERE key=?", (key,)); return None
+            self.db.execute("UPDATE cache SET atime=? WHERE key=?", (now, key))
+        return pickle.loads(row[0])
+    def put(self, key: str, value: Any, expires: float):
+        blob=pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?)", (key, blob, expires, time.time()))
+            n=self.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if n>self.maxsize:
+                self.db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY atime LIMIT ?)", (n-self.maxsize,))
+    def clear(self):
+        with self.lock: self.db.execute("DELETE FROM cache")
+    def __len__(self):
+        with self.lock: return self.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+class QueryCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL, disk_path: Optional[str] = None,
+                 disk_size: int = CACHE_DISK_SIZE):
+        self.maxsize=maxsize; self.ttl=ttl
+        self._mem: "OrderedDict[str, Tuple[float, Any]]"=OrderedDict()
+        self._lock=threading.Lock()
+        self._disk=_DiskStore(disk_path, disk_size) if disk_path else None
+        self.hits=self.misses=self.disk_hits=0
+    def key(self, *parts: Any, collection: Optional[str] = None) -> str:
+        """Stable key for ``parts``; pass ``collection`` for entries that depend on its contents."""
+        gen=collection_generation(collection) if collection else None
+        raw=json.dumps([collection, gen, *parts], default=str, separators=(",",":"))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    def get(self, key: str) -> Any:
+        now=time.time()
+        with self._lock:
+            e=self._mem.get(key)
+            if e is not None and e[0]<now: del self._mem[key]; e=None
+            if e is not None:
+                self._mem.move_to_end(key); self.hits+=1; return e[1]
+        v=self._disk.get(key) if self._disk else None
+        with self._lock:
+            if v is None: self.misses+=1; return None
+            self.hits+=1; self.disk_hits+=1
+            self._put_mem(key, v, now+self.ttl)
+        return v
+    def _put_mem(self, key: str, value: Any, expires: float):
+        self._mem[key]=(expires, value); self._mem.move_to_end(key)
+        while len(self._mem)>self.maxsize: self._mem.popitem(last=False)
+    def put(self, key: str, value: Any):
+        expires=time.time()+self.ttl
+        with self._lock: self._put_mem(key, value, expires)
+        if self._disk: self._disk.put(key, value, expires)
+    def get_or_compute(self, key: str, fn: Callable[[], Any]) -> Any:
+        v=self.get(key)
+        if v is None:
+            v=fn(); self.put(key, v)
+        return v
+    def clear(self):
+        with self._lock: self._mem.clear()
+        if self._disk: self._disk.clear()
+    def stats(self) -> Dict[str, Any]:
+        total=self.hits+self.misses
+        return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                "hit_rate": (self.hits/total) if total else 0.0, "size": len(self._mem),
+                "disk_size": len(self._disk) if self._disk else 0}
+
+_default: Optional[QueryCache]=None
+def get_cache() -> Optional[QueryCache]:
+    """Process-wide cache built from config, or ``None`` when ``CACHE_ENABLED`` is off."""
+    global _default
+    if not CACHE_ENABLED: return None
+    if _default is None:
+        _default=QueryCache(disk_path=os.path.join(CACHE_DIR, "query_cache.sqlite") if CACHE_DISK else None)
+    return _default
+
+class CachedEmbedder:
+    """``Embedder`` with per-text caching; misses of one call are still encoded as one batch."""
+    def __init__(self, emb, cache: QueryCache):
+        self.emb=emb; self.cache=cache; self.dim=emb.dim; self.model_name=emb.model_name
+        self.backend=getattr(emb, "backend", "torch")
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        keys=[self.cache.key("emb", self.model_name, self.backend, normalize_query(t)) for t in texts]
+        out=[self.cache.get(k) for k in keys]
+        miss=[i for i,v in enumerate(out) if v is None]
+        if miss:
+            for i,v in zip(miss, self.emb.encode([texts[i] for i in miss])):
+                out[i]=v; self.cache.put(keys[i], v)
+        return out
+
+def cached_retrieve_dense(cache: Optional[QueryCache], retrieve: Callable, client, query: str, qvec: List[float],
+                          topk: int = TOPK_RECALL, with_vectors: Optional[List[str]] = None,
+                          model: str = EMB_MODEL, collection: str = COLLECTION, with_text: bool = True,
+                          prefetch: int = 0) -> List[Dict[str, Any]]:
+    """``retrieve(client, qvec, topk=..., with_vectors=..., with_text=...)`` cached on (query, model, collection, k).
+
+    ``prefetch`` is the per-source hybrid prefetch depth ``retrieve`` uses (0 for dense recall); it only goes
+    into the key."""
+    fetch=lambda: retrieve(client, qvec, topk=topk, with_vectors=with_vectors, with_text=with_text)
+    if cache is None: return fetch()
+    key=cache.key("dense", normalize_query(query), model, topk, prefetch, with_vectors, with_text, collection=collection)
+    hits=cache.get_or_compute(key, fetch)
+    return [dict(h) for h in hits]
+
+class CachedReranker:
+    """Caches ``rerank``/``rerank_stored``/``rerank_batch`` as (id, score) lists keyed on query, candidate ids
+    and mode ("text" or "stored": stored vectors may be quantized, so scores can differ).
+
+    ``last_hit`` tells whether the last call was served entirely from the cache, i.e. the wrapped reranker
+    did not run (a cascade's ``history`` then has nothing for it)."""
+    def __init__(self, rr, cache: QueryCache, collection: str = COLLECTION):
+        self.rr=rr; self.cache=cache; self.collection=collection; self.last_hit=False
+    def __getattr__(self, name):
+        return getattr(self.rr, name)
+    def _key(self, query: str, candidates: List[Dict[str, Any]], mode: str = "text") -> str:
+        ids=hashlib.sha1("\x1f".join(str(c["id"]) for c in candidates).encode("utf-8")).hexdigest()
+        return self.cache.key("rerank", type(self.rr).__name__, self.rr.model_name, getattr(self.rr, "backend", None),
+                              mode, normalize_query(query), len(candidates), ids, collection=self.collection)
+    @staticmethod
+    def _restore(hit: List[Tuple[str, float]], candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_id={c["id"]: c for c in candidates}
+        for i,s in hit: by_id[i]["rerank_score"]=s
+        return [by_id[i] for i,_ in hit]
+    def _cached(self, fn: Callable, query: str, candidates: List[Dict[str, Any]], mode: str) -> List[Dict[str, Any]]:
+        key=self._key(query, candidates, mode); hit=self.cache.get(key); self.last_hit=hit is not None
+        if hit is not None: return self._restore(hit, candidates)
+        out=fn(query, candidates)
+        self.cache.put(key, [(c["id"], c["rerank_score"]) for c in out])
+        return out
+    def rerank(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._cached(self.rr.rerank, query, candidates, "text")
+    def rerank_stored(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._cached(self.rr.rerank_stored, query, candidates, "stored")
+    def rerank_batch(self, queries: List[str], candidate_lists: List[List[Dict[str, Any]]], stored: bool = False) -> List[List[Dict[str, Any]]]:
+        keys=[self._key(q, cs, "stored" if stored else "text") for q,cs in zip(queries, candidate_lists)]
+        hits=[self.cache.get(k) for k in keys]
+        out=[self._restore(h, cs) if h is not None else None for h,cs in zip(hits, candidate_lists)]
+        miss=[i for i,h in enumerate(hits) if h is None]; self.last_hit=not miss
+        if miss:
+            res=self.rr.rerank_batch([queries[i] for i in miss], [candidate_lists[i] for i in miss], stored=stored)
+            for i,r in zip(miss, res):
+                out[i]=r; self.cache.put(keys[i], [(c["id"], c["rerank_score"]) for c in r])
+        return out
+
+def with_cache(emb=None, reranker=None, cache: Optional[QueryCache] = None):
+    """Wrap an embedder and/or reranker with the process cache (no-op when caching is disabled)."""
+    cache=cache or get_cache()
+    if cache is None: return emb, reranker
+    return (CachedEmbedder(emb, cache) if emb is not None else None,
+            CachedReranker(reranker, cache) if reranker is not None else None)
@@ -3,6 +3,9 @@ import os
 from dotenv import load_dotenv; load_dotenv()
 QDRANT_URL=os.getenv("QDRANT_URL","http://localhost:7335")
 QDRANT_API_KEY=os.getenv("QDRANT_API_KEY","")
+QDRANT_GRPC=os.getenv("QDRANT_GRPC","0").lower() in ("1","true","yes")
+QDRANT_GRPC_PORT=int(os.getenv("QDRANT_GRPC_PORT","7336"))
+QDRANT_PATH=os.getenv("QDRANT_PATH","")
 COLLECTION=os.getenv("COLLECTION","dense_rerank_demo")
 EMB_MODEL=os.getenv("EMB_MODEL","sentence-transformers/all-MiniLM-L6-v2")
 SPARSE_MODEL=os.getenv("SPARSE_MODEL","Qdrant/minicoil-v1")
@@ -15,3 +18,51 @@ DATASET=os.getenv("DATASET","scifact")
 EVAL_LIMIT=int(os.getenv("EVAL_LIMIT","50"))
 MAX_DOCS=int(os.getenv("MAX_DOCS","5100"))
 MAX_CHARS=int(os.getenv("MAX_CHARS","0"))
+COLBERT_INGEST=os.getenv("COLBERT_INGEST","0").lower() in ("1","true","yes")
+MINICOIL_INGEST=os.getenv("MINICOIL_INGEST","0").lower() in ("1","true","yes")
+RERANK_MODE=os.getenv("RERANK_MODE","text")
+UPSERT_PARALLEL=int(os.getenv("UPSERT_PARALLEL","2"))
+UPSERT_QUEUE=int(os.getenv("UPSERT_QUEUE","4"))
+INGEST_CHECKPOINT=os.getenv("INGEST_CHECKPOINT","")
+INGEST_MANIFEST=os.getenv("INGEST_MANIFEST","")
+CACHE_ENABLED=os.getenv("CACHE_ENABLED","1").lower() in ("1","true","yes")
+CACHE_SIZE=int(os.getenv("CACHE_SIZE","4096"))
+CACHE_TTL=float(os.getenv("CACHE_TTL","3600"))
+CACHE_DIR=os.getenv("CACHE_DIR","./.cache")
+CACHE_DISK=os.getenv("CACHE_DISK","0").lower() in ("1","true","yes")
+CACHE_DISK_SIZE=int(os.getenv("CACHE_DISK_SIZE","100000"))
+RUN_CACHE_DIR=os.getenv("RUN_CACHE_DIR",os.path.join(CACHE_DIR,"runs"))
+SERVE_HOST=os.getenv("SERVE_HOST","127.0.0.1")
+SERVE_PORT=int(os.getenv("SERVE_PORT","8080"))
+SERVE_MAX_BATCH=int(os.getenv("SERVE_MAX_BATCH","32"))
+SERVE_MAX_WAIT_MS=float(os.getenv("SERVE_MAX_WAIT_MS","5"))
+SERVE_MAX_QUEUE=int(os.getenv("SERVE_MAX_QUEUE","256"))
+SERVE_TIMEOUT_MS=float(os.getenv("SERVE_TIMEOUT_MS","2000"))
+CASCADE_M=int(os.getenv("CASCADE_M","20"))
+CASCADE_ADAPTIVE=os.getenv("CASCADE_ADAPTIVE","0").lower() in ("1","true","yes")
+CASCADE_K_MIN=int(os.getenv("CASCADE_K_MIN","20"))
+CASCADE_M_MIN=int(os.getenv("CASCADE_M_MIN","5"))
+CASCADE_M_RATIO=float(os.getenv("CASCADE_M_RATIO","0.2"))
+CASCADE_GAP=float(os.getenv("CASCADE_GAP","0.05"))
+CASCADE_MARGIN=float(os.getenv("CASCADE_MARGIN","0.15"))
+INFER_BACKEND=os.getenv("INFER_BACKEND","torch")
+EMB_BACKEND=os.getenv("EMB_BACKEND",INFER_BACKEND)
+COLBERT_BACKEND=os.getenv("COLBERT_BACKEND",INFER_BACKEND)
+INFER_THREADS=int(os.getenv("INFER_THREADS","0"))
+ARTIFACT_DIR=os.getenv("ARTIFACT_DIR","./.artifacts")
+COLBERT_STORE=os.getenv("COLBERT_STORE","")
+COLBERT_STORE_MODE=os.getenv("COLBERT_STORE_MODE","plaid")
+COLBERT_STORE_NBITS=int(os.getenv("COLBERT_STORE_NBITS","2"))
+COLBERT_STORE_CENTROIDS=int(os.getenv("COLBERT_STORE_CENTROIDS","0"))
+COLBERT_TOKEN_BUDGET=int(os.getenv("COLBERT_TOKEN_BUDGET","0"))
+EMB_TOKEN_BUDGET=int(os.getenv("EMB_TOKEN_BUDGET","0"))
+DOC_STORE=os.getenv("DOC_STORE","")
+RECALL_IDS_ONLY=os.getenv("RECALL_IDS_ONLY","0").lower() in ("1","true","yes")
+RECALL_MODE=os.getenv("RECALL_MODE","dense")
+FUSION=os.getenv("FUSION","rrf")
+HYBRID_PREFETCH=int(os.getenv("HYBRID_PREFETCH","0"))
+INGEST_WORKERS=int(os.getenv("INGEST_WORKERS","0"))
+INGEST_WORKER_THREADS=int(os.getenv("INGEST_WORKER_THREADS","0"))
+DAEMON_SOCKET=os.getenv("DAEMON_SOCKET",os.path.join(os.getenv("XDG_RUNTIME_DIR","/tmp"),f"dense_rerank_demo-{getattr(os,'getuid',lambda: 0)()}.sock"))
+DAEMON_PRELOAD=os.getenv("DAEMON_PRELOAD","")
+TRACE_ENABLED=os.getenv("TRACE_ENABLED","0").lower() in ("1","true","yes")
@@ -0,0 +1,105 @@
+
+"""Compact local document store: one UTF-8 text blob plus memory-mapped byte offsets, keyed by ``doc_id``.
+
+Built at ingest when ``DOC_STORE`` is set, so recall can ask Qdrant for ids and scores only and the
+text of just the candidates that need it (text rerankers, displayed hits) is read locally in bulk.
+
+Layout of a store directory::
+
+    meta.json        n_docs, n_bytes
+    doc_ids.json     doc ids in row order
+    offsets.npy      int64 [N+1], byte range of each doc in text.bin
+    text.bin         concatenated UTF-8 texts
+"""
+import json, os
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from ..config import DOC_STORE
+from ..logging import get_logger
+logger=get_logger(__name__)
+
+class DocStoreWriter:
+    """Append texts doc by doc; ``finalize`` writes the offsets and id list next to the blob.
+
+    Lengths are spooled to ``<path>/spool.ids`` ("doc_id<TAB>n_bytes" per doc) so an interrupted ingest
+    can continue with ``resume_docs`` just like ``ColbertStoreWriter``.
+    """
+    def __init__(self, path: str, resume_docs: int = 0):
+        os.makedirs(path, exist_ok=True)
+        self.path=path; self._blob=os.path.join(path,"text.bin"); self._ids=os.path.join(path,"spool.ids")
+        keep_docs=keep_bytes=0
+        if resume_docs:
+            # Without the spool (finalized, or never written) the blob's doc boundaries are unknown.
+            lines=[]
+            if os.path.isfile(self._ids):
+                with open(self._ids, encoding="utf-8") as f: lines=f.readlines()[:resume_docs]
+            if len(lines)<resume_docs:
+                raise RuntimeError(f"Doc store {path}: cannot resume after {resume_docs} docs, the spool holds {len(lines)}; "
+                                   "rebuild from scratch (ingest --fresh)")
+            keep_docs=len(lines); keep_bytes=sum(int(l.rsplit("\t",1)[1]) for l in lines)
+            with open(self._ids,"w",encoding="utf-8") as f: f.writelines(lines)
+        else:
+            # The blob is rewritten from the start; a store finalized here before is gone.
+            meta=os.path.join(path,"meta.json")
+            if os.path.isfile(meta): os.remove(meta)
+            open(self._ids,"w").close()
+        with open(self._blob,"ab") as f: f.truncate(keep_bytes)
+        self.n_docs=keep_docs
+        if keep_docs: logger.info("Doc store %s: resuming after %d docs", path, keep_docs)
+    def add(self, doc_ids: Sequence[str], texts: Sequence[str]) -> None:
+        with open(self._blob,"ab") as fb, open(self._ids,"a",encoding="utf-8") as fi:
+            for did,t in zip(doc_ids, texts):
+                b=(t or "").encode("utf-8"); fb.write(b); fi.write(f"{did}\t{len(b)}\n"); self.n_docs+=1
+    def finalize(self) -> None:
+        if not self.n_docs:
+            os.remove(self._ids); logger.warning("Doc store %s: nothing spooled; not written", self.path); return
+        with open(self._ids, encoding="utf-8") as f:
+            rows=[l.rstrip("\n").rsplit("\t",1) for l in f if l.strip()]
+        offsets=np.zeros(len(rows)+1, dtype=np.int64); np.cumsum([int(r[1]) for r in rows], out=offsets[1:])
+        np.save(os.path.join(self.path,"offsets.npy"), offsets)
+        with open(os.path.join(self.path,"doc_ids.json"),"w",encoding="utf-8") as f: json.dump([r[0] for r in rows], f)
+        with open(os.path.join(self.path,"meta.json"),"w") as f: json.dump({"n_docs":len(rows), "n_bytes":int(offsets[-1])}, f)
+        os.remove(self._ids)
+        logger.info("Doc store %s: %d docs, %.1f MB of text", self.path, len(rows), offsets[-1]/1e6)
+
+class DocStore:
+    """Read side: ``get`` returns texts for a list of doc ids, reading the blob in file order."""
+    def __init__(self, path: str):
+        self.path=path
+        with open(os.path.join(path,"meta.json")) as f: self.meta=json.load(f)
+        with open(os.path.join(path,"doc_ids.json"),encoding="utf-8") as f: ids=json.load(f)
+        self.row={d:i for i,d in enumerate(ids)}
+        self.offsets=np.load(os.path.join(path,"offsets.npy"), mmap_mode="r")
+        n=self.meta["n_bytes"]
+        self.blob=np.memmap(os.path.join(path,"text.bin"), dtype=np.uint8, mode="r", shape=(n,)) if n else np.zeros(0,np.uint8)
+    def __len__(self): return len(self.row)
+    def __contains__(self, doc_id) -> bool: return str(doc_id) in self.row
+    def get(self, doc_ids: Sequence[str]) -> List[Optional[str]]:
+        """Texts for ``doc_ids`` (``None`` for unknown ids)."""
+        out: List[Optional[str]]=[None]*len(doc_ids)
+        rows=sorted((r,i) for i,r in enumerate(self.row.get(str(d),-1) for d in doc_ids) if r>=0)
+        for r,i in rows:
+            out[i]=self.blob[self.offsets[r]:self.offsets[r+1]].tobytes().decode("utf-8")
+        return out
+
+_default: Optional[DocStore]=None
+def get_doc_store() -> Optional[DocStore]:
+    """Process-wide store opened from ``DOC_STORE``, or ``None`` when none is configured or built yet."""
+    global _default
+    if _default is None and DOC_STORE and os.path.isfile(os.path.join(DOC_STORE,"meta.json")):
+        _default=DocStore(DOC_STORE)
+        logger.info("Using local doc store %s (%d docs)", DOC_STORE, len(_default))
+    return _default
+
+def hydrate(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill ``c["text"]`` in place for candidates recalled without text, in one bulk read."""
+    missing=[c for c in candidates if c.get("text") is None]
+    if not missing: return candidates
+    store=get_doc_store()
+    if store is None: raise RuntimeError("candidates were recalled without text but no doc store is available (set DOC_STORE and re-ingest)")
+    for c,t in zip(missing, store.get([c["id"] for c in missing])): c["text"]=t or ""
+    return candidates
+
+def texts(candidates: List[Dict[str, Any]]) -> List[str]:
+    """Candidate texts for text rerankers, hydrating those that arrived without one."""
+    return [c["text"] for c in hydrate(candidates)]
@@ -1,5 +1,5 @@
-
-import os
+import os, json
+from typing import Dict, Iterator, Tuple
 from beir import util
 from beir.datasets.data_loader import GenericDataLoader
 from ..logging import get_logger
@@ -14,12 +14,29 @@ def _find(dataset,out_dir,base=None):
         if os.path.isfile(os.path.join(c,"corpus.jsonl")): return c
     return None
 
-def load_beir(dataset,out_dir,split="test"):
+def beir_dir(dataset,out_dir):
+    """Download/unzip a BEIR dataset if needed and return the directory holding corpus.jsonl."""
+    local=_find(dataset,out_dir)
+    if local: return local
     os.makedirs(out_dir,exist_ok=True)
     url=f"https://public.ukp.informatik.tu-darmstadt.de/thakur/BEIR/datasets/{dataset.lower()}.zip"
     logger.info("Loading BEIR dataset: %s", dataset)
     base=util.download_and_unzip(url,out_dir)
     local=_find(dataset,out_dir,base) or _find(dataset,out_dir)
     if not local: raise FileNotFoundError("corpus.jsonl not found after unzip")
+    return local
+
+def load_beir(dataset,out_dir,split="test"):
+    local=beir_dir(dataset,out_dir)
     logger.info("Using BEIR dataset dir: %s", local)
     return GenericDataLoader(local).load(split=split)
+
+def iter_corpus(dataset,out_dir) -> Iterator[Tuple[str,Dict[str,str]]]:
+    """Stream (doc_id, {"title","text"}) from corpus.jsonl without loading the corpus into memory."""
+    path=os.path.join(beir_dir(dataset,out_dir),"corpus.jsonl")
+    logger.info("Streaming corpus: %s", path)
+    with open(path,encoding="utf-8") as f:
+        for line in f:
+            if not line.strip(): continue
+            d=json.loads(line)
+            yield str(d["_id"]), {"title":d.get("title",""),"text":d.get("text","")}
@@ -0,0 +1,44 @@
+
+"""Persisted retrieval runs: ranked (doc id, score) lists per query, cached on disk and written as TREC runs.
+
+A ``RunCache`` holds the recall candidates of one (collection generation, dataset, recall model, K,
+hybrid prefetch depth), so evaluating several rerankers or cutoffs repeats neither query embedding nor
+Qdrant search. Only ids and scores are stored; texts are looked up again from the corpus (or the doc store) by id. Re-ingesting the
+collection bumps its generation (see ``cache``), which retires old runs.
+"""
+import hashlib, json, os
+from typing import Dict, Iterable, List, Sequence, Tuple
+from ..config import RUN_CACHE_DIR, COLLECTION
+from ..cache import collection_generation
+from ..logging import get_logger
+logger=get_logger(__name__)
+
+Run=Dict[str, List[Tuple[str, float]]]  # qid -> [(doc_id, score), ...] best first
+
+class RunCache:
+    """Per-query candidate lists for one recall configuration, filled incrementally and saved as JSON."""
+    def __init__(self, dataset: str, split: str, model: str, k: int, collection: str = COLLECTION, root: str = RUN_CACHE_DIR,
+                 prefetch: int = 0):
+        self.meta={"collection": collection, "generation": collection_generation(collection), "dataset": dataset,
+                   "split": split, "model": model, "k": k, "prefetch": prefetch}
+        h=hashlib.sha1(json.dumps(self.meta, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self.path=os.path.join(root, f"{collection}-{dataset}-k{k}-{h}.json")
+        self.run: Run={}
+        if os.path.isfile(self.path):
+            with open(self.path, encoding="utf-8") as f: self.run={q: [tuple(x) for x in hits] for q,hits in json.load(f)["run"].items()}
+    def missing(self, qids: Iterable[str]) -> List[str]:
+        return [q for q in qids if q not in self.run]
+    def add(self, qid: str, hits: Sequence[Dict]) -> None:
+        self.run[qid]=[(str(c["id"]), float(c["score"])) for c in hits]
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True); tmp=self.path+".tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump({"meta": self.meta, "run": self.run}, f)
+        os.replace(tmp, self.path)
+        logger.info("Saved run cache %s (%d queries)", self.path, len(self.run))
+
+def write_trec(path: str, run: Run, tag: str) -> None:
+    """``run`` in TREC format (qid Q0 doc_id rank score tag), one line per ranked document."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for qid,hits in run.items():
+            for rank,(did,score) in enumerate(hits, 1): f.write(f"{qid} Q0 {did} {rank} {score:.6f} {tag}\n")
@@ -0,0 +1,149 @@
+
+"""CPU inference backends shared by ``Embedder`` and ``ColbertReranker``.
+
+``torch`` is the stock fp32 model; ``int8`` applies dynamic int8 quantization to every ``nn.Linear``;
+``onnx`` runs an ONNX Runtime export with all graph optimizations; ``onnx-int8`` additionally
+quantizes the exported weights. Converted artifacts are cached under ``ARTIFACT_DIR``.
+"""
+import os, re
+from typing import Any, Callable, Dict, Optional, Tuple
+import torch
+from ..config import ARTIFACT_DIR, INFER_THREADS
+from ..logging import get_logger
+logger=get_logger(__name__)
+BACKENDS=["torch","int8","onnx","onnx-int8"]
+
+def configure_threads(n: int = INFER_THREADS):
+    """Pin torch intra-op threads (0 keeps the default); inter-op parallelism buys nothing for one model call."""
+    if n<=0: return
+    torch.set_num_threads(n)
+    try: torch.set_num_interop_threads(1)
+    except RuntimeError: pass  # already set once work has started
+
+def artifact_path(model_name: str, backend: str, suffix: str = "") -> str:
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    return os.path.join(ARTIFACT_DIR, re.sub(r"[^A-Za-z0-9_.-]+","__",model_name)+"-"+backend+suffix)
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    return torch.ao.quantization.quantize_dynamic(module.cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+def cached_module(path: str, build: Callable[[], torch.nn.Module]) -> torch.nn.Module:
+    """Load a pickled module from ``path``, building and saving it on first use."""
+    if os.path.isfile(path):
+        logger.info("Loading cached model artifact: %s", path)
+        return torch.load(path, weights_only=False).eval()
+    m=build(); torch.save(m, path); logger.info("Saved model artifact: %s", path)
+    return m
+
+def artifact_ready(model_name: str, backend: str, sentence_transformer: bool = False) -> bool:
+    """Whether the converted model ``backend`` needs for ``model_name`` is already cached (always for torch)."""
+    if backend=="torch": return True
+    if backend=="int8": return os.path.isfile(artifact_path(model_name, backend, ".pt"))
+    if sentence_transformer:
+        path=artifact_path(model_name, "onnx")
+        return os.path.isdir(path) and (backend=="onnx" or os.path.isfile(os.path.join(path, _ST_INT8_FILE)))
+    return os.path.isfile(artifact_path(model_name, backend, ".opt.onnx"))
+
+def _require_onnxruntime(with_optimum: bool = False):
+    """``onnxruntime``, checking for ``optimum`` too where sentence-transformers' ONNX backend needs it."""
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("INFER_BACKEND=onnx needs onnxruntime (pip install onnxruntime)") from e
+    if with_optimum:
+        try:
+            import optimum.onnxruntime
+        except ImportError as e:
+            raise ImportError("EMB_BACKEND=onnx needs optimum for sentence-transformers' ONNX backend "
+                              "(pip install \"optimum[onnxruntime]\")") from e
+    return onnxruntime
+
+class _HiddenStates(torch.nn.Module):
+    """Positional-argument wrapper so ``torch.onnx.export`` can trace an HF encoder."""
+    def __init__(self, model, names):
+        super().__init__(); self.model=model; self.names=names
+    def forward(self, *args):
+        out=self.model(**dict(zip(self.names,args)))
+        return out.last_hidden_state if hasattr(out,"last_hidden_state") else out[0]
+
+def export_onnx(model: torch.nn.Module, tok, path: str, quantize: bool = False) -> str:
+    """Export ``model``'s last hidden state to ONNX with dynamic batch/sequence axes (optionally int8 weights)."""
+    if os.path.isfile(path): return path
+    dummy=tok(["export sample"], return_tensors="pt")
+    names=[k for k in ("input_ids","attention_mask","token_type_ids") if k in dummy]
+    axes={n:{0:"batch",1:"seq"} for n in names+["last_hidden_state"]}
+    fp32=path.replace("-int8.onnx",".onnx") if quantize else path
+    if not os.path.isfile(fp32):
+        logger.info("Exporting ONNX model: %s", fp32)
+        torch.onnx.export(_HiddenStates(model.cpu().eval(), names), tuple(dummy[n] for n in names), fp32,
+                          input_names=names, output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=17)
+    if quantize:
+        _require_onnxruntime()
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        logger.info("Quantizing ONNX model: %s", path)
+        quantize_dynamic(fp32, path, weight_type=QuantType.QInt8)
+    return path
+
+class OnnxEncoder:
+    """Callable like an HF model on tokenizer output; returns last hidden states as a CPU tensor."""
+    def __init__(self, path: str, threads: int = INFER_THREADS):
+        ort=_require_onnxruntime()
+        so=ort.SessionOptions(); so.graph_optimization_level=ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads>0: so.intra_op_num_threads=threads; so.inter_op_num_threads=1
+        opt=path.replace(".onnx",".opt.onnx")
+        if os.path.isfile(opt):
+            path=opt; so.graph_optimization_level=ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            so.optimized_model_filepath=opt
+        self.sess=ort.InferenceSession(path, so, providers=["CPUExecutionProvider"])
+        self.inputs=[i.name for i in self.sess.get_inputs()]
+    def __call__(self, **enc) -> torch.Tensor:
+        feeds={k: enc[k].cpu().numpy() for k in self.inputs if k in enc}
+        return torch.from_numpy(self.sess.run(None, feeds)[0])
+
+def load_token_encoder(checkpoint: str, backend: str, tok,
+                       threads: int = INFER_THREADS) -> Tuple[Callable[..., torch.Tensor], Optional[torch.nn.Module], int]:
+    """(forward(**enc) -> last hidden states, optional projection layer, output dim) for a ColBERT checkpoint."""
+    if backend not in BACKENDS: raise ValueError(f"unknown inference backend: {backend} (choose from {BACKENDS})")
+    from transformers import AutoModel
+    configure_threads(threads)
+    if backend=="int8":
+        model=cached_module(artifact_path(checkpoint, backend, ".pt"), lambda: quantize_int8(AutoModel.from_pretrained(checkpoint)))
+    else:
+        model=AutoModel.from_pretrained(checkpoint).eval()
+    linear=getattr(model,"linear",None)
+    dim=linear.out_features if linear is not None else model.config.hidden_size
+    if backend in ("onnx","onnx-int8"):
+        path=export_onnx(model, tok, artifact_path(checkpoint, backend, ".onnx"), quantize=(backend=="onnx-int8"))
+        return OnnxEncoder(path, threads), linear, dim
+    def forward(**enc):
+        out=model(**enc)
+        return out.last_hidden_state if hasattr(out,"last_hidden_state") else out[0]
+    forward.module=model
+    return forward, linear, dim
+
+_ST_INT8_FILE="onnx/model_qint8_avx2.onnx"
+
+def load_sentence_transformer(model_name: str, backend: str, threads: int = INFER_THREADS):
+    """``SentenceTransformer`` for ``backend``; converted models are saved under ``ARTIFACT_DIR`` and reused."""
+    if backend not in BACKENDS: raise ValueError(f"unknown inference backend: {backend} (choose from {BACKENDS})")
+    from sentence_transformers import SentenceTransformer
+    configure_threads(threads)
+    if backend=="torch": return SentenceTransformer(model_name)
+    if backend=="int8":
+        return cached_module(artifact_path(model_name, backend, ".pt"), lambda: quantize_int8(SentenceTransformer(model_name, device="cpu")))
+    ort=_require_onnxruntime(with_optimum=True)
+    path=artifact_path(model_name, "onnx")
+    kw: Dict[str,Any]={"provider":"CPUExecutionProvider"}
+    if threads>0:
+        so=ort.SessionOptions(); so.intra_op_num_threads=threads; so.inter_op_num_threads=1
+        kw["session_options"]=so
+    if not os.path.isdir(path):
+        m=SentenceTransformer(model_name, backend="onnx", model_kwargs=kw); m.save(path)
+    if backend=="onnx-int8":
+        fname=_ST_INT8_FILE
+        if not os.path.isfile(os.path.join(path, fname)):
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+            export_dynamic_quantized_onnx_model(SentenceTransformer(path, backend="onnx", model_kwargs=kw), "avx2", path)
+        kw["file_name"]=fname
+    return SentenceTransformer(path, backend="onnx", model_kwargs=kw)
@@ -0,0 +1,55 @@
+
+"""Length-bucketed batching by token budget, shared by the ColBERT document encoder and ``Embedder``.
+
+Texts are tokenized once, sorted longest first and cut into batches whose padded size (rows x
+longest row) stays within ``budget`` tokens, so short documents no longer pay for one long
+neighbour and batches of short texts grow instead. Callers scatter each batch's outputs back to
+the original positions.
+
+Every call records its real and padded token counts, plus what the fixed-size batches it replaces
+would have padded, per encoder name; ``padding_stats`` reports the waste ratios.
+"""
+import threading
+from typing import Dict, List, Sequence
+
+_lock=threading.Lock()
+_stats: Dict[str, List[int]]={}  # name -> [real tokens, padded tokens, baseline padded tokens, texts]
+
+def token_batches(lengths: Sequence[int], budget: int, max_batch: int = 0) -> List[List[int]]:
+    """Indices into ``lengths`` grouped longest first so that len(batch) * max length <= ``budget``
+    (a single text longer than the budget gets a batch of its own); ``max_batch`` caps the rows."""
+    order=sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    out: List[List[int]]=[]; cur: List[int]=[]
+    for i in order:
+        # Sorted descending: the batch's first text sets its padded width.
+        if cur and ((len(cur)+1)*lengths[cur[0]]>budget or (max_batch and len(cur)>=max_batch)):
+            out.append(cur); cur=[]
+        cur.append(i)
+    if cur: out.append(cur)
+    return out
+
+def fixed_batches(n: int, size: int, order: Sequence[int] = ()) -> List[List[int]]:
+    """Consecutive batches of ``size`` over ``order`` (default: arrival order), the batching this replaces."""
+    order=list(order) or list(range(n))
+    return [order[o:o+size] for o in range(0, n, size)]
+
+def record(name: str, lengths: Sequence[int], batches: List[List[int]], baseline: List[List[int]]) -> None:
+    """Account one encode call: padded tokens of ``batches`` vs the ``baseline`` batching."""
+    padded=lambda bs: sum(len(b)*max(lengths[i] for i in b) for b in bs)
+    with _lock:
+        s=_stats.setdefault(name, [0,0,0,0])
+        s[0]+=sum(lengths); s[1]+=padded(batches); s[2]+=padded(baseline); s[3]+=len(lengths)
+
+def padding_stats() -> Dict[str, Dict[str, float]]:
+    """Per encoder: texts, real tokens, and the share of padded tokens that were padding, with
+    token-budget batching (``waste``) and with the fixed-size batches it replaces (``fixed_waste``)."""
+    with _lock: items=[(n, list(s)) for n,s in _stats.items()]
+    return {n: {"texts": t, "tokens": real, "waste": 1-real/padded if padded else 0.0,
+                "fixed_waste": 1-real/base if base else 0.0} for n,(real,padded,base,t) in items}
+
+def format_padding_stats() -> str:
+    return " | ".join(f"{n}: padding waste {s['waste']:.1%} (fixed batches: {s['fixed_waste']:.1%})"
+                      for n,s in padding_stats().items()) or "no padded batches"
+
+def reset() -> None:
+    with _lock: _stats.clear()
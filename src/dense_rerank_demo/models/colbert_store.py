@@ -0,0 +1,190 @@
+
+"""Compressed, memory-mapped ColBERT token store keyed by ``doc_id``.
+
+Modes: ``plaid`` stores each token as a k-means centroid id plus an ``nbits``-per-dimension residual
+bucket (ColBERTv2/PLAID style); ``int8`` stores per-token scaled int8; ``fp16`` stores half floats.
+Arrays are ``.npy`` files opened with ``mmap_mode="r"``, so worker processes share the page cache
+instead of each holding a copy.
+
+Layout of a store directory::
+
+    meta.json        mode, dim, nbits, counts, residual bucket cutoffs/weights
+    doc_ids.json     doc ids in row order
+    offsets.npy      int64 [N+1], token range of each doc
+    centroids.npy    float16 [C, D]               (plaid)
+    codes.npy        uint16 [T]                    (plaid)
+    residuals.npy    uint8 [T, D*nbits/8]          (plaid)
+    tokens.npy       int8/float16 [T, D]           (int8, fp16)
+    scales.npy       float16 [T]                   (int8)
+"""
+import json, os
+from typing import Dict, Iterable, Sequence, Tuple
+import numpy as np
+from ..config import COLBERT_STORE_MODE, COLBERT_STORE_NBITS, COLBERT_STORE_CENTROIDS
+from ..logging import get_logger
+logger=get_logger(__name__)
+MODES=["plaid","int8","fp16"]
+
+def _kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0, chunk: int = 32768) -> np.ndarray:
+    """Spherical k-means on unit vectors (assignment by max dot product)."""
+    rng=np.random.default_rng(seed)
+    c=x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign=np.concatenate([np.argmax(x[i:i+chunk]@c.T, axis=1) for i in range(0,len(x),chunk)])
+        sums=np.zeros_like(c); np.add.at(sums, assign, x)
+        counts=np.bincount(assign, minlength=k)
+        empty=counts==0
+        sums[empty]=x[rng.choice(len(x), size=int(empty.sum()))]  # reseed dead centroids
+        c=sums/np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-6)
+    return c.astype(np.float32)
+
+def _assign(x: np.ndarray, c: np.ndarray, chunk: int = 32768) -> np.ndarray:
+    return np.concatenate([np.argmax(x[i:i+chunk]@c.T, axis=1) for i in range(0,len(x),chunk)]) if len(x) else np.empty(0,dtype=np.int64)
+
+def _pack(b: np.ndarray, nbits: int) -> np.ndarray:
+    per=8//nbits; T,D=b.shape
+    b=b.astype(np.uint8).reshape(T, D//per, per)
+    shifts=(np.arange(per, dtype=np.uint8)*nbits)
+    return np.bitwise_or.reduce(b<<shifts, axis=2).astype(np.uint8)
+
+def _unpack(p: np.ndarray, nbits: int, dim: int) -> np.ndarray:
+    per=8//nbits; mask=(1<<nbits)-1
+    shifts=(np.arange(per, dtype=np.uint8)*nbits)
+    return ((p[:,:,None]>>shifts)&mask).reshape(len(p), dim)
+
+class ColbertStoreWriter:
+    """Append token matrices doc by doc; ``finalize`` compresses them into the store directory.
+
+    Raw tokens are spooled to ``<path>/spool.f16`` (plus ``spool.ids``, one "doc_id<TAB>n_tokens" line
+    per doc) so RAM stays bounded and an interrupted ingest can continue with ``resume_docs``.
+    """
+    def __init__(self, path: str, dim: int, mode: str = COLBERT_STORE_MODE, nbits: int = COLBERT_STORE_NBITS,
+                 n_centroids: int = COLBERT_STORE_CENTROIDS, resume_docs: int = 0):
+        if mode not in MODES: raise ValueError(f"unknown store mode: {mode} (choose from {MODES})")
+        if mode=="plaid" and (nbits not in (1,2,4,8) or dim%(8//nbits)): raise ValueError(f"nbits={nbits} does not fit dim={dim}")
+        os.makedirs(path, exist_ok=True)
+        self.path=path; self.dim=dim; self.mode=mode; self.nbits=nbits; self.n_centroids=n_centroids
+        self._tok=os.path.join(path,"spool.f16"); self._ids=os.path.join(path,"spool.ids")
+        keep_docs=keep_tokens=0
+        if resume_docs:
+            # Without the spool (finalized, or never written) the docs before ``resume_docs`` cannot be recovered.
+            lines=[]
+            if os.path.isfile(self._ids):
+                with open(self._ids, encoding="utf-8") as f: lines=f.readlines()[:resume_docs]
+            if len(lines)<resume_docs:
+                raise RuntimeError(f"ColBERT store {path}: cannot resume after {resume_docs} docs, the spool holds {len(lines)}; "
+                                   "rebuild from scratch (ingest --fresh)")
+            keep_docs=len(lines); keep_tokens=sum(int(l.rsplit("\t",1)[1]) for l in lines)
+            with open(self._ids,"w",encoding="utf-8") as f: f.writelines(lines)
+        else:
+            open(self._ids,"w").close()
+        with open(self._tok,"ab") as f: f.truncate(keep_tokens*dim*2)
+        self.n_docs=keep_docs
+        if keep_docs: logger.info("ColBERT store %s: resuming after %d docs", path, keep_docs)
+    def add(self, doc_ids: Sequence[str], mats: Iterable) -> None:
+        with open(self._tok,"ab") as ft, open(self._ids,"a",encoding="utf-8") as fi:
+            for did,m in zip(doc_ids, mats):
+                a=np.asarray(m, dtype=np.float16).reshape(-1, self.dim)
+                ft.write(a.tobytes()); fi.write(f"{did}\t{len(a)}\n"); self.n_docs+=1
+    def finalize(self, chunk: int = 65536, sample: int = 1<<16) -> None:
+        if not self.n_docs:
+            # An empty spool must not replace a store built earlier.
+            for p in (self._tok, self._ids):
+                if os.path.isfile(p): os.remove(p)
+            logger.warning("ColBERT store %s: nothing spooled; left unchanged", self.path); return
+        with open(self._ids, encoding="utf-8") as f:
+            rows=[l.rstrip("\n").rsplit("\t",1) for l in f if l.strip()]
+        ids=[r[0] for r in rows]; lens=np.array([int(r[1]) for r in rows], dtype=np.int64)
+        offsets=np.zeros(len(ids)+1, dtype=np.int64); np.cumsum(lens, out=offsets[1:]); T=int(offsets[-1])
+        raw=np.memmap(self._tok, dtype=np.float16, mode="r", shape=(T, self.dim)) if T else np.zeros((0,self.dim),np.float16)
+        meta={"mode":self.mode, "dim":self.dim, "n_docs":len(ids), "n_tokens":T}
+        if self.mode=="plaid": meta.update(self._write_plaid(raw, chunk, sample))
+        else: self._write_scalar(raw, chunk)
+        np.save(os.path.join(self.path,"offsets.npy"), offsets)
+        with open(os.path.join(self.path,"doc_ids.json"),"w",encoding="utf-8") as f: json.dump(ids, f)
+        with open(os.path.join(self.path,"meta.json"),"w") as f: json.dump(meta, f)
+        del raw
+        os.remove(self._tok); os.remove(self._ids)
+        store=ColbertStore(self.path)
+        logger.info("ColBERT store %s: %d docs, %d tokens, %.0f bytes/doc (%s)", self.path, len(ids), T, store.bytes_per_doc(), self.mode)
+    def _out(self, name: str, dtype, shape) -> np.memmap:
+        return np.lib.format.open_memmap(os.path.join(self.path, name), mode="w+", dtype=dtype, shape=shape)
+    def _write_scalar(self, raw, chunk):
+        T=len(raw)
+        if self.mode=="fp16":
+            out=self._out("tokens.npy", np.float16, (T,self.dim))
+            for i in range(0,T,chunk): out[i:i+chunk]=raw[i:i+chunk]
+            out.flush(); return
+        out=self._out("tokens.npy", np.int8, (T,self.dim)); sc=self._out("scales.npy", np.float16, (T,))
+        for i in range(0,T,chunk):
+            x=np.asarray(raw[i:i+chunk], dtype=np.float32)
+            s=np.maximum(np.abs(x).max(axis=1), 1e-6)/127.0
+            out[i:i+chunk]=np.clip(np.rint(x/s[:,None]), -127, 127); sc[i:i+chunk]=s
+        out.flush(); sc.flush()
+    def _write_plaid(self, raw, chunk, sample) -> Dict:
+        T=len(raw); rng=np.random.default_rng(0)
+        k=self.n_centroids or int(2**np.floor(np.log2(max(16*np.sqrt(max(T,1)), 2))))
+        idx=np.sort(rng.choice(T, size=min(T,sample), replace=False)) if T else np.empty(0,dtype=np.int64)
+        k=max(1, min(k, max(1,len(idx)//16), 65535))  # keep >=16 training tokens per centroid
+        xs=np.asarray(raw[idx], dtype=np.float32)
+        c=_kmeans(xs, k) if T else np.zeros((1,self.dim),np.float32)
+        c=c.astype(np.float16).astype(np.float32)  # residuals against the centroids as stored
+        res=xs-c[_assign(xs, c)] if T else np.zeros((1,self.dim),np.float32)
+        nb=1<<self.nbits
+        vals=res.ravel(); vals=vals[rng.choice(len(vals), size=min(len(vals),1<<20), replace=False)]
+        cutoffs=np.quantile(vals, np.arange(1,nb)/nb).astype(np.float32)
+        weights=np.quantile(vals, (np.arange(nb)+0.5)/nb).astype(np.float32)
+        np.save(os.path.join(self.path,"centroids.npy"), c.astype(np.float16))
+        codes=self._out("codes.npy", np.uint16, (T,))
+        resid=self._out("residuals.npy", np.uint8, (T, self.dim*self.nbits//8))
+        for i in range(0,T,chunk):
+            x=np.asarray(raw[i:i+chunk], dtype=np.float32); a=_assign(x, c)
+            codes[i:i+chunk]=a; resid[i:i+chunk]=_pack(np.searchsorted(cutoffs, x-c[a]), self.nbits)
+        codes.flush(); resid.flush()
+        return {"nbits":self.nbits, "n_centroids":int(k), "cutoffs":cutoffs.tolist(), "weights":weights.tolist()}
+
+class ColbertStore:
+    """Read side: memory-mapped arrays plus a ``doc_id`` -> row map; ``decode`` feeds ``_maxsim`` directly."""
+    def __init__(self, path: str):
+        self.path=path
+        with open(os.path.join(path,"meta.json")) as f: self.meta=json.load(f)
+        with open(os.path.join(path,"doc_ids.json"),encoding="utf-8") as f: ids=json.load(f)
+        self.row={d:i for i,d in enumerate(ids)}
+        self.mode=self.meta["mode"]; self.dim=self.meta["dim"]
+        load=lambda n: np.load(os.path.join(path,n), mmap_mode="r")
+        self.offsets=load("offsets.npy")
+        if self.mode=="plaid":
+            self.nbits=self.meta["nbits"]
+            self.centroids=np.asarray(load("centroids.npy"), dtype=np.float32)
+            self.weights=np.asarray(self.meta["weights"], dtype=np.float32)
+            self.codes=load("codes.npy"); self.residuals=load("residuals.npy")
+        else:
+            self.tokens=load("tokens.npy")
+            self.scales=load("scales.npy") if self.mode=="int8" else None
+    def __len__(self): return len(self.row)
+    def __contains__(self, doc_id) -> bool: return str(doc_id) in self.row
+    def bytes_per_doc(self) -> float:
+        files=[f for f in os.listdir(self.path) if f.endswith(".npy") or f.endswith(".json")]
+        return sum(os.path.getsize(os.path.join(self.path,f)) for f in files)/max(1,len(self.row))
+    def _tokens(self, pos: np.ndarray) -> np.ndarray:
+        """Decode the tokens at flat positions ``pos`` (sorted, for mmap locality) to float32 [n, D]."""
+        if self.mode=="plaid":
+            x=self.centroids[np.asarray(self.codes[pos], dtype=np.int64)]
+            x+=self.weights[_unpack(np.asarray(self.residuals[pos]), self.nbits, self.dim)]
+            return x/np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-6)
+        x=np.asarray(self.tokens[pos], dtype=np.float32)
+        if self.scales is not None: x*=np.asarray(self.scales[pos], dtype=np.float32)[:,None]
+        return x
+    def decode(self, doc_ids: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Padded [B, L, D] float32 tokens and [B, L] mask for ``doc_ids``; unknown ids come back empty."""
+        rows=np.array([self.row.get(str(d), -1) for d in doc_ids], dtype=np.int64)
+        starts=np.where(rows>=0, self.offsets[np.maximum(rows,0)], 0)
+        lens=np.where(rows>=0, self.offsets[np.maximum(rows,0)+1]-starts, 0)
+        B=len(rows); L=int(lens.max()) if B else 0
+        out=np.zeros((B,L,self.dim), dtype=np.float32); mask=np.arange(L)[None,:]<lens[:,None]
+        if lens.sum():
+            owner=np.repeat(np.arange(B), lens); within=np.arange(int(lens.sum()))-np.repeat(np.cumsum(lens)-lens, lens)
+            pos=np.repeat(starts, lens)+within
+            order=np.argsort(pos, kind="stable")
+            out[owner[order], within[order]]=self._tokens(pos[order])
+        return out, mask
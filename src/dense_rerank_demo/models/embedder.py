@@ -1,25 +1,66 @@
-from sentence_transformers import SentenceTransformer
 from typing import List
 import numpy as np
-from ..config import EMB_MODEL
+import torch
+from ..config import EMB_MODEL, EMB_BACKEND, EMB_TOKEN_BUDGET, INFER_THREADS
 from ..logging import get_logger
+from ..trace import span
+from .backend import load_sentence_transformer
+from .batching import token_batches, fixed_batches, record
 
 logger = get_logger(__name__)
 
 class Embedder:
-    def __init__(self, model_name: str = EMB_MODEL):
-        logger.info("Loading embedding model: %s", model_name)
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = EMB_MODEL, backend: str = EMB_BACKEND, token_budget: int = EMB_TOKEN_BUDGET,
+                 threads: int = INFER_THREADS):
+        logger.info("Loading embedding model: %s (backend=%s)", model_name, backend)
+        self.model_name = model_name
+        self.backend = backend
+        self.model = load_sentence_transformer(model_name, backend, threads)
         self.dim = self.model.get_sentence_embedding_dimension()
         logger.info("Embedding model loaded (dim=%d)", self.dim)
         self.normalize = True
+        # Default budget: sentence-transformers' 32 texts per batch at the longest sequence.
+        self.batch_size = 32
+        self.max_len = self.model.max_seq_length or 512
+        self.token_budget = token_budget or self.batch_size * self.max_len
 
-    def encode(self, texts: List[str]) -> List[List[float]]:
-        v = self.model.encode(
-            texts,
-            normalize_embeddings=self.normalize,
-            convert_to_numpy=True
-        )
-        if isinstance(v, np.ndarray):
-            return v.tolist()
-        return v
+    def encode(self, texts: List[str], as_numpy: bool = False, bucketed: bool = False) -> List[List[float]]:
+        """Normalized embeddings as lists (``as_numpy``: one float32 [N, dim] array).
+
+        ``bucketed`` (ingest) encodes in token-budget batches, see ``models.batching``."""
+        with span("embed"):
+            if bucketed and len(texts) > 1:
+                v = self._encode_bucketed(texts)
+            else:
+                v = self.model.encode(
+                    texts,
+                    normalize_embeddings=self.normalize,
+                    convert_to_numpy=True
+                )
+            if as_numpy:
+                return np.asarray(v, dtype=np.float32)
+            if isinstance(v, np.ndarray):
+                return v.tolist()
+            return v
+
+    @torch.inference_mode()
+    def _encode_bucketed(self, texts: List[str]) -> np.ndarray:
+        """Texts tokenized once (as ``SentenceTransformer.encode`` would), then padded per batch and run
+        through the model directly; like ``ColbertReranker._enc_ds``."""
+        tok = self.model.tokenizer
+        lower = getattr(self.model._first_module(), "do_lower_case", False)
+        with span("embed.tokenize"):
+            enc = tok([t.strip().lower() if lower else t.strip() for t in texts], truncation=True, max_length=self.max_len)
+        lengths = [len(x) for x in enc["input_ids"]]
+        batches = token_batches(lengths, self.token_budget)
+        # Baseline: sentence-transformers' own length-sorted batches of ``batch_size``.
+        record("embed", lengths, batches,
+               fixed_batches(len(texts), self.batch_size, sorted(range(len(texts)), key=lambda i: -lengths[i])))
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        self.model.eval(); device = self.model.device
+        for b in batches:
+            feats = tok.pad({k: [v[i] for i in b] for k, v in enc.items()}, return_tensors="pt")
+            v = self.model({k: t.to(device) for k, t in feats.items()})["sentence_embedding"]
+            if self.normalize: v = torch.nn.functional.normalize(v, p=2, dim=1)
+            out[b] = v.float().cpu().numpy()
+        return out
@@ -0,0 +1,22 @@
+
+from typing import Any, Optional
+from ..config import SPARSE_MODEL, COLBERT_CKPT, CASCADE_M, CASCADE_ADAPTIVE
+RERANKERS=["minicoil","colbert","cascade"]
+def make_reranker(name: str, m: int = CASCADE_M, adaptive: bool = CASCADE_ADAPTIVE) -> Optional[Any]:
+    """Construct a reranker by CLI name ("none" -> None); model imports stay lazy."""
+    if name=="none": return None
+    if name=="minicoil":
+        from .reranker_minicoil import MiniCOILReranker
+        return MiniCOILReranker(SPARSE_MODEL)
+    if name=="colbert":
+        from .reranker_colbert import ColbertReranker
+        return ColbertReranker(COLBERT_CKPT)
+    if name=="cascade":
+        from .reranker_cascade import CascadeReranker
+        return CascadeReranker(make_reranker("minicoil"), make_reranker("colbert"), m=m, adaptive=adaptive)
+    raise ValueError(f"unknown reranker: {name}")
+def sparse_encoder(rr: Optional[Any] = None) -> Any:
+    """MiniCOIL model for hybrid-recall queries, reused from ``rr`` (MiniCOIL or cascade) when it has one."""
+    for r in (rr, getattr(rr, "minicoil", None)):
+        if r is not None and getattr(r, "vector_name", None)=="minicoil": return r
+    return make_reranker("minicoil")
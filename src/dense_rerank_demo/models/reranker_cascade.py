@@ -0,0 +1,71 @@
+
+import math, time
+from typing import List, Dict, Any, Tuple
+from ..config import (CASCADE_M, CASCADE_ADAPTIVE, CASCADE_K_MIN, CASCADE_M_MIN, CASCADE_M_RATIO,
+                      CASCADE_GAP, CASCADE_MARGIN)
+def adaptive_depth(scores: List[float], m: int = CASCADE_M, k_min: int = CASCADE_K_MIN, m_min: int = CASCADE_M_MIN,
+                   m_ratio: float = CASCADE_M_RATIO, gap: float = CASCADE_GAP, margin: float = CASCADE_MARGIN) -> Tuple[int,int]:
+    """Pick (K, M) for one query from its dense scores (sorted, descending).
+
+    K stops at the first drop of at least ``gap`` between neighbours after ``k_min`` candidates, or at the
+    first candidate more than ``margin`` below the top score, whichever comes first. M is ``m_ratio`` of K,
+    clamped to [m_min, m].
+    """
+    n=len(scores)
+    if n==0: return 0,0
+    k=n; top=scores[0]
+    for i in range(1,n):
+        if i>=k_min and (scores[i-1]-scores[i]>=gap or top-scores[i]>margin):
+            k=i; break
+    return k, max(min(m_min,k), min(m, k, math.ceil(k*m_ratio)))
+class CascadeReranker:
+    """MiniCOIL over all K candidates, then ColBERT over the best M of those.
+
+    Output is the ColBERT-ranked survivors, then the rest of the MiniCOIL ranking, then (adaptive mode)
+    any dense candidates past K, in dense order with ``rerank_score`` -inf (``score`` keeps the dense
+    score). ``history`` records K, M and per-stage time for each reranked query.
+    """
+    def __init__(self, minicoil, colbert, m: int = CASCADE_M, adaptive: bool = CASCADE_ADAPTIVE):
+        self.minicoil=minicoil; self.colbert=colbert; self.m=m; self.adaptive=adaptive
+        self.vector_names=minicoil.vector_names+colbert.vector_names
+        self.model_name=f"{minicoil.model_name}>{colbert.model_name}@m={m},adaptive={int(adaptive)}"
+        self.history: List[Dict[str,Any]]=[]
+    def server_stages(self, queries: List[str]):
+        """Nested MiniCOIL -> ColBERT stages for ``qdrant.search.retrieve_rescored``; always uses the fixed M."""
+        return [[("minicoil", sv, self.m), ("colbert", t, None)]
+                for sv,t in zip(self.minicoil.encode_queries(queries), self.colbert.encode_queries(queries))]
+    def depth(self, candidates: List[Dict[str,Any]]) -> Tuple[int,int]:
+        if self.adaptive: return adaptive_depth([c["score"] for c in candidates], m=self.m)
+        return len(candidates), min(self.m, len(candidates))
+    @staticmethod
+    def _tail(cands: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        # Every output carries a rerank_score (the query cache stores them); unreranked ones rank last.
+        for c in cands: c["rerank_score"]=float("-inf")
+        return cands
+    def _log(self, k, m, t_mc, t_cb):
+        self.history.append({"k":k, "m":m, "minicoil_ms":1000*t_mc, "colbert_ms":1000*t_cb}); del self.history[:-10000]
+    def _run(self, query: str, candidates: List[Dict[str,Any]], stored: bool) -> List[Dict[str,Any]]:
+        k,m=self.depth(candidates); head,tail=candidates[:k],candidates[k:]
+        t0=time.time(); mc=self.minicoil.rerank(query, head); t1=time.time()
+        for c in mc: c["minicoil_score"]=c["rerank_score"]
+        top=(self.colbert.rerank_stored if stored else self.colbert.rerank)(query, mc[:m]); t2=time.time()
+        self._log(k, m, t1-t0, t2-t1)
+        return top+mc[m:]+self._tail(tail)
+    def rerank(self, query: str, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        return self._run(query, candidates, stored=False)
+    def rerank_stored(self, query: str, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        return self._run(query, candidates, stored=True)
+    def rerank_batch(self, queries: List[str], candidate_lists: List[List[Dict[str,Any]]], stored: bool = False) -> List[List[Dict[str,Any]]]:
+        depths=[self.depth(cs) for cs in candidate_lists]
+        t0=time.time(); mcs=self.minicoil.rerank_batch(queries, [cs[:k] for cs,(k,_) in zip(candidate_lists,depths)]); t1=time.time()
+        for mc in mcs:
+            for c in mc: c["minicoil_score"]=c["rerank_score"]
+        tops=self.colbert.rerank_batch(queries, [mc[:m] for mc,(_,m) in zip(mcs,depths)], stored=stored); t2=time.time()
+        n=max(1,len(queries))
+        for k,m in depths: self._log(k, m, (t1-t0)/n, (t2-t1)/n)
+        return [top+mc[m:]+self._tail(cs[k:]) for top,mc,cs,(k,m) in zip(tops,mcs,candidate_lists,depths)]
+    def summary(self) -> Dict[str,float]:
+        """Mean K, M and stage latencies over ``history``."""
+        h=self.history
+        if not h: return {}
+        return {key: sum(x[key] for x in h)/len(h) for key in ("k","m","minicoil_ms","colbert_ms")}
@@ -1,47 +1,155 @@
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import os
 import torch
-from transformers import AutoTokenizer, AutoModel
+from transformers import AutoTokenizer
+from ..config import COLBERT_BACKEND, COLBERT_STORE, COLBERT_TOKEN_BUDGET, INFER_THREADS
 from ..logging import get_logger
+from ..trace import span, traced
+from ..data.doc_store import texts
+from .backend import load_token_encoder
+from .batching import token_batches, fixed_batches, record
 logger=get_logger(__name__)
+@traced("colbert.maxsim")
 @torch.inference_mode()
-def _maxsim(q_emb, d_emb):
-    sim = torch.matmul(q_emb, d_emb.transpose(0,1))
-    return sim.max(dim=1).values.sum().item()
+def _maxsim(q, q_mask, d, d_mask, q_index: Optional[torch.Tensor] = None):
+    """Batched MaxSim over padded token tensors.
+
+    q: [Q,Lq,D] with q_mask [Q,Lq]; d: [B,L,D] with d_mask [B,L].
+    With ``q_index=None`` every document is scored against every query -> [Q,B].
+    Otherwise document b is only scored against query ``q_index[b]`` -> [B].
+    Empty queries/documents score -inf.
+    """
+    if d.shape[1]==0:
+        shape=(q.shape[0], d.shape[0]) if q_index is None else (d.shape[0],)
+        return torch.full(shape, float("-inf"), device=d.device)
+    if q_index is None:
+        sim=torch.einsum("qid,bjd->qbij", q, d)
+        sim=sim.masked_fill(~d_mask[None,:,None,:], float("-inf"))
+        best=sim.max(dim=-1).values.masked_fill(~q_mask[:,None,:], 0.0)
+        return best.sum(dim=-1).masked_fill(~q_mask.any(dim=-1)[:,None], float("-inf"))
+    qq=q[q_index]; qm=q_mask[q_index]
+    sim=torch.bmm(qq, d.transpose(1,2))
+    sim=sim.masked_fill(~d_mask[:,None,:], float("-inf"))
+    best=sim.max(dim=-1).values.masked_fill(~qm, 0.0)
+    return best.sum(dim=-1).masked_fill(~qm.any(dim=-1), float("-inf"))
+def _pad(parts: List[torch.Tensor], masks: List[torch.Tensor], rows: Optional[List[List[int]]] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Concatenate [b,L_i,D] batches (and [b,L_i] masks) along dim 0, right-padding to the longest L;
+    with ``rows``, batch i fills output rows ``rows[i]`` instead."""
+    B=sum(p.shape[0] for p in parts); L=max(p.shape[1] for p in parts)
+    out=parts[0].new_zeros(B,L,parts[0].shape[-1]); mask=masks[0].new_zeros(B,L)
+    o=0
+    for j,(p,m) in enumerate(zip(parts,masks)):
+        b,l=m.shape
+        idx=slice(o,o+b) if rows is None else torch.tensor(rows[j], device=out.device)
+        out[idx,:l]=p; mask[idx,:l]=m; o+=b
+    return out, mask
 class ColbertReranker:
-    def __init__(self, checkpoint: str = "colbert-ir/colbertv2.0"):
-        logger.info("Loading HF ColBERT checkpoint for reranking: %s", checkpoint)
+    vector_name="colbert"
+    def __init__(self, checkpoint: str = "colbert-ir/colbertv2.0", backend: str = COLBERT_BACKEND, store: str = COLBERT_STORE,
+                 token_budget: int = COLBERT_TOKEN_BUDGET, threads: int = INFER_THREADS):
+        logger.info("Loading HF ColBERT checkpoint for reranking: %s (backend=%s)", checkpoint, backend)
+        self.store=None
+        if store and os.path.isfile(os.path.join(store,"meta.json")):
+            from .colbert_store import ColbertStore
+            self.store=ColbertStore(store)
+            logger.info("Using local ColBERT token store %s (%d docs, %.0f bytes/doc)", store, len(self.store), self.store.bytes_per_doc())
+        # With a local store, "stored" mode reads tokens from it instead of fetching them from Qdrant.
+        self.vector_names=[] if self.store else ["colbert"]
+        self.model_name=checkpoint; self.backend=backend
         self.tok=AutoTokenizer.from_pretrained(checkpoint)
-        self.model=AutoModel.from_pretrained(checkpoint).eval()
-        self.device=torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
+        self.encoder,self.linear,self.dim=load_token_encoder(checkpoint, backend, self.tok, threads)
+        # Quantized and ONNX models are CPU-only.
+        self.device=torch.device("cuda" if torch.cuda.is_available() and backend=="torch" else "cpu")
+        if backend=="torch": self.encoder.module.to(self.device)
+        if self.linear is not None: self.linear.to(self.device)
         self.cls_id=getattr(self.tok,"cls_token_id",None)
         self.sep_id=getattr(self.tok,"sep_token_id",None)
-        self.has_linear=hasattr(self.model,"linear")
+        self.has_linear=self.linear is not None
         self.max_q_len=64; self.max_d_len=300
+        # Documents per batch before token-budget batching; the default budget keeps its worst case.
+        self.fixed_bs=16 if self.device.type=="cuda" else 8
+        self.token_budget=token_budget or self.fixed_bs*self.max_d_len
     @torch.inference_mode()
-    def _enc_tokens(self, texts, max_len):
-        enc=self.tok(texts, padding=True, truncation=True, max_length=max_len, return_tensors="pt").to(self.device)
-        out=self.model(**enc)
-        hs = out.last_hidden_state if hasattr(out,"last_hidden_state") else out[0]
-        if self.has_linear: hs=self.model.linear(hs)
-        hs=torch.nn.functional.normalize(hs,p=2,dim=-1)
+    def _forward(self, enc) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Padded token embeddings [B,L,D] and a [B,L] mask of the tokens that take part in MaxSim."""
+        with span("colbert.forward"):
+            hs=self.encoder(**enc).to(self.device)
+            if self.has_linear: hs=self.linear(hs)
+            hs=torch.nn.functional.normalize(hs,p=2,dim=-1)
         attn=enc["attention_mask"].bool()
         if self.cls_id is not None: attn = attn & (enc["input_ids"] != self.cls_id)
         if self.sep_id is not None: attn = attn & (enc["input_ids"] != self.sep_id)
-        embs=[]; B,L,D=hs.shape
-        for b in range(B):
-            m=attn[b]; embs.append(hs[b][m])
-        return embs
-    def _enc_q(self,q): return self._enc_tokens([q], self.max_q_len)[0].cpu()
+        return hs.masked_fill(~attn[...,None], 0.0), attn
+    def _enc_tokens(self, texts, max_len) -> Tuple[torch.Tensor, torch.Tensor]:
+        with span("colbert.tokenize"):
+            enc=self.tok(texts, padding=True, truncation=True, max_length=max_len, return_tensors="pt").to(self.device)
+        return self._forward(enc)
+    def _enc_q(self, queries: List[str]): return self._enc_tokens(queries, self.max_q_len)
+    @torch.inference_mode()
     def _enc_ds(self, texts):
-        bs = 16 if self.device.type=="cuda" else 8
-        out=[]; 
-        for i in range(0,len(texts),bs):
-            out+=self._enc_tokens(texts[i:i+bs], self.max_d_len)
-        return [x.cpu() for x in out]
-    def rerank(self, query:str, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
-        q_emb=self._enc_q(query); d_embs=self._enc_ds([c["text"] for c in candidates])
-        scores=[(_maxsim(q_emb,d) if q_emb.numel() and d.numel() else float("-inf")) for d in d_embs]
+        """Documents tokenized once, encoded longest first in batches of at most ``token_budget`` padded
+        tokens, and returned in input order."""
+        if not len(texts):
+            return torch.empty(0,0,self.dim,device=self.device), torch.empty(0,0,dtype=torch.bool,device=self.device)
+        with span("colbert.tokenize"):
+            enc=self.tok(list(texts), truncation=True, max_length=self.max_d_len)
+        lengths=[len(x) for x in enc["input_ids"]]
+        batches=token_batches(lengths, self.token_budget)
+        record("colbert", lengths, batches, fixed_batches(len(lengths), self.fixed_bs))
+        parts=[]; masks=[]
+        for b in batches:
+            with span("colbert.tokenize"):
+                be=self.tok.pad({k: [v[i] for i in b] for k,v in enc.items()}, return_tensors="pt").to(self.device)
+            hs,m=self._forward(be); parts.append(hs); masks.append(m)
+        return _pad(parts, masks, batches)
+    def _stored(self, candidates: List[Dict[str,Any]]):
+        """Token matrices stored at ingest as a padded [B,L,D] tensor plus mask: decoded from the local
+        store when one is configured, else from ``c["colbert"]`` fetched with the candidates."""
+        if self.store is not None:
+            d,dm=self.store.decode([c["id"] for c in candidates])
+            return torch.from_numpy(d).to(self.device), torch.from_numpy(dm).to(self.device)
+        mats=[torch.tensor(c.get("colbert") or [], dtype=torch.float32).reshape(-1,self.dim) for c in candidates]
+        d,dm=_pad([m[None] for m in mats], [torch.ones(1,m.shape[0],dtype=torch.bool) for m in mats])
+        return d.to(self.device), dm.to(self.device)
+    @staticmethod
+    def _apply(scores: List[float], candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
         for s,c in zip(scores,candidates): c["rerank_score"]=float(s)
         return sorted(candidates, key=lambda x: x["rerank_score"], reverse=True)
+    def encode_query(self, query:str) -> List[List[float]]:
+        """Query token matrix as nested lists, ready for a Qdrant multivector query."""
+        return self.encode_queries([query])[0]
+    def encode_queries(self, queries:List[str]) -> List[List[List[float]]]:
+        q,m=self._enc_q(queries); q=q.cpu(); m=m.cpu()
+        return [q[i][m[i]].tolist() for i in range(q.shape[0])]
+    def server_stages(self, queries:List[str]):
+        """Per query, the ``qdrant.search.retrieve_rescored`` stages for MaxSim over the stored "colbert" vectors."""
+        return [[(self.vector_name, t, None)] for t in self.encode_queries(queries)]
+    def encode_docs(self, texts:List[str], as_numpy: bool = False) -> List[List[List[float]]]:
+        """Document token matrices as nested lists (``as_numpy``: float32 [L_i, D] arrays), for storing as a
+        Qdrant multivector at ingest."""
+        d,m=self._enc_ds(texts); d=d.cpu(); m=m.cpu()
+        if as_numpy: return [d[i][m[i]].numpy() for i in range(d.shape[0])]
+        return [d[i][m[i]].tolist() for i in range(d.shape[0])]
+    def rerank_stored(self, query:str, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        """Rerank from token matrices stored at ingest (``c["colbert"]``); only the query is encoded."""
+        if not candidates: return []
+        q,qm=self._enc_q([query]); d,dm=self._stored(candidates)
+        return self._apply(_maxsim(q,qm,d,dm)[0].cpu().tolist(), candidates)
+    def rerank(self, query:str, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        if not candidates: return []
+        q,qm=self._enc_q([query]); d,dm=self._enc_ds(texts(candidates))
+        return self._apply(_maxsim(q,qm,d,dm)[0].cpu().tolist(), candidates)
+    def rerank_batch(self, queries: List[str], candidate_lists: List[List[Dict[str,Any]]], stored: bool = False) -> List[List[Dict[str,Any]]]:
+        """Rerank several queries' candidate sets with one query encode and one MaxSim call."""
+        if not queries: return []
+        flat=[c for cs in candidate_lists for c in cs]
+        if not flat: return [[] for _ in queries]
+        q,qm=self._enc_q(queries)
+        d,dm=self._stored(flat) if stored else self._enc_ds(texts(flat))
+        owner=torch.tensor([i for i,cs in enumerate(candidate_lists) for _ in cs], device=self.device)
+        scores=_maxsim(q,qm,d,dm,q_index=owner).cpu().tolist()
+        out=[]; o=0
+        for cs in candidate_lists:
+            out.append(self._apply(scores[o:o+len(cs)], cs)); o+=len(cs)
+        return out
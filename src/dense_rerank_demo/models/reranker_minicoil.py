@@ -1,28 +1,91 @@
 
 from typing import List, Dict, Any, Tuple
-from functools import lru_cache
+from collections import OrderedDict
+import numpy as np
 from fastembed import SparseTextEmbedding
+from qdrant_client import models as qm
+from ..trace import span, traced
+from ..data.doc_store import texts
+from ..cache import collection_generation
+def _sparse(sv) -> Tuple[np.ndarray, np.ndarray]:
+    """(indices, values) arrays from a fastembed SparseEmbedding, a qm.SparseVector or a {"indices","values"} dict."""
+    if isinstance(sv, dict): idx,val=sv["indices"],sv["values"]
+    else: idx,val=sv.indices,sv.values
+    return np.asarray(idx,dtype=np.int64), np.asarray(val,dtype=np.float32)
+def _sparse_scores(q_idx, q_val, rows, idx, val, n) -> np.ndarray:
+    """Dot products of one sparse query with n sparse docs packed as COO (rows, idx, val)."""
+    if not len(q_idx) or not len(idx): return np.zeros(n, dtype=np.float32)
+    order=np.argsort(q_idx); qi=q_idx[order]; qv=q_val[order]
+    pos=np.minimum(np.searchsorted(qi, idx), len(qi)-1)
+    hit=qi[pos]==idx
+    return np.bincount(rows[hit], weights=val[hit]*qv[pos[hit]], minlength=n)
 class MiniCOILReranker:
-    def __init__(self, model_name:str="Qdrant/minicoil-v1"):
-        self.model=SparseTextEmbedding(model_name=model_name)
+    vector_name="minicoil"; vector_names=["minicoil"]
+    def __init__(self, model_name:str="Qdrant/minicoil-v1", cache_size:int=10000, threads:int=0):
+        self.model_name=model_name
+        self.model=SparseTextEmbedding(model_name=model_name, threads=threads or None)
+        self.cache_size=cache_size
+        self._cache: "OrderedDict[str, Tuple[np.ndarray,np.ndarray]]"=OrderedDict(); self._gen=collection_generation()
+    def encode_query(self, query:str) -> qm.SparseVector:
+        return self.embed_docs([query])[0]
+    def encode_queries(self, queries:List[str]) -> List[qm.SparseVector]:
+        return self.embed_docs(queries)
+    def server_stages(self, queries:List[str]):
+        """Per query, the ``qdrant.search.retrieve_rescored`` stages for scoring the stored "minicoil" vectors."""
+        return [[(self.vector_name, sv, None)] for sv in self.encode_queries(queries)]
+    def embed_docs(self, texts:List[str], as_numpy: bool = False) -> List[qm.SparseVector]:
+        """Sparse vectors as ``qm.SparseVector`` (``as_numpy``: (indices, values) arrays), e.g. for storing as
+        the "minicoil" vector at ingest."""
+        out=[]
+        with span("minicoil.embed"):
+            for sv in self.model.embed(texts):
+                idx,val=_sparse(sv)
+                out.append((idx,val) if as_numpy else qm.SparseVector(indices=idx.tolist(), values=val.tolist()))
+        return out
+    def _docs(self, candidates: List[Dict[str,Any]]) -> List[Tuple[np.ndarray,np.ndarray]]:
+        """Sparse vectors for candidates: stored ``c["minicoil"]`` if fetched, else cache, else one batched embed.
+
+        The cache is keyed by doc id and dropped whenever the collection generation changes (a re-ingest).
+        """
+        gen=collection_generation()
+        if gen!=self._gen: self._cache.clear(); self._gen=gen
+        out=[None]*len(candidates); miss=[]
+        for i,c in enumerate(candidates):
+            if c.get(self.vector_name) is not None: out[i]=_sparse(c[self.vector_name]); continue
+            hit=self._cache.get(c["id"])
+            if hit is not None: self._cache.move_to_end(c["id"]); out[i]=hit
+            else: miss.append(i)
+        if miss:
+            with span("minicoil.embed"):
+                for i,sv in zip(miss, self.model.embed(texts([candidates[i] for i in miss]))):
+                    out[i]=_sparse(sv); self._cache[candidates[i]["id"]]=out[i]
+            while len(self._cache)>self.cache_size: self._cache.popitem(last=False)
+        return out
     @staticmethod
-    def _dot(a_idx,a_val,b_idx,b_val):
-        i=j=0; acc=0.0
-        while i<len(a_idx) and j<len(b_idx):
-            if a_idx[i]==b_idx[j]:
-                acc+=a_val[i]*b_val[j]; i+=1; j+=1
-            elif a_idx[i]<b_idx[j]: i+=1
-            else: j+=1
-        return acc
-    @lru_cache(maxsize=10000)
-    def _doc_cached(self, text:str) -> Tuple[Tuple[int,...],Tuple[float,...]]:
-        sv=next(self.model.embed([text]))
-        return tuple(sv.indices), tuple(sv.values)
-    def rerank(self, query:str, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
-        q_sv=next(self.model.embed([query])); q_idx,q_val=q_sv.indices,q_sv.values
-        scores=[]
-        for c in candidates:
-            d_idx,d_val=self._doc_cached(c["text"])
-            scores.append(self._dot(q_idx,q_val,list(d_idx),list(d_val)))
+    @traced("minicoil.score")
+    def _score(q, docs: List[Tuple[np.ndarray,np.ndarray]]) -> np.ndarray:
+        rows=np.repeat(np.arange(len(docs)), [len(d[0]) for d in docs])
+        idx=np.concatenate([d[0] for d in docs]) if docs else np.empty(0,dtype=np.int64)
+        val=np.concatenate([d[1] for d in docs]) if docs else np.empty(0,dtype=np.float32)
+        return _sparse_scores(q[0], q[1], rows, idx, val, len(docs))
+    @staticmethod
+    def _apply(scores, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
         for s,c in zip(scores,candidates): c["rerank_score"]=float(s)
         return sorted(candidates, key=lambda x: x["rerank_score"], reverse=True)
+    def rerank(self, query:str, candidates: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        with span("minicoil.embed"): q=_sparse(next(self.model.embed([query])))
+        return self._apply(self._score(q, self._docs(candidates)), candidates)
+    def rerank_batch(self, queries: List[str], candidate_lists: List[List[Dict[str,Any]]], stored: bool = False) -> List[List[Dict[str,Any]]]:
+        """Rerank several queries' candidate sets with one query embed call and one doc embed call.
+
+        ``stored`` is accepted for interface parity with ``ColbertReranker``; fetched vectors are always used.
+        """
+        if not queries: return []
+        with span("minicoil.embed"): qs=[_sparse(sv) for sv in self.model.embed(queries)]
+        docs=self._docs([c for cs in candidate_lists for c in cs])
+        out=[]; o=0
+        for q,cs in zip(qs,candidate_lists):
+            out.append(self._apply(self._score(q, docs[o:o+len(cs)]), cs)); o+=len(cs)
+        return out
+    # Stored vectors are picked up by ``rerank`` itself; alias keeps the reranker interface uniform.
+    rerank_stored=rerank
@@ -0,0 +1,93 @@
+
+"""Data-parallel document encoding: one model replica per worker process.
+
+``DocEncoder`` turns a batch of texts into everything ingest stores (dense vectors, ColBERT token
+matrices, MiniCOIL sparse vectors) as NumPy arrays, which pickle cheaply between processes.
+``EncoderPool`` runs a ``DocEncoder`` in each of ``workers`` spawned processes with its thread count
+pinned to ``threads`` (default: cores / workers) and yields results in submission order. Converted
+models for non-torch backends (see ``backend``) are built once, in the parent, before the workers start.
+
+This module keeps heavy imports inside functions: a spawned worker imports it to find its
+initializer, and the thread settings must be in the environment before torch or ONNX Runtime load.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+import multiprocessing as mp
+
+Encoded = Tuple[Any, Optional[List[Any]], Optional[List[Tuple[Any, Any]]]]
+
+class DocEncoder:
+    """Ingest-time models; ``encode`` returns (dense [N,dim] | None, ColBERT [L_i,D] arrays | None,
+    MiniCOIL (indices, values) pairs | None)."""
+    def __init__(self, dense: bool = True, colbert: bool = False, minicoil: bool = False, threads: int = 0):
+        from ..config import EMB_MODEL, EMB_BACKEND, COLBERT_CKPT, COLBERT_BACKEND, SPARSE_MODEL, INFER_THREADS
+        # Passed down explicitly: in a worker, config was imported before ``_init`` set INFER_THREADS.
+        threads=threads or INFER_THREADS
+        self.emb=self.colbert=self.minicoil=None
+        if dense:
+            from .embedder import Embedder
+            self.emb=Embedder(EMB_MODEL, EMB_BACKEND, threads=threads)
+        if colbert:
+            from .reranker_colbert import ColbertReranker
+            self.colbert=ColbertReranker(COLBERT_CKPT, COLBERT_BACKEND, store="", threads=threads)
+        if minicoil:
+            from .reranker_minicoil import MiniCOILReranker
+            self.minicoil=MiniCOILReranker(SPARSE_MODEL, threads=threads)
+    def dims(self) -> Tuple[Optional[int], Optional[int]]:
+        return (self.emb.dim if self.emb else None), (self.colbert.dim if self.colbert else None)
+    def encode(self, texts: List[str]) -> Encoded:
+        return (self.emb.encode(texts, as_numpy=True, bucketed=True) if self.emb else None,
+                self.colbert.encode_docs(texts, as_numpy=True) if self.colbert else None,
+                self.minicoil.embed_docs(texts, as_numpy=True) if self.minicoil else None)
+
+_worker: Optional[DocEncoder]=None
+
+def _init(dense: bool, colbert: bool, minicoil: bool, threads: int):
+    global _worker
+    for k in ("OMP_NUM_THREADS","MKL_NUM_THREADS","OPENBLAS_NUM_THREADS","INFER_THREADS"): os.environ[k]=str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"]="false"
+    from .backend import configure_threads
+    configure_threads(threads)
+    _worker=DocEncoder(dense, colbert, minicoil, threads)
+
+def prepare_artifacts(dense: bool = True, colbert: bool = False):
+    """Build the converted models the configured backends need, once, so workers only load them."""
+    from ..config import EMB_MODEL, EMB_BACKEND, COLBERT_CKPT, COLBERT_BACKEND
+    from .backend import artifact_ready
+    if dense and not artifact_ready(EMB_MODEL, EMB_BACKEND, sentence_transformer=True):
+        from .embedder import Embedder
+        Embedder(EMB_MODEL, EMB_BACKEND)
+    if colbert and not artifact_ready(COLBERT_CKPT, COLBERT_BACKEND):
+        from .reranker_colbert import ColbertReranker
+        ColbertReranker(COLBERT_CKPT, COLBERT_BACKEND, store="")
+
+def _dims():
+    return _worker.dims()
+
+def _encode(texts: List[str]) -> Encoded:
+    return _worker.encode(texts)
+
+class EncoderPool:
+    """``DocEncoder.encode`` sharded batch-wise across ``workers`` processes."""
+    def __init__(self, workers: int, dense: bool = True, colbert: bool = False, minicoil: bool = False, threads: int = 0):
+        self.workers=workers; self.threads=threads or max(1, (os.cpu_count() or 1)//workers)
+        # Otherwise every worker would export/quantize and save the same ARTIFACT_DIR files at once.
+        prepare_artifacts(dense, colbert)
+        # spawn: forked children would inherit the parent's torch/OpenMP thread pools.
+        self.pool=ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                      initializer=_init, initargs=(dense, colbert, minicoil, self.threads))
+    def dims(self) -> Tuple[Optional[int], Optional[int]]:
+        return self.pool.submit(_dims).result()
+    def map(self, batches: Iterable[List[str]], ahead: int = 0) -> Iterator[Encoded]:
+        """Encode ``batches`` keeping up to ``ahead`` (default 2 x workers) in flight; results come back in order."""
+        ahead=ahead or 2*self.workers; inflight=deque()
+        for texts in batches:
+            inflight.append(self.pool.submit(_encode, texts))
+            if len(inflight)>=ahead: yield inflight.popleft().result()
+        while inflight: yield inflight.popleft().result()
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
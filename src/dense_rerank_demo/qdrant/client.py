@@ -1,5 +1,16 @@
 
-from qdrant_client import QdrantClient
-from ..config import QDRANT_URL, QDRANT_API_KEY
-def get_client() -> QdrantClient:
-    return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY or None, prefer_grpc=False)
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from ..config import QDRANT_URL, QDRANT_API_KEY, QDRANT_GRPC, QDRANT_GRPC_PORT, QDRANT_PATH
+def _local(path: str):
+    return {"location": path} if path==":memory:" else {"path": path}
+def _kwargs(prefer_grpc: bool):
+    # QDRANT_PATH switches to qdrant-client's local mode: ":memory:" or an on-disk directory, no server needed.
+    if QDRANT_PATH: return _local(QDRANT_PATH)
+    return dict(url=QDRANT_URL, api_key=QDRANT_API_KEY or None, prefer_grpc=prefer_grpc, grpc_port=QDRANT_GRPC_PORT)
+def get_client(prefer_grpc: bool = QDRANT_GRPC) -> QdrantClient:
+    return QdrantClient(**_kwargs(prefer_grpc))
+def get_async_client(prefer_grpc: bool = QDRANT_GRPC) -> AsyncQdrantClient:
+    return AsyncQdrantClient(**_kwargs(prefer_grpc))
+def get_local_client(path: str = ":memory:") -> QdrantClient:
+    """Local-mode client regardless of ``QDRANT_PATH``/``QDRANT_URL`` (benchmarks, tests)."""
+    return QdrantClient(**_local(path))
@@ -1,41 +1,356 @@
 
-from typing import Dict, Any, List
-from uuid import uuid5, NAMESPACE_DNS
-from random import Random
-import os, time
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+from uuid import uuid4, uuid5, NAMESPACE_DNS
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import hashlib, os, json, shutil, time
 from qdrant_client import QdrantClient, models as qm
 from tqdm import tqdm
-from ..config import COLLECTION, BATCH_SIZE, MAX_DOCS, MAX_CHARS, EMB_MODEL
-from ..models.embedder import DenseEmbedder
+from ..config import (COLLECTION, BATCH_SIZE, MAX_DOCS, MAX_CHARS, COLBERT_INGEST,
+                      MINICOIL_INGEST, UPSERT_PARALLEL, UPSERT_QUEUE, INGEST_CHECKPOINT, COLBERT_STORE,
+                      DOC_STORE, INGEST_WORKERS, INGEST_WORKER_THREADS, INGEST_MANIFEST, EMB_MODEL, COLBERT_CKPT, SPARSE_MODEL)
+from ..models.workers import DocEncoder, EncoderPool, Encoded
+from ..models.batching import format_padding_stats
+from ..cache import bump_generation
+from ..trace import span
 from ..logging import get_logger
 logger=get_logger(__name__)
 def _to_point_id(doc_id: Any):
     s=str(doc_id); return int(s) if s.isdigit() else str(uuid5(NAMESPACE_DNS, f"beir::{s}"))
-def recreate_collection_dense(client: QdrantClient, dim: int):
+def _alias_target(client: QdrantClient, alias: str) -> Optional[str]:
+    """Collection the alias ``alias`` points to, or ``None`` when it is not an alias."""
+    return next((a.collection_name for a in client.get_aliases().aliases if a.alias_name==alias), None)
+def recreate_collection_dense(client: QdrantClient, dim: int, colbert_dim: Optional[int] = None, minicoil: bool = False,
+                              collection: str = COLLECTION):
+    target=_alias_target(client, collection)
+    if target is not None:
+        # A plain rebuild replaces a shadow-built collection served through the alias.
+        client.update_collection_aliases(change_aliases_operations=[qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=collection))])
+        client.delete_collection(collection_name=target)
     existing=[c.name for c in client.get_collections().collections]
-    if COLLECTION in existing: client.delete_collection(collection_name=COLLECTION)
+    if collection in existing: client.delete_collection(collection_name=collection)
+    vectors={"dense": qm.VectorParams(size=dim, distance=qm.Distance.COSINE)}
+    if colbert_dim:
+        # Token matrices are only ever compared with MaxSim, never used for HNSW search.
+        vectors["colbert"]=qm.VectorParams(
+            size=colbert_dim, distance=qm.Distance.DOT,
+            multivector_config=qm.MultiVectorConfig(comparator=qm.MultiVectorComparator.MAX_SIM),
+            hnsw_config=qm.HnswConfigDiff(m=0),
+        )
     client.recreate_collection(
-        collection_name=COLLECTION,
-        vectors_config={"dense": qm.VectorParams(size=dim, distance=qm.Distance.COSINE)},
-        sparse_vectors_config=None,
+        collection_name=collection,
+        vectors_config=vectors,
+        sparse_vectors_config={"minicoil": qm.SparseVectorParams()} if minicoil else None,
     )
-    logger.info("Collection %s ready (dense, dim=%d).", COLLECTION, dim)
+    if collection==COLLECTION: bump_generation(COLLECTION)
+    logger.info("Collection %s ready (%s%s, dim=%d).", collection, "+".join(vectors), "+minicoil" if minicoil else "", dim)
 def _prep(meta: Dict[str,str]) -> str:
     title=(meta.get("title") or "").strip(); body=(meta.get("text") or "").strip()
     txt=(title+" "+body).strip()
     if MAX_CHARS and MAX_CHARS>0 and len(txt)>MAX_CHARS: txt=txt[:MAX_CHARS]
     return txt
-def index_corpus_dense(client: QdrantClient, corpus: Dict[str, Dict[str,str]]):
-    items=list(corpus.items()); Random(42).shuffle(items)
-    if MAX_DOCS and MAX_DOCS>0: items=items[:MAX_DOCS]
-    emb=DenseEmbedder(EMB_MODEL); recreate_collection_dense(client, emb.dim)
-    total=len(items); logger.info("Indexing %d documents (dense)...", total)
-    for bi in tqdm(range(0,total,BATCH_SIZE)):
-        chunk=items[bi:bi+BATCH_SIZE]
-        ids=[doc_id for doc_id,_ in chunk]
-        texts=[_prep(meta) for _,meta in chunk]
-        t0=time.time(); vecs=emb.encode(texts); t1=time.time()
-        pts=[qm.PointStruct(id=_to_point_id(ids[j]), vector={"dense": vecs[j].tolist()}, payload={"doc_id":str(ids[j]),"text":texts[j]}) for j in range(len(ids))]
-        client.upsert(collection_name=COLLECTION, points=pts); t2=time.time()
-        logger.info("[batch %d] embed: %.2fs | upsert: %.2fs | total: %.2fs", bi//BATCH_SIZE, (t1-t0), (t2-t1), (t2-t0))
+def content_hash(text: str) -> str:
+    """Short hash of a document's indexed text; stored in the payload and the ingest manifest."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+def _checkpoint_path() -> str:
+    return INGEST_CHECKPOINT or f".ingest_{COLLECTION}.json"
+def _read_checkpoint(path: str) -> int:
+    """Documents to skip when resuming; 0 (a fresh build) when the checkpoint's run completed."""
+    try:
+        with open(path) as f: ck=json.load(f)
+    except (OSError, ValueError): return 0
+    if ck.get("collection")!=COLLECTION or ck.get("complete"): return 0
+    return int(ck.get("docs",0))
+def _write_checkpoint(path: str, docs: int, complete: bool = False):
+    tmp=path+".tmp"
+    with open(tmp,"w") as f: json.dump({"collection":COLLECTION,"docs":docs,"complete":complete,"time":time.time()}, f)
+    os.replace(tmp, path)
+def _manifest_path() -> str:
+    return INGEST_MANIFEST or f".ingest_{COLLECTION}.manifest.json"
+def _signature(with_colbert: bool, with_minicoil: bool) -> Dict[str, Any]:
+    """Settings the stored vectors depend on; an incremental ingest needs them unchanged."""
+    return {"emb_model": EMB_MODEL, "colbert": COLBERT_CKPT if with_colbert else "",
+            "minicoil": SPARSE_MODEL if with_minicoil else "", "max_chars": MAX_CHARS}
+def _read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f: m=json.load(f)
+    except (OSError, ValueError): return None
+    return m if m.get("collection")==COLLECTION else None
+def _write_manifest(path: str, signature: Dict[str, Any], hashes: Dict[str, str]):
+    """doc_id -> content hash of everything in the collection, with the settings it was built with."""
+    tmp=path+".tmp"
+    with open(tmp,"w",encoding="utf-8") as f:
+        json.dump({"collection":COLLECTION,"signature":signature,"time":time.time(),"hashes":hashes}, f)
+    os.replace(tmp, path)
+def _scan_hashes(client: QdrantClient, collection: str = COLLECTION) -> Dict[str, Optional[str]]:
+    """doc_id -> payload ``content_hash`` of every point (``None`` for points ingested before hashes existed)."""
+    out={}; offset=None
+    while True:
+        pts,offset=client.scroll(collection_name=collection, limit=1000, with_payload=["doc_id","content_hash"], offset=offset)
+        for p in pts: out[str(p.payload["doc_id"])]=p.payload.get("content_hash")
+        if offset is None: return out
+def _vector_config(client: QdrantClient, collection: str = COLLECTION) -> Dict[str, Any]:
+    """Vectors ``collection`` was created with, in the shape ``_Encoders.vector_config`` describes them."""
+    p=client.get_collection(collection).config.params; v=p.vectors if isinstance(p.vectors, dict) else {}
+    return {"dense": v["dense"].size if "dense" in v else None, "colbert": v["colbert"].size if "colbert" in v else None,
+            "minicoil": "minicoil" in (p.sparse_vectors or {})}
+def _exists(client: QdrantClient, collection: str = COLLECTION) -> bool:
+    return _alias_target(client, collection) is not None or client.collection_exists(collection)
+def switch_alias(client: QdrantClient, alias: str, target: str) -> Optional[str]:
+    """Point ``alias`` at collection ``target`` in one atomic alias update, then drop the collection it
+    served before (returned). A plain collection named ``alias`` is replaced once, with a brief gap."""
+    old=_alias_target(client, alias); ops=[]
+    if old is not None:
+        ops.append(qm.DeleteAliasOperation(delete_alias=qm.DeleteAlias(alias_name=alias)))
+    elif client.collection_exists(alias):
+        logger.warning("%s is a plain collection; replacing it with an alias (queries fail until the switch below)", alias)
+        client.delete_collection(collection_name=alias)
+    ops.append(qm.CreateAliasOperation(create_alias=qm.CreateAlias(collection_name=target, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=ops)
+    logger.info("Alias %s -> %s%s", alias, target, f" (was {old})" if old else "")
+    if old is not None and old!=target: client.delete_collection(collection_name=old)
+    return old
+def _swap_dir(new: str, path: str):
+    """Move the directory ``new`` into place at ``path``; readers with files open keep the old copy."""
+    old=path+".old"
+    if os.path.isdir(old): shutil.rmtree(old)
+    if os.path.isdir(path): os.replace(path, old)
+    os.replace(new, path); shutil.rmtree(old, ignore_errors=True)
+class _Encoders:
+    """Models that turn a batch of texts into the named vectors of a point (and, optionally, rows of a
+    local ColBERT token store and of the local doc store).
+
+    With ``workers`` > 0 the models run in an ``EncoderPool`` of that many processes instead of in this one;
+    points and store rows are still assembled here, in corpus order.
+    """
+    def __init__(self, with_colbert: bool, with_minicoil: bool, colbert_store: str = COLBERT_STORE, doc_store: str = DOC_STORE,
+                 workers: int = INGEST_WORKERS, worker_threads: int = INGEST_WORKER_THREADS, collection: str = COLLECTION):
+        self.with_colbert=with_colbert; self.with_minicoil=with_minicoil; self.store_path=colbert_store; self.store=None
+        self.collection=collection; self.hashes: Dict[str,str]={}
+        self.docs_path=doc_store; self.docs=None; self.workers=workers
+        need_colbert=bool(with_colbert or colbert_store)
+        if workers>0:
+            self.local=None; self.pool=EncoderPool(workers, colbert=need_colbert, minicoil=with_minicoil, threads=worker_threads)
+            self.dim,self.colbert_dim=self.pool.dims()
+        else:
+            self.pool=None; self.local=DocEncoder(colbert=need_colbert, minicoil=with_minicoil)
+            self.dim,self.colbert_dim=self.local.dims()
+    def describe(self) -> str:
+        return ("dense"+("+colbert" if self.with_colbert else "")+("+minicoil" if self.with_minicoil else "")
+                +(f", colbert store {self.store_path}" if self.store_path else "")
+                +(f", doc store {self.docs_path}" if self.docs_path else "")
+                +(f", {self.workers} workers x {self.pool.threads} threads" if self.pool else ""))
+    def vector_config(self) -> Dict[str, Any]:
+        return {"dense": self.dim, "colbert": self.colbert_dim if self.with_colbert else None, "minicoil": self.with_minicoil}
+    def recreate(self, client: QdrantClient):
+        if self.collection==COLLECTION and os.path.isfile(_manifest_path()):
+            os.remove(_manifest_path())  # rewritten once the rebuild completes
+        recreate_collection_dense(client, self.dim, self.colbert_dim if self.with_colbert else None, self.with_minicoil,
+                                  collection=self.collection)
+    def open_store(self, resume_docs: int = 0):
+        if self.store_path:
+            from ..models.colbert_store import ColbertStoreWriter
+            self.store=ColbertStoreWriter(self.store_path, self.colbert_dim, resume_docs=resume_docs)
+        if self.docs_path:
+            from ..data.doc_store import DocStoreWriter
+            self.docs=DocStoreWriter(self.docs_path, resume_docs=resume_docs)
+    def close_store(self):
+        if self.store is not None: self.store.finalize(); self.store=None
+        if self.docs is not None: self.docs.finalize(); self.docs=None
+    def close_pool(self):
+        if self.pool is not None: self.pool.close(); self.pool=None
+    def encoded(self, chunks: Iterable[List[Tuple[str,Dict[str,str]]]]) -> Iterator[Tuple[List[Tuple[str,Dict[str,str]]], Encoded]]:
+        """(chunk, ``DocEncoder.encode`` output) per chunk, in order; the pool works ahead on later chunks."""
+        if self.pool is None:
+            for chunk in chunks: yield chunk, self.local.encode([_prep(m) for _,m in chunk])
+            return
+        pending=deque()
+        def texts():
+            for chunk in chunks:
+                pending.append(chunk); yield [_prep(m) for _,m in chunk]
+        for enc in self.pool.map(texts()): yield pending.popleft(), enc
+    def points(self, chunk: List[Tuple[str,Dict[str,str]]], enc: Encoded) -> List[qm.PointStruct]:
+        ids=[str(doc_id) for doc_id,_ in chunk]
+        texts=[_prep(meta) for _,meta in chunk]; hashes=[content_hash(t) for t in texts]
+        self.hashes.update(zip(ids, hashes))
+        vecs,toks,sparse=enc
+        if self.store is not None: self.store.add(ids, toks)
+        if self.docs is not None: self.docs.add(ids, texts)
+        vecs=vecs.tolist(); pts=[]
+        for j in range(len(ids)):
+            vec={"dense": vecs[j]}
+            if self.with_colbert and len(toks[j]): vec["colbert"]=toks[j].tolist()
+            if sparse is not None: vec["minicoil"]=qm.SparseVector(indices=sparse[j][0].tolist(), values=sparse[j][1].tolist())
+            pts.append(qm.PointStruct(id=_to_point_id(ids[j]), vector=vec, payload={"doc_id":ids[j],"text":texts[j],"content_hash":hashes[j]}))
+        return pts
+def _upsert(client: QdrantClient, pts: List[qm.PointStruct], collection: str = COLLECTION) -> float:
+    t0=time.time()
+    with span("ingest.upsert"): client.upsert(collection_name=collection, points=pts)
+    return time.time()-t0
+def _ingest(client: QdrantClient, enc: _Encoders, items: Iterable[Tuple[str,Dict[str,str]]], total: Optional[int] = None,
+            start: int = 0, checkpoint: Optional[str] = None, parallel: int = UPSERT_PARALLEL, queue: int = UPSERT_QUEUE) -> int:
+    """Embed batches (on the calling thread, or ahead of it in ``enc``'s worker pool) while up to ``queue``
+    earlier batches upsert on ``parallel`` threads; returns the number of documents upserted in total.
+
+    The checkpoint only advances past a batch once it and every batch before it have been upserted,
+    so a restart never skips documents.
+    """
+    it=iter(items); done=start; n_batches=0; t_emb=0.0; t_up=0.0; t_start=time.time()
+    inflight=deque()
+    def drain(limit):
+        nonlocal done, t_up
+        while inflight and (len(inflight)>limit or inflight[0][1].done()):
+            end,fut=inflight.popleft(); t_up+=fut.result(); done=end
+            if checkpoint: _write_checkpoint(checkpoint, done)
+    def chunks():
+        while True:
+            chunk=list(islice(it, BATCH_SIZE))
+            if not chunk: return
+            yield chunk
+    with ThreadPoolExecutor(max_workers=max(1,parallel)) as pool, tqdm(total=total, initial=start) as bar:
+        pos=start; stream=enc.encoded(chunks())
+        while True:
+            t0=time.time()
+            with span("ingest.batch"):
+                nxt=next(stream, None)
+                if nxt is None: break
+                pts=enc.points(*nxt)
+            chunk=nxt[0]; dt=time.time()-t0; t_emb+=dt
+            drain(max(0,queue-1))
+            pos+=len(chunk); inflight.append((pos, pool.submit(_upsert, client, pts, enc.collection)))
+            bar.update(len(chunk)); n_batches+=1
+            logger.debug("[batch %d] embed: %.2fs | in flight: %d", n_batches, dt, len(inflight))
+        drain(0)
+    if enc.collection==COLLECTION: bump_generation(COLLECTION)
+    wall=time.time()-t_start; n=done-start
+    logger.info("Indexed %d documents in %.1fs (%.1f docs/s) | embed: %.1fs (%.1f docs/s) | upsert: %.1fs (%.1f docs/s, %d parallel)",
+                n, wall, n/wall if wall else 0.0, t_emb, n/t_emb if t_emb else 0.0, t_up, n/t_up if t_up else 0.0, parallel)
+    if enc.local is not None and n: logger.info("Encoder batching — %s", format_padding_stats())
+    return done
+def _select(corpus: Dict[str, Dict[str,str]]) -> List[Tuple[str,Dict[str,str]]]:
+    """Corpus in doc-id hash order, cut to ``MAX_DOCS``: a spread-out subset that only changes where the
+    corpus does, so incremental runs do not churn."""
+    items=sorted(corpus.items(), key=lambda kv: hashlib.sha1(str(kv[0]).encode("utf-8")).digest())
+    return items[:MAX_DOCS] if MAX_DOCS and MAX_DOCS>0 else items
+def index_corpus_dense(client: QdrantClient, corpus: Dict[str, Dict[str,str]], with_colbert: bool = COLBERT_INGEST,
+                       with_minicoil: bool = MINICOIL_INGEST, workers: int = INGEST_WORKERS):
+    items=_select(corpus)
+    enc=_Encoders(with_colbert, with_minicoil, workers=workers)
+    try:
+        enc.recreate(client); enc.open_store()
+        logger.info("Indexing %d documents (%s)...", len(items), enc.describe())
+        _ingest(client, enc, items, total=len(items))
+        enc.close_store()
+    finally:
+        enc.close_pool()
+    _write_manifest(_manifest_path(), _signature(with_colbert, with_minicoil), enc.hashes)
+    logger.info("Indexing finished.")
+def index_corpus_shadow(client: QdrantClient, corpus: Dict[str, Dict[str,str]], with_colbert: bool = COLBERT_INGEST,
+                        with_minicoil: bool = MINICOIL_INGEST, workers: int = INGEST_WORKERS):
+    """Full rebuild with zero downtime: index into a fresh collection while ``COLLECTION`` keeps serving the
+    old one, then switch the ``COLLECTION`` alias to it atomically and drop the old collection.
+
+    Local ColBERT and doc stores are built next to the live ones and moved into place after the switch.
+    """
+    items=_select(corpus); name=f"{COLLECTION}__{time.strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}"
+    if _exists(client, name): raise RuntimeError(f"shadow collection {name} already exists")
+    cs=COLBERT_STORE and COLBERT_STORE+".shadow"; ds=DOC_STORE and DOC_STORE+".shadow"
+    enc=_Encoders(with_colbert, with_minicoil, colbert_store=cs, doc_store=ds, workers=workers, collection=name)
+    try:
+        enc.recreate(client); enc.open_store()
+        logger.info("Indexing %d documents into shadow collection %s (%s)...", len(items), name, enc.describe())
+        _ingest(client, enc, items, total=len(items))
+        enc.close_store()
+    except BaseException:
+        client.delete_collection(collection_name=name); raise
+    finally:
+        enc.close_pool()
+    switch_alias(client, COLLECTION, name)
+    if cs: _swap_dir(cs, COLBERT_STORE)
+    if ds: _swap_dir(ds, DOC_STORE)
+    bump_generation(COLLECTION)
+    _write_manifest(_manifest_path(), _signature(with_colbert, with_minicoil), enc.hashes)
+    logger.info("Indexing finished; %s now serves %s.", COLLECTION, name)
+def index_corpus_incremental(client: QdrantClient, corpus: Dict[str, Dict[str,str]], with_colbert: bool = COLBERT_INGEST,
+                             with_minicoil: bool = MINICOIL_INGEST, workers: int = INGEST_WORKERS) -> Dict[str, int]:
+    """Bring ``COLLECTION`` in line with ``corpus`` by content hash: embed and upsert new or changed
+    documents only, delete removed ones. Falls back to a full build when the collection does not exist.
+
+    Previous hashes come from the ingest manifest, or from the points' payloads when there is none; the
+    settings check then falls back to the collection's vector config.
+    """
+    if not _exists(client):
+        logger.info("Collection %s does not exist; building it in full.", COLLECTION)
+        index_corpus_dense(client, corpus, with_colbert, with_minicoil, workers)
+        return {"new": len(_select(corpus)), "changed": 0, "removed": 0, "unchanged": 0}
+    items=_select(corpus); new={str(d): content_hash(_prep(m)) for d,m in items}
+    sig=_signature(with_colbert, with_minicoil); path=_manifest_path(); man=_read_manifest(path)
+    rebuild="run a full rebuild (ingest --shadow for zero downtime)"
+    enc=None
+    try:
+        if man is None:
+            # No recorded settings: at least the vectors the encoders produce must match the collection's.
+            enc=_Encoders(with_colbert, with_minicoil, colbert_store="", doc_store="", workers=workers)
+            have,want=_vector_config(client),enc.vector_config()
+            if have!=want: raise RuntimeError(f"{COLLECTION} holds other vectors than this ingest produces ({have} vs {want}); {rebuild}")
+            logger.info("No ingest manifest at %s; reading content hashes from %s payloads.", path, COLLECTION)
+            old=_scan_hashes(client)
+        elif man["signature"]!=sig:
+            raise RuntimeError(f"index settings changed since the last ingest ({man['signature']} -> {sig}); {rebuild}")
+        else:
+            old=man["hashes"]
+        todo=[(d,m) for d,m in items if old.get(str(d))!=new[str(d)]]
+        removed=[d for d in old if d not in new]
+        counts={"new": sum(1 for d,_ in todo if str(d) not in old), "changed": sum(1 for d,_ in todo if str(d) in old),
+                "removed": len(removed), "unchanged": len(items)-len(todo)}
+        logger.info("Incremental ingest into %s: %d new, %d changed, %d removed, %d unchanged.", COLLECTION,
+                    counts["new"], counts["changed"], counts["removed"], counts["unchanged"])
+        if todo:
+            enc=enc or _Encoders(with_colbert, with_minicoil, colbert_store="", doc_store="", workers=workers)
+            _ingest(client, enc, todo, total=len(todo))
+    finally:
+        if enc is not None: enc.close_pool()
+    for i in range(0, len(removed), 1000):
+        client.delete(collection_name=COLLECTION, points_selector=qm.PointIdsList(points=[_to_point_id(d) for d in removed[i:i+1000]]))
+    if todo or removed:
+        bump_generation(COLLECTION)
+        if DOC_STORE:
+            # Text only, no encoding: rewritten in full next to the live store, then swapped in.
+            from ..data.doc_store import DocStoreWriter
+            w=DocStoreWriter(DOC_STORE+".shadow")
+            for i in range(0, len(items), BATCH_SIZE):
+                w.add([str(d) for d,_ in items[i:i+BATCH_SIZE]], [_prep(m) for _,m in items[i:i+BATCH_SIZE]])
+            w.finalize(); _swap_dir(DOC_STORE+".shadow", DOC_STORE)
+        if COLBERT_STORE:
+            logger.warning("COLBERT_STORE %s is not updated incrementally; rebuild it with scripts.colbert_store build.", COLBERT_STORE)
+    _write_manifest(path, sig, new)
+    logger.info("Indexing finished.")
+    return counts
+def index_corpus_stream(client: QdrantClient, docs: Iterable[Tuple[str,Dict[str,str]]], resume: bool = True,
+                        with_colbert: bool = COLBERT_INGEST, with_minicoil: bool = MINICOIL_INGEST,
+                        parallel: int = UPSERT_PARALLEL, queue: int = UPSERT_QUEUE, workers: int = INGEST_WORKERS):
+    """Ingest a lazily-read corpus (e.g. ``data.loader.iter_corpus``) in file order, resuming from the checkpoint.
+
+    Unlike ``index_corpus_dense`` documents are not reordered; ``MAX_DOCS`` keeps the first ones of the stream.
+    """
+    enc=_Encoders(with_colbert, with_minicoil, workers=workers); ck=_checkpoint_path()
+    try:
+        start=_read_checkpoint(ck) if resume and _exists(client) else 0
+        if start: logger.info("Resuming ingest into %s after %d documents (checkpoint %s).", COLLECTION, start, ck)
+        else: enc.recreate(client); _write_checkpoint(ck, 0)
+        docs=iter(docs)
+        if MAX_DOCS and MAX_DOCS>0: docs=islice(docs, MAX_DOCS)
+        docs=islice(docs, start, None)
+        logger.info("Indexing documents (%s, streaming)...", enc.describe())
+        enc.open_store(resume_docs=start)
+        done=_ingest(client, enc, docs, total=MAX_DOCS if MAX_DOCS and MAX_DOCS>0 else None, start=start, checkpoint=ck,
+                     parallel=parallel, queue=queue)
+        enc.close_store()
+        # A later run starts over instead of "resuming" past the end.
+        _write_checkpoint(ck, done, complete=True)
+    finally:
+        enc.close_pool()
+    # After a resume the hashes of the earlier run are missing; incremental ingest then reads payloads.
+    if not start: _write_manifest(_manifest_path(), _signature(with_colbert, with_minicoil), enc.hashes)
     logger.info("Indexing finished.")
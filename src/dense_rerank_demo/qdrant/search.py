@@ -1,19 +1,183 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from functools import partial
 from qdrant_client import models as qm
-from ..config import COLLECTION, TOPK_RECALL
-
-def retrieve_dense(client, qvec: List[float], topk: int = TOPK_RECALL) -> List[Dict[str, Any]]:
-    hits = client.search(
-        collection_name=COLLECTION,
-        query_vector=qm.NamedVector(name="dense", vector=qvec),
-        with_payload=True,
-        limit=topk,
-    )
-    return [
-        {
-            "id": h.payload["doc_id"],
-            "text": h.payload["text"],
-            "score": float(h.score),
-        }
-        for h in hits
-    ]
+from ..config import COLLECTION, TOPK_RECALL, FUSION, HYBRID_PREFETCH
+from ..trace import span
+
+def _hit(h, with_vectors: Optional[List[str]] = None) -> Dict[str, Any]:
+    d = {
+        "id": h.payload["doc_id"],
+        "text": h.payload.get("text"),
+        "score": float(h.score),
+    }
+    for name in with_vectors or []:
+        d[name] = (h.vector or {}).get(name)
+    return d
+
+def _payload(with_text: bool):
+    # Without text only the doc_id field travels; ``data.doc_store.hydrate`` fills text in locally.
+    return True if with_text else ["doc_id"]
+
+def retrieve_dense(client, qvec: List[float], topk: int = TOPK_RECALL,
+                   with_vectors: Optional[List[str]] = None, with_text: bool = True,
+                   collection: str = COLLECTION) -> List[Dict[str, Any]]:
+    with span("qdrant.search"):
+        res = client.query_points(
+            collection_name=collection,
+            query=qvec,
+            using="dense",
+            with_payload=_payload(with_text),
+            with_vectors=with_vectors or False,
+            limit=topk,
+        )
+    with span("qdrant.hits"):
+        return [_hit(h, with_vectors) for h in res.points]
+
+FUSIONS = {"rrf": qm.Fusion.RRF, "dbsf": qm.Fusion.DBSF}
+
+def _sources(qvec: List[float], sparse: qm.SparseVector, topk: int, prefetch: int = HYBRID_PREFETCH) -> List[qm.Prefetch]:
+    """Dense and MiniCOIL-sparse candidate lists of ``prefetch`` (default ``topk``) each, for fusion."""
+    n = prefetch or topk
+    return [qm.Prefetch(query=qvec, using="dense", limit=n), qm.Prefetch(query=sparse, using="minicoil", limit=n)]
+
+def _recall_prefetch(qvec: List[float], topk: int, sparse: Optional[qm.SparseVector] = None,
+            fusion: str = FUSION, prefetch: int = HYBRID_PREFETCH) -> qm.Prefetch:
+    """Prefetch for the first stage: dense-only, or dense + sparse fused server-side when ``sparse`` is given."""
+    if sparse is None: return qm.Prefetch(query=qvec, using="dense", limit=topk)
+    return qm.Prefetch(prefetch=_sources(qvec, sparse, topk, prefetch), query=qm.FusionQuery(fusion=FUSIONS[fusion]), limit=topk)
+
+def retrieve_hybrid(client, qvec: List[float], topk: int = TOPK_RECALL, sparse: qm.SparseVector = None,
+                    fusion: str = FUSION, prefetch: int = HYBRID_PREFETCH,
+                    with_vectors: Optional[List[str]] = None, with_text: bool = True) -> List[Dict[str, Any]]:
+    """Dense and MiniCOIL-sparse recall in one Query API request, fused server-side (``fusion``: rrf or dbsf).
+
+    Needs the "minicoil" sparse vectors stored at ingest (``MINICOIL_INGEST=1``). ``score`` is the fused score.
+    """
+    with span("qdrant.query"):
+        res = client.query_points(
+            collection_name=COLLECTION,
+            prefetch=_sources(qvec, sparse, topk, prefetch),
+            query=qm.FusionQuery(fusion=FUSIONS[fusion]),
+            with_payload=_payload(with_text),
+            with_vectors=with_vectors or False,
+            limit=topk,
+        )
+    with span("qdrant.hits"):
+        return [_hit(h, with_vectors) for h in res.points]
+
+def retrieve_hybrid_batch(client, qvecs: List[List[float]], sparse: List[qm.SparseVector], topk: int = TOPK_RECALL,
+                          fusion: str = FUSION, prefetch: int = HYBRID_PREFETCH,
+                          with_vectors: Optional[List[str]] = None, with_text: bool = True) -> List[List[Dict[str, Any]]]:
+    """``retrieve_hybrid`` for several queries in a single request."""
+    if not qvecs: return []
+    reqs = [qm.QueryRequest(prefetch=_sources(qvec, sv, topk, prefetch), query=qm.FusionQuery(fusion=FUSIONS[fusion]),
+                            with_payload=_payload(with_text), with_vector=with_vectors or False, limit=topk)
+            for qvec, sv in zip(qvecs, sparse)]
+    with span("qdrant.query"):
+        res = client.query_batch_points(collection_name=COLLECTION, requests=reqs)
+    with span("qdrant.hits"):
+        return [[_hit(h, with_vectors) for h in r.points] for r in res]
+
+def recall_fn(sparse: Optional[qm.SparseVector] = None, fusion: str = FUSION) -> Callable[..., List[Dict[str, Any]]]:
+    """``retrieve_dense``-compatible callable: hybrid recall when a sparse query vector is given."""
+    return retrieve_dense if sparse is None else partial(retrieve_hybrid, sparse=sparse, fusion=fusion)
+
+def recall_model(emb_model: str, sparse_model: Optional[str] = None, fusion: str = FUSION) -> str:
+    """Model tag for cache keys, so dense and hybrid (per fusion) recall results never collide."""
+    return emb_model if sparse_model is None else f"{emb_model}+{sparse_model}:{fusion}"
+
+Stage = Tuple[str, Any, Optional[int]]
+
+def _staged(qvec: List[float], stages: List[Stage], topk: int, sparse: Optional[qm.SparseVector] = None,
+            fusion: str = FUSION):
+    """Nest ``stages`` ((using, query, limit), ...) as prefetches on top of recall of ``topk``
+    (dense, or hybrid when ``sparse`` is given).
+
+    Returns (prefetch, using, query, limit) for the outermost stage.
+    """
+    pre = _recall_prefetch(qvec, topk, sparse, fusion)
+    for using, query, lim in stages[:-1]:
+        pre = qm.Prefetch(prefetch=pre, query=query, using=using, limit=lim or topk)
+    using, query, lim = stages[-1]
+    return pre, using, query, lim
+
+def retrieve_rescored(client, qvec: List[float], stages: List[Stage],
+                      topk: int = TOPK_RECALL, limit: Optional[int] = None, with_text: bool = True,
+                      sparse: Optional[qm.SparseVector] = None, fusion: str = FUSION) -> List[Dict[str, Any]]:
+    """Dense (or, with ``sparse``, hybrid) recall of ``topk`` candidates, rescored server-side against
+    vectors stored at ingest, all in one request.
+
+    ``with_text=False`` returns ids and scores only (see ``_payload``).
+    Each stage is (using, query, limit): "colbert" with a token matrix (MaxSim) or "minicoil" with a
+    ``qm.SparseVector`` (dot product). Rerankers build them via ``server_stages``; several stages run as
+    a cascade. ``score`` is the final stage's value; it is also copied to ``rerank_score`` so callers
+    can treat the result like the output of a reranker.
+    """
+    pre, using, query, lim = _staged(qvec, stages, topk, sparse, fusion)
+    with span("qdrant.query"):
+        res = client.query_points(
+            collection_name=COLLECTION,
+            prefetch=pre,
+            query=query,
+            using=using,
+            with_payload=_payload(with_text),
+            limit=min(limit or topk, lim or topk),
+        )
+    with span("qdrant.hits"):
+        out = [_hit(h) for h in res.points]
+    for c in out: c["rerank_score"] = c["score"]
+    return out
+
+def retrieve_dense_batch(client, qvecs: List[List[float]], topk: int = TOPK_RECALL,
+                         with_vectors: Optional[List[str]] = None, with_text: bool = True) -> List[List[Dict[str, Any]]]:
+    """``retrieve_dense`` for several query vectors in a single request."""
+    if not qvecs: return []
+    with span("qdrant.search"):
+        res = client.query_batch_points(
+            collection_name=COLLECTION,
+            requests=[
+                qm.QueryRequest(
+                    query=qvec,
+                    using="dense",
+                    with_payload=_payload(with_text),
+                    with_vector=with_vectors or False,
+                    limit=topk,
+                )
+                for qvec in qvecs
+            ],
+        )
+    with span("qdrant.hits"):
+        return [[_hit(h, with_vectors) for h in r.points] for r in res]
+
+def retrieve_rescored_batch(client, qvecs: List[List[float]], stages: List[List[Stage]],
+                            topk: int = TOPK_RECALL, limit: Optional[int] = None, with_text: bool = True,
+                            sparse: Optional[List[qm.SparseVector]] = None, fusion: str = FUSION) -> List[List[Dict[str, Any]]]:
+    """``retrieve_rescored`` for several queries in a single request."""
+    if not qvecs: return []
+    reqs = []
+    for i, (qvec, st) in enumerate(zip(qvecs, stages)):
+        pre, using, query, lim = _staged(qvec, st, topk, sparse[i] if sparse else None, fusion)
+        reqs.append(qm.QueryRequest(prefetch=pre, query=query, using=using, with_payload=_payload(with_text),
+                                    limit=min(limit or topk, lim or topk)))
+    with span("qdrant.query"):
+        res = client.query_batch_points(collection_name=COLLECTION, requests=reqs)
+    with span("qdrant.hits"):
+        out = [[_hit(h) for h in r.points] for r in res]
+    for cs in out:
+        for c in cs: c["rerank_score"] = c["score"]
+    return out
+
+async def retrieve_dense_async(client, qvec: List[float], topk: int = TOPK_RECALL,
+                               with_vectors: Optional[List[str]] = None, with_text: bool = True) -> List[Dict[str, Any]]:
+    """``retrieve_dense`` on an ``AsyncQdrantClient``."""
+    with span("qdrant.search"):
+        res = await client.query_points(
+            collection_name=COLLECTION,
+            query=qvec,
+            using="dense",
+            with_payload=_payload(with_text),
+            with_vectors=with_vectors or False,
+            limit=topk,
+        )
+    with span("qdrant.hits"):
+        return [_hit(h, with_vectors) for h in res.points]
@@ -0,0 +1,204 @@
+
+"""Offline benchmark: ingest throughput, dense recall and rerank latency on a synthetic corpus.
+
+Runs against qdrant-client's local mode (no server) and needs no dataset download; models come from
+the usual ``EMB_MODEL`` / ``SPARSE_MODEL`` / ``COLBERT_CKPT`` settings, so with the Hugging Face cache
+warm it also runs with ``HF_HUB_OFFLINE=1``. ``run`` writes JSON, ``compare`` diffs two such files.
+"""
+import argparse, json, os, platform, resource, subprocess, sys, time
+from random import Random
+from typing import Any, Callable, Dict, List
+import numpy as np
+from ..config import (COLLECTION, EMB_MODEL, EMB_BACKEND, SPARSE_MODEL, COLBERT_CKPT, COLBERT_BACKEND, BATCH_SIZE,
+                      UPSERT_PARALLEL, INFER_THREADS)
+from ..models.batching import padding_stats, reset as reset_padding
+from ..logging import get_logger
+logger=get_logger(__name__)
+SECTIONS=["ingest","dense","minicoil","colbert","scaling"]
+# Never the real collection: recreating that would drop its ingest manifest and retire its cached queries.
+BENCH_COLLECTION="bench_"+COLLECTION
+_WORDS=("protein cell gene expression receptor tumor immune response patient clinical trial dose vitamin "
+        "infection virus bacteria antibody cancer therapy risk cohort mortality blood pressure insulin glucose "
+        "brain neuron signal pathway mutation sequence genome rna dna enzyme inhibitor drug treatment effect "
+        "increase decrease reduce association model mouse human tissue level study analysis result data "
+        "significant higher lower factor growth population exposure disease chronic acute inflammation "
+        "metabolism membrane structure binding activity function regulation development age sex women men "
+        "children outcome incidence prevalence sample group control randomized observed measured compared").split()
+
+def synthetic_corpus(n: int, words: int = 120, seed: int = 7) -> Dict[str, Dict[str, str]]:
+    """``n`` BEIR-shaped docs of about ``words`` Zipf-distributed words; identical for a given seed."""
+    rnd=Random(seed); w=[1/(i+1) for i in range(len(_WORDS))]
+    return {f"d{i}": {"title": " ".join(rnd.choices(_WORDS, w, k=6)),
+                      "text": " ".join(rnd.choices(_WORDS, w, k=max(1, int(words*rnd.uniform(0.5,1.5)))))}
+            for i in range(n)}
+
+def synthetic_queries(n: int, seed: int = 11) -> List[str]:
+    rnd=Random(seed); return [" ".join(rnd.sample(_WORDS, 8)) for _ in range(n)]
+
+def peak_rss_mb() -> float:
+    r=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r/(1<<20) if sys.platform=="darwin" else r/1024  # bytes on macOS, KiB on Linux
+
+def rss_mb() -> float:
+    """Current resident set size (the peak where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1])*os.sysconf("SC_PAGE_SIZE")/(1<<20)
+    except (OSError, ValueError, IndexError): return peak_rss_mb()
+
+def _timeit(fn: Callable[[], Any], repeat: int, warmup: int = 2) -> Dict[str, float]:
+    for _ in range(warmup): fn()
+    ms=[]
+    for _ in range(repeat):
+        t0=time.perf_counter(); fn(); ms.append(1000*(time.perf_counter()-t0))
+    p50,p95=np.percentile(ms,[50,95])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "mean_ms": float(np.mean(ms))}
+
+def _padding(name: str) -> Dict[str, float]:
+    """Padding share of encoder ``name`` since the last reset (token-budget vs fixed-size batches), if it ran here."""
+    s=padding_stats().get(name)
+    return {"padding_waste": s["waste"], "fixed_waste": s["fixed_waste"]} if s else {}
+
+def _meta(args) -> Dict[str, Any]:
+    try: commit=subprocess.run(["git","rev-parse","--short","HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError): commit=""
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "emb_model": EMB_MODEL, "emb_backend": EMB_BACKEND,
+            "sparse_model": SPARSE_MODEL, "colbert_ckpt": COLBERT_CKPT, "colbert_backend": COLBERT_BACKEND,
+            "infer_threads": INFER_THREADS, "batch_size": BATCH_SIZE, "upsert_parallel": UPSERT_PARALLEL,
+            "qdrant": args.qdrant_path, "sizes": args.sizes, "ks": args.ks, "doc_words": args.doc_words, "repeat": args.repeat,
+            "ingest_workers": args.ingest_workers, "workers": args.workers, "worker_threads": args.worker_threads}
+
+def bench_recall(args, res: Dict[str, Dict[str, float]], sections: List[str]):
+    """Ingest each collection size into ``BENCH_COLLECTION``, then time ``retrieve_dense`` at each K against it."""
+    from ..qdrant.client import get_local_client
+    from ..qdrant.index import _Encoders, _ingest
+    from ..qdrant.search import retrieve_dense
+    client=get_local_client(args.qdrant_path); rss0=rss_mb()
+    enc=_Encoders(with_colbert=False, with_minicoil=False, colbert_store="", doc_store="", workers=args.ingest_workers,
+                  collection=BENCH_COLLECTION)
+    if enc.local is None:
+        from ..models.embedder import Embedder
+        qvecs=Embedder().encode(synthetic_queries(args.repeat))
+    else:
+        qvecs=enc.local.emb.encode(synthetic_queries(args.repeat))
+    for n in args.sizes:
+        items=list(synthetic_corpus(n, args.doc_words).items())
+        enc.recreate(client); reset_padding()
+        t0=time.perf_counter(); _ingest(client, enc, items, total=n); dt=time.perf_counter()-t0
+        if "ingest" in sections: res[f"ingest/n={n}"]={"docs_per_s": n/dt, "rss_delta_mb": rss_mb()-rss0, **_padding("embed")}
+        if "dense" not in sections: continue
+        for k in args.ks:
+            it=iter(range(1<<30))
+            r=_timeit(lambda: retrieve_dense(client, qvecs[next(it)%len(qvecs)], topk=k, collection=BENCH_COLLECTION), args.repeat)
+            res[f"dense/n={n}/k={k}"]={**r, "rss_delta_mb": rss_mb()-rss0}
+    enc.close_pool(); client.delete_collection(collection_name=BENCH_COLLECTION); client.close()
+
+def bench_scaling(args, res: Dict[str, Dict[str, float]]):
+    """Encode throughput (no Qdrant) of the ingest models per worker-process count; 0 = in-process."""
+    from ..models.workers import DocEncoder, EncoderPool
+    models=set(args.scaling_models.split(","))
+    kw=dict(dense="dense" in models, colbert="colbert" in models, minicoil="minicoil" in models)
+    texts=[" ".join(m.values()) for m in synthetic_corpus(args.scaling_docs, args.doc_words).values()]
+    batches=[texts[i:i+BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+    base=None; base_w=max(1, args.workers[0]); tag="+".join(m for m in ("dense","colbert","minicoil") if kw[m])
+    for w in args.workers:
+        rss0=rss_mb()
+        if w==0:
+            enc=DocEncoder(**kw); enc.encode(batches[0][:8])
+            t0=time.perf_counter()
+            for b in batches: enc.encode(b)
+            dt=time.perf_counter()-t0; rss=rss_mb()-rss0; del enc
+        else:
+            with EncoderPool(w, threads=args.worker_threads, **kw) as pool:
+                for _ in pool.map([batches[0][:8]]*(2*w)): pass  # start every worker and load its models
+                t0=time.perf_counter()
+                for _ in pool.map(batches): pass
+                dt=time.perf_counter()-t0; rss=rss_mb()-rss0  # this process only; the models live in the workers
+        rate=len(texts)/dt; base=base or rate
+        # speedup over the first worker count; efficiency 1.0 = perfectly linear scaling from it
+        res[f"scaling/{tag}/workers={w}"]={"docs_per_s": rate, "speedup": rate/base,
+                                           "efficiency": rate/base/(max(1,w)/base_w), "rss_delta_mb": rss}
+
+def bench_rerank(name: str, args, res: Dict[str, Dict[str, float]]):
+    """Time ``rerank`` of K synthetic candidates of each document length, re-encoding the docs every call."""
+    from ..models.registry import make_reranker
+    rss0=rss_mb(); rr=make_reranker(name); queries=synthetic_queries(args.repeat)
+    for words in args.doc_words_rerank:
+        docs=[(" ".join(m.values())) for m in synthetic_corpus(max(args.ks), words, seed=words).values()]
+        for k in args.ks:
+            cands=[{"id": f"d{i}", "text": t, "score": 0.0} for i,t in enumerate(docs[:k])]
+            it=iter(range(1<<30))
+            def call():
+                if hasattr(rr, "_cache"): rr._cache.clear()  # MiniCOIL memoizes doc vectors by id
+                rr.rerank(queries[next(it)%len(queries)], [dict(c) for c in cands])
+            reset_padding()
+            res[f"{name}/words={words}/k={k}"]={**_timeit(call, args.repeat), "rss_delta_mb": rss_mb()-rss0, **_padding(name)}
+
+def run(args):
+    sections=args.only.split(",") if args.only else SECTIONS
+    res: Dict[str, Dict[str, float]]={}
+    if "ingest" in sections or "dense" in sections: bench_recall(args, res, sections)
+    for name in ("minicoil","colbert"):
+        if name in sections: bench_rerank(name, args, res)
+    if "scaling" in sections and args.workers: bench_scaling(args, res)
+    out={"meta": _meta(args), "results": res, "peak_rss_mb": peak_rss_mb()}
+    with open(args.out,"w") as f: json.dump(out, f, indent=2)
+    w=max(len(k) for k in res) if res else 0
+    for key,r in res.items():
+        print(f"{key:<{w}}  "+"  ".join(f"{m} {v:.1%}" if m.endswith("_waste") else f"{m} {v:.1f}" for m,v in r.items()))
+    print(f"Peak RSS {out['peak_rss_mb']:.0f} MB — results written to {args.out}")
+
+def _lower_is_better(metric: str) -> bool:
+    return metric.endswith("_ms") or metric.endswith("_mb") or metric.endswith("_waste")
+
+def compare(args) -> int:
+    """Print per-metric change from ``base`` to ``new``; exit status 1 if any metric regressed past the threshold."""
+    with open(args.base) as f: base=json.load(f)
+    with open(args.new) as f: new=json.load(f)
+    for k in ("emb_model","sparse_model","colbert_ckpt","emb_backend","colbert_backend","platform","cpus"):
+        if base["meta"].get(k)!=new["meta"].get(k):
+            print(f"warning: {k} differs ({base['meta'].get(k)} vs {new['meta'].get(k)})")
+    regressions=0; w=max([len(k) for k in new["results"]]+[0])
+    for key,r in new["results"].items():
+        b=base["results"].get(key)
+        if b is None: continue
+        for metric,v in r.items():
+            if metric not in b or not b[metric]: continue
+            ch=(v-b[metric])/b[metric]; worse=ch>0 if _lower_is_better(metric) else ch<0
+            flag=("REGRESSION" if worse else "improved") if abs(ch)>args.threshold else ""
+            regressions+=flag=="REGRESSION"
+            if flag or args.all: print(f"{key:<{w}}  {metric:<12} {b[metric]:10.2f} → {v:10.2f}  {ch:+7.1%}  {flag}")
+    missing=[k for k in base["results"] if k not in new["results"]]
+    if missing: print(f"{len(missing)} benchmarks only in {args.base}: {', '.join(missing[:5])}{' ...' if len(missing)>5 else ''}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+def main():
+    ap=argparse.ArgumentParser(description="Offline ingest / recall / rerank benchmark with JSON output")
+    sub=ap.add_subparsers(dest="cmd", required=True)
+    r=sub.add_parser("run")
+    r.add_argument("--out", default="bench.json")
+    r.add_argument("--only", default="", help=f"comma-separated subset of {','.join(SECTIONS)}")
+    r.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1000,5000], help="collection sizes")
+    r.add_argument("--ks", type=lambda s: [int(x) for x in s.split(",")], default=[10,50,100], help="recall depths / rerank K")
+    r.add_argument("--doc-words", type=int, default=120, help="mean document length of the indexed corpus")
+    r.add_argument("--doc-words-rerank", type=lambda s: [int(x) for x in s.split(",")], default=[50,200],
+                   help="document lengths (words) for rerank timings")
+    r.add_argument("--repeat", type=int, default=20, help="timed calls per measurement")
+    r.add_argument("--qdrant-path", default=":memory:", help="local-mode location (\":memory:\" or a directory)")
+    r.add_argument("--ingest-workers", type=int, default=0, help="encoder processes for the ingest section (0 = in-process)")
+    r.add_argument("--workers", type=lambda s: [int(x) for x in s.split(",")], default=[],
+                   help="scaling section: worker counts to compare, e.g. 0,1,2,4,8 (empty = skip)")
+    r.add_argument("--worker-threads", type=int, default=0, help="threads per worker (0 = cores / workers)")
+    r.add_argument("--scaling-models", default="dense", help="scaling section: comma-separated dense,colbert,minicoil")
+    r.add_argument("--scaling-docs", type=int, default=4096, help="documents encoded per scaling point")
+    c=sub.add_parser("compare")
+    c.add_argument("base"); c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    c.add_argument("--all", action="store_true", help="print unflagged metrics too")
+    args=ap.parse_args()
+    if args.cmd=="run": run(args)
+    else: sys.exit(compare(args))
+
+if __name__ == "__main__":
+    main()
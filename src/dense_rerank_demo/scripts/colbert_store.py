@@ -0,0 +1,77 @@
+
+import argparse, time
+from itertools import islice
+from collections import deque
+from random import Random
+import numpy as np
+import torch
+from tqdm import tqdm
+from ..config import DATASET, DATA_DIR, COLBERT_CKPT, COLBERT_STORE, COLBERT_STORE_MODE, COLBERT_STORE_NBITS, MAX_DOCS, INGEST_WORKERS
+from ..data.loader import iter_corpus, load_beir
+from ..models.colbert_store import ColbertStore, ColbertStoreWriter, MODES
+from ..models.reranker_colbert import ColbertReranker, _maxsim
+from ..models.workers import DocEncoder, EncoderPool
+from ..models.batching import format_padding_stats
+from ..qdrant.index import _prep
+from .parity import _spearman, _overlap
+from ..logging import get_logger
+logger=get_logger(__name__)
+
+def build(args):
+    """Build the store straight from corpus.jsonl, without touching Qdrant (optionally encoding in worker processes)."""
+    enc=EncoderPool(args.workers, dense=False, colbert=True) if args.workers>0 else DocEncoder(dense=False, colbert=True)
+    w=ColbertStoreWriter(args.path, enc.dims()[1], mode=args.mode, nbits=args.nbits)
+    docs=iter_corpus(DATASET, DATA_DIR)
+    if args.max_docs>0: docs=islice(docs, args.max_docs)
+    chunks=iter(lambda: list(islice(docs, args.batch)), [])
+    pending=deque()
+    def texts():
+        for chunk in chunks:
+            pending.append([d for d,_ in chunk]); yield [_prep(m) for _,m in chunk]
+    encoded=enc.map(texts()) if args.workers>0 else (enc.encode(t) for t in texts())
+    t0=time.time(); n=0
+    with tqdm(total=args.max_docs or None) as bar:
+        for _,toks,_ in encoded:
+            ids=pending.popleft(); w.add(ids, toks); n+=len(ids); bar.update(len(ids))
+    if args.workers>0: enc.close()
+    w.finalize()
+    logger.info("Encoded %d docs in %.1fs", n, time.time()-t0)
+    if args.workers==0: logger.info("Encoder batching — %s", format_padding_stats())
+
+def check(args):
+    """Score sample queries against stored docs both from the store and from freshly encoded text."""
+    store=ColbertStore(args.path); rr=ColbertReranker(COLBERT_CKPT, store="")
+    corpus, queries, qrels = load_beir(DATASET, DATA_DIR, split="test")
+    rnd=Random(13); ids=[d for d in corpus if d in store]
+    qids=[q for q in queries if any(d in store for d in qrels.get(q,{}))][:args.queries]
+    sp, ov, err=[], [], []
+    for qid in tqdm(qids):
+        cand=[d for d in qrels[qid] if d in store]; cand+=rnd.sample(ids, min(len(ids), args.k-len(cand)))
+        q,qm=rr._enc_q([queries[qid]])
+        d,dm=rr._enc_ds([_prep(corpus[c]) for c in cand]); exact=_maxsim(q,qm,d,dm)[0].cpu().numpy()
+        d,dm=store.decode(cand); approx=_maxsim(q,qm,torch.from_numpy(d).to(rr.device),torch.from_numpy(dm).to(rr.device))[0].cpu().numpy()
+        sp.append(_spearman(exact, approx)); ov.append(_overlap(exact, approx)); err.append(np.mean(np.abs(exact-approx)/np.maximum(np.abs(exact),1e-6)))
+    fp32=store.meta["n_tokens"]*store.dim*4/max(1,len(store))
+    t0=time.time(); store.decode(rnd.sample(ids, min(len(ids), args.k))); dt=time.time()-t0
+    print(f"\n=== ColBERT store {args.path} ({store.mode}) ===")
+    print(f"Docs: {len(store)} | bytes/doc: {store.bytes_per_doc():.0f} (fp32 tokens: {fp32:.0f}, {fp32/store.bytes_per_doc():.1f}x smaller)")
+    print(f"Decode {args.k} docs: {dt*1000:.1f} ms")
+    if sp:
+        print(f"vs uncompressed over {len(sp)} queries x {args.k} docs — spearman {np.mean(sp):.4f} | "
+              f"top-10 overlap {np.mean(ov):.1%} | mean rel. score error {np.mean(err):.2%}")
+
+def main():
+    ap=argparse.ArgumentParser(description="Build or check the compressed ColBERT token store")
+    sub=ap.add_subparsers(dest="cmd", required=True)
+    b=sub.add_parser("build"); b.add_argument("--path", default=COLBERT_STORE or "./colbert_store")
+    b.add_argument("--mode", choices=MODES, default=COLBERT_STORE_MODE); b.add_argument("--nbits", type=int, default=COLBERT_STORE_NBITS)
+    b.add_argument("--max-docs", type=int, default=MAX_DOCS); b.add_argument("--batch", type=int, default=64)
+    b.add_argument("--workers", type=int, default=INGEST_WORKERS, help="encoder processes (0 = in this process)")
+    c=sub.add_parser("check"); c.add_argument("--path", default=COLBERT_STORE or "./colbert_store")
+    c.add_argument("--queries", type=int, default=20); c.add_argument("--k", type=int, default=50)
+    args=ap.parse_args()
+    if args.cmd=="build": build(args)
+    else: check(args)
+
+if __name__ == "__main__":
+    main()
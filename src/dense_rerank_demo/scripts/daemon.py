@@ -0,0 +1,29 @@
+
+import argparse, sys
+from ..config import DAEMON_SOCKET, DAEMON_PRELOAD
+from ..service.daemon import call, DaemonUnavailable
+def main():
+    ap=argparse.ArgumentParser(description="Warm local query daemon used by scripts.query")
+    ap.add_argument("cmd", choices=["start","stop","status"])
+    ap.add_argument("--socket", default=DAEMON_SOCKET)
+    ap.add_argument("--preload", default=DAEMON_PRELOAD,
+                    help="comma-separated rerankers to load and warm at start (the embedder always is); others load on first use")
+    ap.add_argument("--no-preload", action="store_true", help="load everything lazily, including the embedder")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the query cache (see CACHE_* in config)")
+    args=ap.parse_args()
+    if args.cmd=="start":
+        from ..service.daemon import QueryDaemon
+        preload=None if args.no_preload else [n.strip() for n in args.preload.split(",") if n.strip()]
+        try: QueryDaemon(args.socket, preload=preload, cache=not args.no_cache).serve_forever()
+        except KeyboardInterrupt: pass
+        return
+    try:
+        r=call("shutdown" if args.cmd=="stop" else "ping", args.socket, timeout=10.0)
+    except DaemonUnavailable:
+        print(f"No daemon on {args.socket}"); sys.exit(1)
+    if args.cmd=="stop": print(f"Stopping daemon (pid {r['pid']})"); return
+    loaded=", ".join(f"{k} {v:.0f} ms" for k,v in r["loaded_ms"].items()) or "nothing yet"
+    print(f"Daemon pid {r['pid']} on {args.socket} | up {r['uptime_s']:.0f}s | queries: {r['queries']}")
+    print(f"Loaded: {loaded}")
+    print(f"Collection: {r['config']['collection']} | embedder: {r['config']['emb_model']}")
+if __name__=="__main__": main()
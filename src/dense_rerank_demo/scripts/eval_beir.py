@@ -1,37 +1,57 @@
-import argparse, time, math
+import argparse, json, os, time, math
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from tqdm import tqdm
 
 from ..config import (
     DATASET, DATA_DIR, EVAL_LIMIT, TOPK_SHOW, TOPK_RECALL, COLLECTION,
-    SPARSE_MODEL, COLBERT_CKPT
+    RERANK_MODE, CASCADE_M, CASCADE_ADAPTIVE, RECALL_IDS_ONLY, RECALL_MODE, FUSION, HYBRID_PREFETCH, EMB_MODEL, SPARSE_MODEL
 )
 from ..data.loader import load_beir
+from ..data.doc_store import get_doc_store
+from ..data.runs import RunCache, write_trec
 from ..qdrant.client import get_client
-from ..qdrant.search import retrieve_dense
+from ..qdrant.search import (retrieve_rescored, retrieve_dense_batch, retrieve_rescored_batch, retrieve_hybrid_batch,
+                             recall_fn, recall_model, FUSIONS)
 from ..models.embedder import Embedder
-from ..models.reranker_minicoil import MiniCOILReranker
-from ..models.reranker_colbert import ColbertReranker
+from ..qdrant.index import _prep
+from ..cache import get_cache, with_cache, cached_retrieve_dense
+from ..models.registry import RERANKERS, make_reranker, sparse_encoder
+from .. import trace
 from qdrant_client import QdrantClient
 
-def dcg(scores):
-    return sum((s / math.log2(i + 2)) for i, s in enumerate(scores))
+def relevance(ranked, qrels, qids, depth):
+    """Binary relevance matrix [Q, depth] of each query's ranked doc ids (padded with 0) and the list lengths."""
+    rel = np.zeros((len(qids), depth), dtype=np.float64); lens = np.zeros(len(qids), dtype=np.int64)
+    for i, (qid, ids) in enumerate(zip(qids, ranked)):
+        r = qrels.get(qid, {}); ids = ids[:depth]; lens[i] = len(ids)
+        rel[i, :len(ids)] = [r.get(d, 0) > 0 for d in ids]
+    return rel, lens
 
-def ndcg_at_10(binary):
-    gains = binary[:10]
-    ideal = sorted(binary, reverse=True)[:10]
-    denom = dcg(ideal) or 1.0
-    return dcg(gains) / denom
+# Metrics see each query's top TOPK_SHOW; nDCG's ideal ranking comes from all of them, even past rank 10.
+DEPTH = max(10, TOPK_SHOW)
 
-def mrr_at_10(binary):
-    for i, rel in enumerate(binary[:10], 1):
-        if rel:
-            return 1.0 / i
-    return 0.0
+def ndcg_at_10(rel):
+    """Per-query nDCG@10 of a relevance matrix; the ideal ranking moves every relevant doc of the row
+    (``DEPTH`` deep) to the top."""
+    g = rel[:, :10]; disc = 1.0 / np.log2(np.arange(2, g.shape[1] + 2))
+    n = np.minimum(rel.sum(axis=1), g.shape[1]).astype(np.int64); idcg = np.concatenate([[1.0], np.cumsum(disc)])[n]
+    return (g @ disc) / np.where(n > 0, idcg, 1.0)
 
-def precision_at_k(binary_labels, k=10) -> float:
-    denom = min(k, len(binary_labels))
-    return (sum(binary_labels[:k]) / denom) if denom else 0.0
+def mrr_at_10(rel):
+    g = rel[:, :10] > 0
+    return np.where(g.any(axis=1), 1.0 / (g.argmax(axis=1) + 1), 0.0)
+
+def precision_at_k(rel, lens, k=10):
+    denom = np.minimum(k, lens)
+    return np.where(denom > 0, rel[:, :k].sum(axis=1) / np.maximum(denom, 1), 0.0)
+
+def recall_at_k(ranked, qrels, qids, k):
+    """Mean share of each query's relevant docs found in its top ``k`` (queries without any are skipped)."""
+    n_rel = np.array([sum(1 for g in qrels.get(q, {}).values() if g > 0) for q in qids], dtype=np.float64)
+    rel, _ = relevance(ranked, qrels, qids, k)
+    has = n_rel > 0
+    return float((rel.sum(axis=1)[has] / n_rel[has]).mean()) if has.any() else float("nan")
 
 def _indexed_ids(client: QdrantClient, collection: str) -> set:
     ids = set(); offset = None
@@ -45,13 +65,205 @@ def _indexed_ids(client: QdrantClient, collection: str) -> set:
             break
     return ids
 
+def _recall(client, emb, reranker, mode, qs, k, with_text=True, hybrid=None):
+    """Embed a batch of queries and fetch dense (or, with ``hybrid`` = (sparse encoder, fusion), fused
+    dense + sparse) candidates for all of them in one request."""
+    t0 = time.time()
+    qvecs = emb.encode(qs)
+    with_vectors = reranker.vector_names if mode == "stored" else None
+    if hybrid:
+        svs = hybrid[0].encode_queries(qs)
+        cands = retrieve_hybrid_batch(client, qvecs, svs, topk=k, fusion=hybrid[1], with_text=with_text, with_vectors=with_vectors)
+    else:
+        svs = None
+        cands = retrieve_dense_batch(client, qvecs, topk=k, with_text=with_text, with_vectors=with_vectors)
+    return t0, (qvecs, svs), cands, time.time() - t0
+
+def _rerank(client, reranker, mode, qs, qv, cands, k, with_text=True, fusion=FUSION):
+    t0 = time.time()
+    if mode == "server":
+        qvecs, svs = qv
+        post = retrieve_rescored_batch(client, qvecs, reranker.server_stages(qs), topk=k, limit=TOPK_SHOW,
+                                       with_text=with_text, sparse=svs, fusion=fusion)
+    else:
+        post = [p[:TOPK_SHOW] for p in reranker.rerank_batch(qs, cands, stored=(mode == "stored"))]
+    t1 = time.time()
+    return post, t1 - t0, t1
+
+def _run_batched(client, emb, reranker, mode, qids, queries, k, batch_size, with_text=True, hybrid=None):
+    """Recall for batch N+1 runs on the main thread while batch N is reranked on a worker thread.
+
+    Yields (qid, pre, post, recall_s, rerank_s, total_s); total is the batch's wall time from
+    the start of its recall to the end of its rerank, i.e. the latency each of its queries sees.
+    """
+    batches = [qids[i:i + batch_size] for i in range(0, len(qids), batch_size)]
+
+    def collect(batch, rec, fut):
+        t0, _, cands, t_rec = rec
+        post, t_rr, t_end = fut.result()
+        for qid, pre, p in zip(batch, cands, post):
+            yield qid, pre, p, t_rec, t_rr, t_end - t0
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = None
+        for batch in tqdm(batches):
+            qs = [queries[qid] for qid in batch]
+            rec = _recall(client, emb, reranker, mode, qs, k, with_text, hybrid)
+            if pending: yield from collect(*pending)
+            _, qv, cands, _ = rec
+            pending = (batch, rec, pool.submit(_rerank, client, reranker, mode, qs, qv, cands, k, with_text,
+                                               hybrid[1] if hybrid else FUSION))
+        if pending: yield from collect(*pending)
+
+def _run_single(client, emb, reranker, mode, qids, queries, k, cache=None, traces=None, with_text=True, hybrid=None):
+    """One query at a time; with tracing on, each query's stage breakdown is appended to ``traces``."""
+    for qid in tqdm(qids):
+        q = queries[qid]
+
+        with trace.collect() as tr:
+            # Recall: embed then search the named vector "dense" (hybrid: fused with the "minicoil" sparse vector)
+            t0 = time.time()
+            with trace.span("recall"):
+                qvec = emb.encode([q])[0]
+                sv = hybrid[0].encode_query(q) if hybrid else None
+                fusion = hybrid[1] if hybrid else FUSION
+                cands = cached_retrieve_dense(cache, recall_fn(sv, fusion), client, q, qvec, topk=k, with_text=with_text,
+                                              with_vectors=reranker.vector_names if mode == "stored" else None,
+                                              model=recall_model(EMB_MODEL, SPARSE_MODEL if hybrid else None, fusion),
+                                              prefetch=HYBRID_PREFETCH if hybrid else 0)
+            t1 = time.time()
+
+            # Rerank
+            with trace.span("rerank"):
+                if mode == "server":
+                    post = retrieve_rescored(client, qvec, reranker.server_stages([q])[0], topk=k, limit=TOPK_SHOW,
+                                              with_text=with_text, sparse=sv, fusion=fusion)
+                elif mode == "stored":
+                    post = reranker.rerank_stored(q, cands)[:TOPK_SHOW]
+                else:
+                    post = reranker.rerank(q, cands)[:TOPK_SHOW]
+            t2 = time.time()
+        if traces is not None and trace.enabled(): traces.append({"qid": qid, "stages_ms": tr.stages()})
+
+        yield qid, cands, post, t1 - t0, t2 - t1, t2 - t0
+
+def _shared_recall(client, args, qids, queries, k, hybrid):
+    """Candidates (doc id, score) at depth ``k`` for every query, from the run cache where possible;
+    missing queries are embedded and recalled in batches and added to it."""
+    run = RunCache(DATASET, "test", recall_model(EMB_MODEL, SPARSE_MODEL if hybrid else None, args.fusion), k,
+                   prefetch=HYBRID_PREFETCH if hybrid else 0)
+    miss = run.missing(qids); t0 = time.time()
+    if miss:
+        emb = Embedder()
+        if not args.no_cache: emb, _ = with_cache(emb, None)
+        bs = args.batch_size or 32
+        for i in tqdm(range(0, len(miss), bs), desc="recall"):
+            batch = miss[i:i + bs]; qs = [queries[q] for q in batch]
+            qvecs = emb.encode(qs)
+            cands = (retrieve_hybrid_batch(client, qvecs, hybrid.encode_queries(qs), topk=k, fusion=args.fusion, with_text=False)
+                     if hybrid else retrieve_dense_batch(client, qvecs, topk=k, with_text=False))
+            for q, c in zip(batch, cands): run.add(q, c)
+        run.save()
+    print(f"Recall@{k}: {len(qids) - len(miss)} queries from {run.path}, {len(miss)} recalled in {time.time() - t0:.1f}s")
+    return {q: run.run[q] for q in qids}
+
+def _sweep(client, args, corpus, qids, queries, qrels):
+    """One shared recall pass at the largest cutoff, then every reranker x cutoff on its prefix of the
+    candidates; prints one comparison table (and writes a TREC run per configuration with --trec-dir)."""
+    if not qids:
+        print("No queries to evaluate (check --covered-only or MAX_DOCS)."); return
+    cutoffs = sorted(set(args.cutoffs or [args.k])); kmax = cutoffs[-1]
+    names = [n.strip() for n in args.sweep.split(",") if n.strip()]
+    bad = [n for n in names if n not in RERANKERS + ["none"]]
+    if bad: raise SystemExit(f"unknown reranker(s) in --sweep: {', '.join(bad)}")
+    models = {}
+    def get(name):
+        if name not in models:
+            if name == "cascade":
+                from ..models.reranker_cascade import CascadeReranker
+                models[name] = CascadeReranker(get("minicoil"), get("colbert"), m=args.m, adaptive=args.adaptive)
+            else:
+                models[name] = make_reranker(name)
+        return models[name]
+    stored = args.rerank_mode == "stored"
+    # The shared recall run keeps ids and scores only, so stored mode can only read vectors kept outside Qdrant:
+    # ColBERT's local token store. MiniCOIL vectors (minicoil, cascade) only ever live in Qdrant.
+    if stored:
+        why = {n: ("MiniCOIL vectors are only stored in Qdrant, use --rerank-mode text" if n != "colbert"
+                   else "set COLBERT_STORE to a token store built with scripts.colbert_store")
+               for n in names if n != "none" and get(n).vector_names}
+        if why: raise SystemExit("--sweep --rerank-mode stored can't fetch vectors from Qdrant: "
+                                 + "; ".join(f"{n}: {w}" for n, w in why.items()))
+    hybrid = get("minicoil") if args.recall == "hybrid" else None
+    shared = _shared_recall(client, args, qids, queries, kmax, hybrid)
+    store = get_doc_store()
+    def text(did):
+        m = corpus.get(did)
+        return _prep(m) if m is not None else ((store.get([did])[0] or "") if store is not None else "")
+    texts = {d: text(d) for hits in shared.values() for d, _ in hits}
+    base = "hybrid/" + args.fusion if hybrid else "dense"
+    rows = []
+    def score(tag, name, k, run, ms):
+        ids = [[d for d, _ in run[q][:TOPK_SHOW]] for q in qids]
+        rel, lens = relevance(ids, qrels, qids, DEPTH)
+        rows.append({"config": tag, "reranker": name, "k": k, "nDCG@10": ndcg_at_10(rel).mean(), "MRR@10": mrr_at_10(rel).mean(),
+                     "P@10": precision_at_k(rel, lens).mean(), "Recall@k": recall_at_k([[d for d, _ in shared[q][:k]] for q in qids], qrels, qids, k),
+                     "ms/query": ms})
+        if args.trec_dir: write_trec(os.path.join(args.trec_dir, f"{tag}.trec"), run, tag)
+    for k in cutoffs: score(f"{base}@{k}", base, k, {q: shared[q][:k] for q in qids}, 0.0)
+    bs = args.batch_size or 32
+    for name in names:
+        if name == "none": continue
+        rr = get(name)
+        if not args.no_cache: _, rr = with_cache(None, rr)
+        for k in cutoffs:
+            out = {}; t0 = time.time()
+            for i in tqdm(range(0, len(qids), bs), desc=f"{name}@{k}"):
+                batch = qids[i:i + bs]
+                cands = [[{"id": d, "score": sc, "text": texts[d]} for d, sc in shared[q][:k]] for q in batch]
+                for q, post in zip(batch, rr.rerank_batch([queries[q] for q in batch], cands, stored=stored)):
+                    out[q] = [(c["id"], c["rerank_score"]) for c in post]
+            score(f"{name}@{k}", name, k, out, 1000 * (time.time() - t0) / max(1, len(qids)))
+    print(f"\n=== Sweep over {len(qids)} queries ({base} recall, {args.rerank_mode} rerank) ===")
+    cols = ["nDCG@10", "MRR@10", "P@10", "Recall@k", "ms/query"]; w = max(len(r["config"]) for r in rows)
+    print(f"{'config':<{w}}  " + "  ".join(f"{c:>9}" for c in cols))
+    for r in rows:
+        print(f"{r['config']:<{w}}  " + "  ".join(f"{r[c]:>9.2f}" if c == "ms/query" else f"{r[c]:>9.4f}" for c in cols))
+    if args.trec_dir: print(f"TREC runs written to {args.trec_dir}")
+
+def _pcts(ms) -> str:
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return f"p50 {p50:.1f} / p95 {p95:.1f} / p99 {p99:.1f} ms"
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--limit", type=int, default=EVAL_LIMIT)
     ap.add_argument("--k", type=int, default=TOPK_RECALL)
-    ap.add_argument("--reranker", choices=["minicoil", "colbert"], default="minicoil")
+    ap.add_argument("--reranker", choices=RERANKERS, default="minicoil")
+    ap.add_argument("--m", type=int, default=CASCADE_M, help="cascade: candidates kept for ColBERT after MiniCOIL")
+    ap.add_argument("--adaptive", action="store_true", default=CASCADE_ADAPTIVE,
+                    help="cascade: pick K/M per query from the dense score distribution")
+    ap.add_argument("--rerank-mode", choices=["text", "stored", "server"], default=RERANK_MODE)
+    ap.add_argument("--batch-size", type=int, default=0,
+                    help="embed/recall/rerank queries in batches, overlapping recall with rerank (0 = one query at a time)")
     ap.add_argument("--covered-only", action="store_true")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the query cache (see CACHE_* in config)")
+    ap.add_argument("--trace", action="store_true", default=trace.enabled(),
+                    help="time pipeline stages (embed, qdrant, tokenize, forward, maxsim, ...) and print a breakdown")
+    ap.add_argument("--trace-out", default="", help="with --trace and no --batch-size: write per-query stage timings as JSONL")
+    ap.add_argument("--ids-only", action="store_true", default=RECALL_IDS_ONLY,
+                    help="recall ids and scores only; text rerankers read text from the local doc store (DOC_STORE)")
+    ap.add_argument("--recall", choices=["dense", "hybrid"], default=RECALL_MODE,
+                    help="hybrid: dense + MiniCOIL sparse candidates fused in Qdrant (needs MINICOIL_INGEST=1)")
+    ap.add_argument("--fusion", choices=list(FUSIONS), default=FUSION)
+    ap.add_argument("--sweep", default="",
+                    help="comma-separated rerankers (minicoil,colbert,cascade) to compare on one shared, cached recall pass")
+    ap.add_argument("--cutoffs", type=lambda s: [int(x) for x in s.split(",")], default=[],
+                    help="with --sweep: rerank depths to compare, e.g. 20,50,100 (default: --k)")
+    ap.add_argument("--trec-dir", default="", help="write TREC-format runs (one file per configuration) to this directory")
     args = ap.parse_args()
+    if args.ids_only and get_doc_store() is None: ap.error("--ids-only needs a doc store built at ingest (DOC_STORE)")
+    trace.enable(args.trace)
 
     corpus, queries, qrels = load_beir(DATASET, DATA_DIR, split="test")
     client = get_client()
@@ -61,56 +273,78 @@ def main():
         indexed = _indexed_ids(client, COLLECTION)
         qids = [qid for qid in qids if any(d in indexed for d in qrels.get(qid, {}))]
     qids = qids[:args.limit]
+    if args.sweep:
+        if args.rerank_mode == "server": ap.error("--sweep reranks shared candidates locally; use --rerank-mode text or stored")
+        _sweep(client, args, corpus, qids, queries, qrels)
+        return
 
     # You can embed here and pass vectors, or just pass text and let another
     # function embed. Here we embed explicitly to match your API.
     emb = Embedder()
-    reranker = MiniCOILReranker(SPARSE_MODEL) if args.reranker == "minicoil" else ColbertReranker(COLBERT_CKPT)
+    reranker = make_reranker(args.reranker, m=args.m, adaptive=args.adaptive)
+    mode = args.rerank_mode
+    cache = None if args.no_cache else get_cache()
+    if cache: emb, reranker = with_cache(emb, reranker, cache)
+    hybrid = (sparse_encoder(reranker), args.fusion) if args.recall == "hybrid" else None
 
-    ndcg_pre, ndcg_post = [], []
-    mrr_pre,  mrr_post  = [], []
-    p10_pre,  p10_post  = [], []
-    t_rec, t_rr = [], []
+    pre_ids, post_ids, cand_ids = [], [], []
+    t_rec, t_rr, t_tot = [], [], []
+    out_qids = []; trec_pre, trec_post = {}, {}
 
-    for qid in tqdm(qids):
-        q = queries[qid]
+    traces = None
+    if args.batch_size > 0:
+        runs = _run_batched(client, emb, reranker, mode, qids, queries, args.k, args.batch_size, not args.ids_only, hybrid)
+    else:
+        traces = []
+        runs = _run_single(client, emb, reranker, mode, qids, queries, args.k, cache, traces, not args.ids_only, hybrid)
 
-        # Recall (dense): embed then search the named vector "dense"
-        t0 = time.time()
-        qvec = emb.encode([q])[0]
-        cands = retrieve_dense(client, qvec, topk=args.k)
-        t1 = time.time()
-
-        # Rerank
-        post = reranker.rerank(q, cands)[:TOPK_SHOW]
-        t2 = time.time()
-
-        t_rec.append(t1 - t0); t_rr.append(t2 - t1)
-
-        pre = cands[:TOPK_SHOW]
-        rel = qrels.get(qid, {})  # {doc_id: grade}
-
-        tobin = lambda did: 1 if rel.get(did, 0) > 0 else 0
-        y_pre  = [tobin(d["id"]) for d in pre]
-        y_post = [tobin(d["id"]) for d in post]
-
-        ndcg_pre.append(ndcg_at_10(y_pre)); ndcg_post.append(ndcg_at_10(y_post))
-        mrr_pre.append(mrr_at_10(y_pre));   mrr_post.append(mrr_at_10(y_post))
-        p10_pre.append(precision_at_k(y_pre, k=10)); p10_post.append(precision_at_k(y_post, k=10))
+    t_start = time.time()
+    for qid, cands, post, dt_rec, dt_rr, dt_tot in runs:
+        t_rec.append(dt_rec); t_rr.append(dt_rr); t_tot.append(dt_tot)
+        out_qids.append(qid); cand_ids.append([d["id"] for d in cands])
+        pre_ids.append([d["id"] for d in cands[:TOPK_SHOW]]); post_ids.append([d["id"] for d in post])
+        if args.trec_dir:
+            trec_pre[qid] = [(d["id"], d["score"]) for d in cands]
+            trec_post[qid] = [(d["id"], d.get("rerank_score", d["score"])) for d in post]
+    wall = time.time() - t_start
 
     if not qids:
         print("No queries to evaluate (check --covered-only or MAX_DOCS).")
         return
 
+    (r_pre, l_pre), (r_post, l_post) = relevance(pre_ids, qrels, out_qids, DEPTH), relevance(post_ids, qrels, out_qids, DEPTH)
     print(f"\n=== Evaluation (avg over {len(qids)} queries) ===")
-    print(f"nDCG@10  no-rerank: {np.mean(ndcg_pre):.4f}  | rerank: {np.mean(ndcg_post):.4f}")
-    print(f"MRR@10   no-rerank: {np.mean(mrr_pre):.4f}   | rerank: {np.mean(mrr_post):.4f}")
-    print(f"P@10     no-rerank: {np.mean(p10_pre):.4f}   | rerank: {np.mean(p10_post):.4f}")
-
-    rec_ms = 1000*np.array(t_rec); rr_ms = 1000*np.array(t_rr)
-    print(f"Latency p50 — recall: {np.percentile(rec_ms,50):.1f} ms | "
-          f"rerank: {np.percentile(rr_ms,50):.1f} ms | "
-          f"total: {np.percentile(rec_ms+rr_ms,50):.1f} ms")
+    print(f"nDCG@10  no-rerank: {ndcg_at_10(r_pre).mean():.4f}  | rerank: {ndcg_at_10(r_post).mean():.4f}")
+    print(f"MRR@10   no-rerank: {mrr_at_10(r_pre).mean():.4f}   | rerank: {mrr_at_10(r_post).mean():.4f}")
+    print(f"P@10     no-rerank: {precision_at_k(r_pre, l_pre).mean():.4f}   | rerank: {precision_at_k(r_post, l_post).mean():.4f}")
+    rk = recall_at_k(cand_ids, qrels, out_qids, args.k)
+    if not math.isnan(rk): print(f"Recall@{args.k} of candidates ({args.recall}{'/' + args.fusion if args.recall == 'hybrid' else ''}): {rk:.4f}")
+    if args.trec_dir:
+        write_trec(os.path.join(args.trec_dir, f"{args.recall}.trec"), trec_pre, args.recall)
+        write_trec(os.path.join(args.trec_dir, f"{args.reranker}.trec"), trec_post, args.reranker)
+        print(f"TREC runs written to {args.trec_dir}")
+
+    rec_ms = 1000*np.array(t_rec); rr_ms = 1000*np.array(t_rr); tot_ms = 1000*np.array(t_tot)
+    label = f"batch={args.batch_size}" if args.batch_size > 0 else "per query"
+    print(f"Latency ({label}) — recall: {_pcts(rec_ms)}")
+    print(f"                     rerank: {_pcts(rr_ms)}")
+    print(f"                     total:  {_pcts(tot_ms)}")
+    print(f"Throughput: {len(qids)/wall:.1f} queries/s ({wall:.1f} s wall)")
+    if args.reranker == "cascade" and mode != "server":
+        s = reranker.summary()
+        if s:
+            print(f"Cascade: mean K {s['k']:.1f} → mean M {s['m']:.1f} | "
+                  f"minicoil {s['minicoil_ms']:.1f} ms | colbert {s['colbert_ms']:.1f} ms per query")
+    if cache:
+        s = cache.stats()
+        print(f"Cache: {s['hits']} hits ({s['disk_hits']} from disk) / {s['misses']} misses — hit rate {s['hit_rate']:.1%}")
+    if args.trace:
+        print("\nStage breakdown (batched stages run once per batch):" if args.batch_size > 0 else "\nStage breakdown:")
+        print(trace.format_summary(per=len(qids)))
+        if traces and args.trace_out:
+            with open(args.trace_out, "w") as f:
+                for t in traces: f.write(json.dumps(t) + "\n")
+            print(f"Per-query stage timings written to {args.trace_out}")
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,35 @@
 
+import argparse
 from ..logging import get_logger
-from ..config import DATASET, DATA_DIR
-from ..data.loader import load_beir
+from ..config import DATASET, DATA_DIR, UPSERT_PARALLEL, UPSERT_QUEUE, QDRANT_GRPC, MINICOIL_INGEST, INGEST_WORKERS
+from ..data.loader import load_beir, iter_corpus
 from ..qdrant.client import get_client
-from ..qdrant.index import index_corpus_dense
+from ..qdrant.index import index_corpus_dense, index_corpus_stream, index_corpus_incremental, index_corpus_shadow
 logger=get_logger(__name__)
 def main():
+    ap=argparse.ArgumentParser()
+    how=ap.add_mutually_exclusive_group()
+    how.add_argument("--stream", action="store_true", help="read corpus.jsonl lazily and checkpoint progress")
+    how.add_argument("--incremental", action="store_true",
+                     help="embed and upsert only new or changed documents (by content hash) and delete removed ones")
+    how.add_argument("--shadow", action="store_true",
+                     help="full rebuild into a new collection, then switch the COLLECTION alias to it atomically")
+    ap.add_argument("--fresh", action="store_true", help="with --stream: ignore the checkpoint and rebuild")
+    ap.add_argument("--parallel", type=int, default=UPSERT_PARALLEL, help="concurrent upserts")
+    ap.add_argument("--queue", type=int, default=UPSERT_QUEUE, help="max batches embedded but not yet upserted")
+    ap.add_argument("--grpc", action="store_true", default=QDRANT_GRPC)
+    ap.add_argument("--minicoil", action="store_true", default=MINICOIL_INGEST,
+                    help="also store MiniCOIL sparse vectors (stored/server rerank, hybrid recall)")
+    ap.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                    help="encode in this many worker processes, each with its own models (0 = in this process)")
+    args=ap.parse_args()
+    client=get_client(prefer_grpc=args.grpc)
+    if args.stream:
+        index_corpus_stream(client, iter_corpus(DATASET, DATA_DIR), resume=not args.fresh,
+                            parallel=args.parallel, queue=args.queue, with_minicoil=args.minicoil, workers=args.workers)
+        return
     corpus,_,_=load_beir(DATASET, DATA_DIR, split="test")
-    client=get_client()
-    index_corpus_dense(client, corpus)
+    build=index_corpus_incremental if args.incremental else index_corpus_shadow if args.shadow else index_corpus_dense
+    build(client, corpus, with_minicoil=args.minicoil, workers=args.workers)
 if __name__=="__main__":
     main()
@@ -0,0 +1,77 @@
+
+import argparse, time
+from random import Random
+import numpy as np
+from ..config import DATASET, DATA_DIR, EMB_MODEL, COLBERT_CKPT
+from ..data.loader import load_beir
+from ..models.backend import BACKENDS
+from ..logging import get_logger
+logger=get_logger(__name__)
+
+def _spearman(a, b) -> float:
+    ra=np.argsort(np.argsort(a)); rb=np.argsort(np.argsort(b))
+    return float(np.corrcoef(ra, rb)[0,1]) if len(a)>1 else 1.0
+
+def _overlap(a, b, n=10) -> float:
+    ta=set(np.argsort(-a)[:n]); tb=set(np.argsort(-b)[:n])
+    return len(ta & tb)/max(1, min(n, len(a)))
+
+def _sample(n_queries, k, seed=13):
+    """Per query: its relevant docs plus random fillers, so scores span relevant and irrelevant text."""
+    corpus, queries, qrels = load_beir(DATASET, DATA_DIR, split="test")
+    rnd=Random(seed); doc_ids=list(corpus); qids=[q for q in queries if q in qrels][:n_queries]
+    text=lambda d: (corpus[d].get("title","")+" "+corpus[d].get("text","")).strip()
+    sets=[]
+    for qid in qids:
+        rel=[d for d in qrels[qid] if d in corpus][:k]
+        sets.append((queries[qid], [text(d) for d in rel+rnd.sample(doc_ids, k-len(rel))]))
+    return sets
+
+def _embedder(sets, backend):
+    from ..models.embedder import Embedder
+    texts=[t for q,ds in sets for t in [q]+ds]
+    out={}
+    for name in ("torch", backend):
+        emb=Embedder(EMB_MODEL, backend=name); emb.encode(texts[:8])  # warm-up
+        t0=time.time(); out[name]=np.asarray(emb.encode(texts)); out[name+"_s"]=time.time()-t0
+    a,b=out["torch"],out[backend]
+    cos=(a*b).sum(1)/(np.linalg.norm(a,axis=1)*np.linalg.norm(b,axis=1))
+    return {"cos_mean": float(cos.mean()), "cos_min": float(cos.min()),
+            "fp32_s": out["torch_s"], "backend_s": out[backend+"_s"], "speedup": out["torch_s"]/out[backend+"_s"]}
+
+def _colbert(sets, backend):
+    from ..models.reranker_colbert import ColbertReranker, _maxsim
+    scores={}; secs={}
+    for name in ("torch", backend):
+        rr=ColbertReranker(COLBERT_CKPT, backend=name); rr._enc_ds(sets[0][1][:4])  # warm-up
+        t0=time.time(); s=[]
+        for q,ds in sets:
+            qe,qm=rr._enc_q([q]); de,dm=rr._enc_ds(ds)
+            s.append(_maxsim(qe,qm,de,dm)[0].cpu().numpy())
+        secs[name]=time.time()-t0; scores[name]=s
+    a,b=scores["torch"],scores[backend]
+    return {"spearman_mean": float(np.mean([_spearman(x,y) for x,y in zip(a,b)])),
+            "pearson_all": float(np.corrcoef(np.concatenate(a), np.concatenate(b))[0,1]),
+            "top10_overlap": float(np.mean([_overlap(x,y) for x,y in zip(a,b)])),
+            "fp32_s": secs["torch"], "backend_s": secs[backend], "speedup": secs["torch"]/secs[backend]}
+
+def main():
+    ap=argparse.ArgumentParser(description="Compare an inference backend against fp32 on a BEIR sample")
+    ap.add_argument("--backend", choices=[b for b in BACKENDS if b!="torch"], required=True)
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--k", type=int, default=30, help="documents scored per query")
+    ap.add_argument("--models", choices=["both","embedder","colbert"], default="both")
+    args=ap.parse_args()
+    sets=_sample(args.queries, args.k)
+    print(f"\n=== Parity: {args.backend} vs fp32 ({len(sets)} queries x {args.k} docs) ===")
+    if args.models in ("both","embedder"):
+        r=_embedder(sets, args.backend)
+        print(f"Embedder  cosine mean {r['cos_mean']:.4f} / min {r['cos_min']:.4f} | "
+              f"fp32 {r['fp32_s']:.2f}s → {r['backend_s']:.2f}s ({r['speedup']:.2f}x)")
+    if args.models in ("both","colbert"):
+        r=_colbert(sets, args.backend)
+        print(f"ColBERT   spearman {r['spearman_mean']:.4f} | pearson {r['pearson_all']:.4f} | "
+              f"top-10 overlap {r['top10_overlap']:.1%} | fp32 {r['fp32_s']:.2f}s → {r['backend_s']:.2f}s ({r['speedup']:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,64 @@
-
-import argparse, time
-from ..qdrant.client import get_client
-from ..qdrant.search import retrieve_dense
-from ..models.reranker_minicoil import MiniCOILReranker
-from ..models.reranker_colbert import ColbertReranker
-from ..config import TOPK_SHOW, COLBERT_CKPT, SPARSE_MODEL
+import argparse, sys, time
+_T0=time.perf_counter()
+from ..config import (TOPK_SHOW, RERANK_MODE, CASCADE_M, CASCADE_ADAPTIVE, RECALL_IDS_ONLY, RECALL_MODE, FUSION, DAEMON_SOCKET)
+from ..models.registry import RERANKERS
+from ..service.daemon import search as daemon_search, DaemonUnavailable, DaemonError
+# Only the standard library, config and the reranker names are imported up front: with the daemon running
+# (scripts.daemon start) this process never loads torch, Qdrant or a model.
+def _in_process(params, ap):
+    from ..data.doc_store import get_doc_store
+    from ..service.warm import WarmModels
+    if params["ids_only"] and get_doc_store() is None: ap.error("--ids-only needs a doc store built at ingest (DOC_STORE)")
+    return WarmModels(warmup=False).search(**params)
 def main():
     ap=argparse.ArgumentParser()
     ap.add_argument("--q", required=True)
     ap.add_argument("--k", type=int, default=100)
     ap.add_argument("--show", type=int, default=TOPK_SHOW)
-    ap.add_argument("--reranker", choices=["minicoil","colbert","none"], default="minicoil")
+    ap.add_argument("--reranker", choices=RERANKERS+["none"], default="minicoil")
+    ap.add_argument("--m", type=int, default=CASCADE_M, help="cascade: candidates kept for ColBERT after MiniCOIL")
+    ap.add_argument("--adaptive", action="store_true", default=CASCADE_ADAPTIVE,
+                    help="cascade: pick K/M per query from the dense score distribution")
+    ap.add_argument("--rerank-mode", choices=["text","stored","server"], default=RERANK_MODE,
+                    help="text: embed candidate texts per query; stored/server: use the reranker's vectors stored at ingest")
+    ap.add_argument("--no-cache", action="store_true", help="bypass the query cache (see CACHE_* in config)")
+    ap.add_argument("--ids-only", action="store_true", default=RECALL_IDS_ONLY,
+                    help="recall ids and scores only; text comes from the local doc store (DOC_STORE) when needed")
+    ap.add_argument("--recall", choices=["dense","hybrid"], default=RECALL_MODE,
+                    help="hybrid: dense + MiniCOIL sparse candidates fused in Qdrant (needs MINICOIL_INGEST=1)")
+    ap.add_argument("--fusion", choices=["rrf","dbsf"], default=FUSION)
+    ap.add_argument("--socket", default=DAEMON_SOCKET, help="query daemon socket (see scripts.daemon)")
+    ap.add_argument("--no-daemon", action="store_true", help="always run in this process")
     args=ap.parse_args()
-    client=get_client()
-    t0=time.time(); cands=retrieve_dense(client, args.q, k=args.k); t1=time.time()
-    if args.reranker=="none":
-        post=cands[:args.show]
-    elif args.reranker=="minicoil":
-        rr=MiniCOILReranker(SPARSE_MODEL); post=rr.rerank(args.q, cands)[:args.show]
-    else:
-        rr=ColbertReranker(COLBERT_CKPT); post=rr.rerank(args.q, cands)[:args.show]
-    t2=time.time()
-    print("\n=== Before (dense-only) ===")
-    for i,c in enumerate(cands[:args.show],1): print(f"{i:2d}. ({c['score']:.3f}) {c['text'][:180]}...")
+    params=dict(q=args.q, k=args.k, show=args.show, reranker=args.reranker, rerank_mode=args.rerank_mode, recall=args.recall,
+                fusion=args.fusion, ids_only=args.ids_only, m=args.m, adaptive=args.adaptive, cached=not args.no_cache)
+    res=None; where="in-process"
+    if not args.no_daemon:
+        try:
+            res=daemon_search(params, args.socket); where="daemon"
+        except DaemonUnavailable:
+            pass
+        except DaemonError as e:
+            if "config mismatch" not in str(e): sys.exit(f"Daemon error: {e}")
+            print(f"Daemon on {args.socket} runs with different settings; running in-process", file=sys.stderr)
+    if res is None: res=_in_process(params, ap)
+    wall=1000*(time.perf_counter()-_T0)
+    cands, post=res["before"], res["after"]
+    print(f"\n=== Before ({args.recall} recall) ===")
+    for i,c in enumerate(cands,1): print(f"{i:2d}. ({c['score']:.3f}) {c['text'][:180]}...")
     print(f"\n=== After (reranked: {args.reranker}) ===")
-    pre_rank={c['id']:i+1 for i,c in enumerate(cands[:args.show])}
+    pre_rank={c['id']:i+1 for i,c in enumerate(cands)}
     for i,c in enumerate(post,1):
         was=pre_rank.get(c['id']); tag=f" (was #{was})" if was else ""
         rs=c.get('rerank_score',0.0)
         print(f"{i:2d}. ({rs:.3f}){tag} {c['text'][:180]}...")
-    print(f"\nLatency — recall: {(t1-t0)*1000:.1f} ms | rerank: {(t2-t1)*1000:.1f} ms | total: {(t2-t0)*1000:.1f} ms")
+    lat=res["latency_ms"]
+    print(f"\nLatency — recall: {lat['recall']:.1f} ms | rerank: {lat['rerank']:.1f} ms | total: {lat['total']:.1f} ms")
+    loads=" + ".join(f"{k} {v:.0f} ms" for k,v in res["load_ms"].items())
+    state=f"cold, loaded {loads}" if loads else "warm"
+    print(f"Mode — {where} ({state}) | wall clock incl. imports: {wall:.0f} ms")
+    h=res["cascade"]
+    if h: print(f"Cascade — K: {h['k']} | M: {h['m']} | minicoil: {h['minicoil_ms']:.1f} ms | colbert: {h['colbert_ms']:.1f} ms")
+    s=res["cache"]
+    if s: print(f"Cache — hits: {s['hits']} (disk {s['disk_hits']}) | misses: {s['misses']}")
 if __name__=="__main__": main()
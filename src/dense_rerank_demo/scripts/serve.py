@@ -0,0 +1,51 @@
+
+import argparse
+from aiohttp import web
+from ..config import (EMB_MODEL, SPARSE_MODEL, COLBERT_CKPT, RERANK_MODE, SERVE_HOST, SERVE_PORT,
+                      SERVE_MAX_BATCH, SERVE_MAX_WAIT_MS, SERVE_MAX_QUEUE, SERVE_TIMEOUT_MS, RECALL_IDS_ONLY)
+from ..qdrant.client import get_async_client
+from ..models.embedder import Embedder
+from ..cache import get_cache, with_cache
+from ..data.doc_store import get_doc_store
+from ..service.app import SearchService, make_app
+from .. import trace
+from ..logging import get_logger
+logger=get_logger(__name__)
+def main():
+    ap=argparse.ArgumentParser(description="Async search service with micro-batched embedding and reranking")
+    ap.add_argument("--host", default=SERVE_HOST)
+    ap.add_argument("--port", type=int, default=SERVE_PORT)
+    ap.add_argument("--rerankers", default="minicoil,colbert", help="comma-separated subset of minicoil,colbert,cascade")
+    ap.add_argument("--rerank-mode", choices=["text","stored"], default="stored" if RERANK_MODE=="stored" else "text")
+    ap.add_argument("--max-batch", type=int, default=SERVE_MAX_BATCH)
+    ap.add_argument("--max-wait-ms", type=float, default=SERVE_MAX_WAIT_MS)
+    ap.add_argument("--max-queue", type=int, default=SERVE_MAX_QUEUE)
+    ap.add_argument("--timeout-ms", type=float, default=SERVE_TIMEOUT_MS)
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--trace", action="store_true", default=trace.enabled(), help="record stage histograms for /metrics/prometheus")
+    ap.add_argument("--ids-only", action="store_true", default=RECALL_IDS_ONLY,
+                    help="recall ids and scores only; text comes from the local doc store (DOC_STORE) when needed")
+    args=ap.parse_args(); trace.enable(args.trace)
+    if args.ids_only and get_doc_store() is None: ap.error("--ids-only needs a doc store built at ingest (DOC_STORE)")
+    names=[n.strip() for n in args.rerankers.split(",") if n.strip()]
+    emb=Embedder(EMB_MODEL); rerankers={}
+    if "minicoil" in names:
+        from ..models.reranker_minicoil import MiniCOILReranker
+        rerankers["minicoil"]=MiniCOILReranker(SPARSE_MODEL)
+    if "colbert" in names:
+        from ..models.reranker_colbert import ColbertReranker
+        rerankers["colbert"]=ColbertReranker(COLBERT_CKPT)
+    if "cascade" in names:
+        from ..models.registry import make_reranker
+        from ..models.reranker_cascade import CascadeReranker
+        # Own model instances: each reranker's batcher runs on its own thread, and the models' caches aren't thread-safe.
+        rerankers["cascade"]=CascadeReranker(make_reranker("minicoil"), make_reranker("colbert"))
+    cache=None if args.no_cache else get_cache()
+    if cache:
+        emb,_=with_cache(emb, None, cache)
+        rerankers={n: with_cache(None, rr, cache)[1] for n,rr in rerankers.items()}
+    svc=SearchService(get_async_client(), emb, rerankers, mode=args.rerank_mode, timeout_ms=args.timeout_ms, ids_only=args.ids_only,
+                      max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, max_queue=args.max_queue)
+    logger.info("Serving on http://%s:%d (rerankers: %s)", args.host, args.port, ", ".join(rerankers) or "none")
+    web.run_app(make_app(svc), host=args.host, port=args.port, print=None)
+if __name__=="__main__": main()
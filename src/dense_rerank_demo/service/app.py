@@ -0,0 +1,111 @@
+
+import asyncio
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+from ..config import TOPK_RECALL, TOPK_SHOW, SERVE_TIMEOUT_MS, RERANK_MODE, RECALL_IDS_ONLY
+from ..data.doc_store import hydrate
+from ..qdrant.search import retrieve_dense_async
+from .. import trace
+from ..logging import get_logger
+from .batching import MicroBatcher, Overloaded, DeadlineExceeded
+logger=get_logger(__name__)
+
+class SearchService:
+    """Dense recall on an ``AsyncQdrantClient`` with query embedding and reranking micro-batched
+    across concurrent requests."""
+    def __init__(self, client, emb, rerankers: Dict[str, Any], mode: str = RERANK_MODE,
+                 timeout_ms: float = SERVE_TIMEOUT_MS, ids_only: bool = RECALL_IDS_ONLY, **batch_kw):
+        self.client=client; self.rerankers=rerankers; self.timeout=timeout_ms/1000.0; self.ids_only=ids_only
+        self.mode="stored" if mode=="stored" else "text"
+        self.embed=MicroBatcher(emb.encode, "embed", **batch_kw)
+        self.rerank={name: MicroBatcher(self._rerank_fn(rr), f"rerank-{name}", **batch_kw) for name,rr in rerankers.items()}
+        self.latencies: List[float]=[]
+    def _rerank_fn(self, rr):
+        stored=self.mode=="stored"
+        def fn(items):
+            return rr.rerank_batch([q for q,_ in items], [c for _,c in items], stored=stored)
+        return fn
+    async def start(self):
+        self.embed.start()
+        for b in self.rerank.values(): b.start()
+    async def stop(self):
+        await self.embed.stop()
+        for b in self.rerank.values(): await b.stop()
+    async def search(self, q: str, k: int = TOPK_RECALL, show: int = TOPK_SHOW, reranker: str = "none",
+                     timeout_ms: Optional[float] = None) -> Dict[str, Any]:
+        if reranker!="none" and reranker not in self.rerank: raise KeyError(reranker)
+        loop=asyncio.get_running_loop(); t0=loop.time()
+        deadline=t0+(timeout_ms/1000.0 if timeout_ms else self.timeout)
+        qvec=await self.embed.submit(q, deadline); t1=loop.time()
+        rr=self.rerankers.get(reranker)
+        with_vectors=rr.vector_names if rr is not None and self.mode=="stored" else None
+        cands=await asyncio.wait_for(retrieve_dense_async(self.client, qvec, topk=k, with_vectors=with_vectors,
+                                                          with_text=not self.ids_only),
+                                     max(0.0, deadline-loop.time()))
+        t2=loop.time()
+        post=(await self.rerank[reranker].submit((q, cands), deadline)) if rr is not None and cands else cands
+        t3=loop.time()
+        self.latencies.append(t3-t0); del self.latencies[:-10000]
+        if with_vectors:
+            post=[{k_:v for k_,v in c.items() if k_ not in with_vectors} for c in post]
+        if self.ids_only: hydrate(post[:show])
+        return {"q": q, "reranker": reranker, "results": post[:show],
+                "latency_ms": {"embed": 1000*(t1-t0), "recall": 1000*(t2-t1), "rerank": 1000*(t3-t2), "total": 1000*(t3-t0)}}
+    def stats(self) -> Dict[str, Any]:
+        lat=sorted(self.latencies); n=len(lat)
+        pct=lambda p: 1000*lat[min(n-1, int(p*n))] if n else 0.0
+        return {"requests": n, "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+                "embed": self.embed.stats(), **{f"rerank_{k}": b.stats() for k,b in self.rerank.items()}}
+
+def _int(body: Dict[str, Any], name: str, default: int) -> int:
+    v=body.get(name, default)
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or (isinstance(v, float) and not v.is_integer()) or v<1:
+        raise ValueError(f"{name} must be a positive integer")
+    return int(v)
+
+def parse_search(body: Any, rerankers: Dict[str, Any]) -> Dict[str, Any]:
+    """``SearchService.search`` arguments from a /search request body; ``ValueError`` if it is malformed."""
+    if not isinstance(body, dict): raise ValueError("body must be a JSON object")
+    q=body.get("q")
+    if not isinstance(q, str) or not q.strip(): raise ValueError("q must be a non-empty string")
+    reranker=body.get("reranker", "none")
+    if not isinstance(reranker, str): raise ValueError("reranker must be a string")
+    reranker=reranker.lower()
+    if reranker!="none" and reranker not in rerankers:
+        raise ValueError(f"unknown reranker {reranker!r} (available: {', '.join(['none', *sorted(rerankers)])})")
+    timeout_ms=body.get("timeout_ms")
+    if timeout_ms is not None and (isinstance(timeout_ms, bool) or not isinstance(timeout_ms, (int, float)) or timeout_ms<=0):
+        raise ValueError("timeout_ms must be a positive number")
+    return {"q": q.strip(), "k": _int(body, "k", TOPK_RECALL), "show": _int(body, "show", TOPK_SHOW),
+            "reranker": reranker, "timeout_ms": timeout_ms}
+
+def make_app(service: SearchService) -> web.Application:
+    async def search(request: web.Request):
+        # Only a malformed request is the client's fault; model and Qdrant failures surface as 500s.
+        try:
+            params=parse_search(await request.json(), service.rerank)
+        except ValueError as e:  # includes invalid JSON
+            return web.json_response({"error": f"bad request: {e}"}, status=400)
+        try:
+            res=await service.search(**params)
+        except Overloaded:
+            return web.json_response({"error": "overloaded"}, status=503, headers={"Retry-After": "1"})
+        except (DeadlineExceeded, asyncio.TimeoutError):
+            return web.json_response({"error": "deadline exceeded"}, status=504)
+        return web.json_response(res)
+    async def metrics(request: web.Request):
+        return web.json_response(service.stats())
+    async def prometheus(request: web.Request):
+        # Stage histograms are only populated while tracing is on (TRACE_ENABLED / serve --trace).
+        return web.Response(text=trace.prometheus_text(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Trace-Enabled": str(int(trace.enabled()))})
+    async def healthz(request: web.Request):
+        return web.json_response({"ok": True, "rerankers": sorted(service.rerank)})
+    async def on_startup(app): await service.start()
+    async def on_cleanup(app):
+        await service.stop(); await service.client.close()
+    app=web.Application()
+    app.add_routes([web.post("/search", search), web.get("/metrics", metrics),
+                    web.get("/metrics/prometheus", prometheus), web.get("/healthz", healthz)])
+    app.on_startup.append(on_startup); app.on_cleanup.append(on_cleanup)
+    return app
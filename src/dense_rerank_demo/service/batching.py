@@ -0,0 +1,97 @@
+
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from ..config import SERVE_MAX_BATCH, SERVE_MAX_WAIT_MS, SERVE_MAX_QUEUE
+from ..logging import get_logger
+logger=get_logger(__name__)
+
+class Overloaded(Exception):
+    """The batcher queue is full; the caller should shed the request (HTTP 503)."""
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before its batch ran."""
+
+class BatchMetrics:
+    def __init__(self):
+        self.submitted=self.rejected=self.expired=self.errors=self.batches=self.items=0
+        self.max_queue_depth=0
+        self.batch_sizes: Counter=Counter()
+        self.run_seconds=0.0
+    def observe(self, size: int, depth: int, seconds: float):
+        self.batches+=1; self.items+=size; self.batch_sizes[size]+=1
+        self.max_queue_depth=max(self.max_queue_depth, depth); self.run_seconds+=seconds
+    def to_dict(self, queue_depth: int) -> Dict[str, Any]:
+        return {"submitted": self.submitted, "rejected": self.rejected, "expired": self.expired, "errors": self.errors,
+                "batches": self.batches, "items": self.items,
+                "mean_batch_size": (self.items/self.batches) if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "queue_depth": queue_depth, "max_queue_depth": self.max_queue_depth,
+                "run_seconds": self.run_seconds}
+
+class MicroBatcher:
+    """Collects concurrent ``submit`` calls for up to ``max_wait_ms`` or ``max_batch`` items, then runs
+    ``fn(items) -> results`` once for the whole batch on a dedicated worker thread.
+
+    A full queue rejects immediately (``Overloaded``) instead of letting latency grow without bound, and
+    items whose deadline passed while queued are dropped before the model call.
+    """
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], name: str, max_batch: int = SERVE_MAX_BATCH,
+                 max_wait_ms: float = SERVE_MAX_WAIT_MS, max_queue: int = SERVE_MAX_QUEUE):
+        self.fn=fn; self.name=name; self.max_batch=max_batch; self.max_wait=max_wait_ms/1000.0; self.max_queue=max_queue
+        self.metrics=BatchMetrics()
+        self._q: Optional[asyncio.Queue]=None; self._task: Optional[asyncio.Task]=None
+        self._pool=ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"batch-{name}")
+    def start(self):
+        self._q=asyncio.Queue(maxsize=self.max_queue)
+        self._task=asyncio.get_running_loop().create_task(self._run())
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+        self._pool.shutdown(wait=False)
+    async def submit(self, item: Any, deadline: float) -> Any:
+        """Queue ``item`` and wait for its result; ``deadline`` is in ``loop.time()`` seconds."""
+        loop=asyncio.get_running_loop()
+        if self._q.full():
+            self.metrics.rejected+=1; raise Overloaded(self.name)
+        fut=loop.create_future(); self._q.put_nowait((item, deadline, fut)); self.metrics.submitted+=1
+        try:
+            return await asyncio.wait_for(fut, max(0.0, deadline-loop.time()))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(self.name) from None
+    async def _collect(self) -> list:
+        loop=asyncio.get_running_loop()
+        batch=[await self._q.get()]; end=loop.time()+self.max_wait
+        while len(batch)<self.max_batch:
+            if not self._q.empty(): batch.append(self._q.get_nowait()); continue
+            timeout=end-loop.time()
+            if timeout<=0: break
+            try: batch.append(await asyncio.wait_for(self._q.get(), timeout))
+            except asyncio.TimeoutError: break
+        return batch
+    async def _run(self):
+        loop=asyncio.get_running_loop()
+        while True:
+            batch=await self._collect(); now=loop.time(); live=[]
+            for item,deadline,fut in batch:
+                if fut.done(): continue
+                if deadline<=now:
+                    self.metrics.expired+=1; fut.set_exception(DeadlineExceeded(self.name)); continue
+                live.append((item,fut))
+            if not live: continue
+            depth=self._q.qsize(); t0=loop.time()
+            try:
+                results=await loop.run_in_executor(self._pool, self.fn, [item for item,_ in live])
+            except Exception as e:
+                self.metrics.errors+=1; logger.exception("Batch %s failed (size=%d)", self.name, len(live))
+                for _,fut in live:
+                    if not fut.done(): fut.set_exception(e)
+                continue
+            self.metrics.observe(len(live), depth, loop.time()-t0)
+            for (_,fut),r in zip(live, results):
+                if not fut.done(): fut.set_result(r)
+    def stats(self) -> Dict[str, Any]:
+        return self.metrics.to_dict(self._q.qsize() if self._q else 0)
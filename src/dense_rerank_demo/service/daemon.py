@@ -0,0 +1,107 @@
+
+"""Warm local query daemon on a Unix socket, and the thin client the CLI uses to talk to it.
+
+The daemon keeps a ``WarmModels`` (models loaded on first use, then warmed) for the life of the
+process, so a CLI query pays for interpreter start-up and one socket round trip instead of
+imports and model loading. Protocol: one JSON object per line each way.
+
+    {"op": "ping"} | {"op": "search", "config": {...}, "params": {...}} | {"op": "shutdown"}
+    -> {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+
+The client half imports only the standard library and ``config`` so that the CLI starts fast;
+a search whose ``config`` (collection, models, Qdrant target) differs from the daemon's is refused,
+and the CLI then runs in-process instead.
+"""
+import json, os, socket, socketserver, threading, time
+from typing import Any, Dict, List, Optional
+from ..config import (DAEMON_SOCKET, QDRANT_URL, QDRANT_PATH, COLLECTION, EMB_MODEL, SPARSE_MODEL, COLBERT_CKPT,
+                      DOC_STORE, COLBERT_STORE, EMB_BACKEND, COLBERT_BACKEND, MAX_CHARS)
+
+class DaemonUnavailable(OSError):
+    """No daemon is listening on the socket."""
+
+class DaemonError(RuntimeError):
+    """The daemon answered with an error."""
+
+def fingerprint() -> Dict[str, Any]:
+    """Settings a daemon's answers depend on; the client's must match the daemon's."""
+    return {"qdrant": QDRANT_PATH or QDRANT_URL, "collection": COLLECTION, "emb_model": EMB_MODEL, "emb_backend": EMB_BACKEND,
+            "sparse_model": SPARSE_MODEL, "colbert": COLBERT_CKPT, "colbert_backend": COLBERT_BACKEND,
+            "max_chars": MAX_CHARS, "doc_store": DOC_STORE, "colbert_store": COLBERT_STORE}
+
+def call(op: str, path: str = DAEMON_SOCKET, timeout: Optional[float] = 300.0, **msg) -> Any:
+    """Send one request and return its ``result``; raises ``DaemonUnavailable`` or ``DaemonError``."""
+    s=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM); s.settimeout(timeout)
+    try:
+        try: s.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError) as e: raise DaemonUnavailable(f"no daemon on {path}") from e
+        s.sendall((json.dumps({"op": op, **msg})+"\n").encode("utf-8"))
+        with s.makefile("rb") as f: line=f.readline()
+    finally:
+        s.close()
+    if not line: raise DaemonError("daemon closed the connection")
+    resp=json.loads(line)
+    if not resp.get("ok"): raise DaemonError(resp.get("error","unknown error"))
+    return resp["result"]
+
+def search(params: Dict[str, Any], path: str = DAEMON_SOCKET) -> Dict[str, Any]:
+    return call("search", path, config=fingerprint(), params=params)
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        d: "QueryDaemon"=self.server.owner
+        for line in self.rfile:
+            if not line.strip(): continue
+            try:
+                resp={"ok": True, "result": d.handle(json.loads(line))}
+            except (KeyError, TypeError, ValueError) as e:
+                resp={"ok": False, "error": f"{type(e).__name__}: {e}"}
+            except Exception as e:
+                d.logger.exception("Request failed")
+                resp={"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(resp)+"\n").encode("utf-8")); self.wfile.flush()
+
+class QueryDaemon:
+    """Serve ``WarmModels.search`` on a Unix socket; ``preload`` rerankers are loaded and warmed at start."""
+    def __init__(self, path: str = DAEMON_SOCKET, preload: Optional[List[str]] = None, cache: bool = True):
+        from .warm import WarmModels
+        from ..logging import get_logger
+        self.logger=get_logger(__name__)
+        self.path=path; self.preload=preload; self.models=WarmModels(cache=cache)
+        self.started=time.time(); self.queries=0; self._server=None
+    def handle(self, req: Dict[str, Any]) -> Any:
+        op=req.get("op")
+        if op=="ping":
+            return {"pid": os.getpid(), "uptime_s": time.time()-self.started, "queries": self.queries,
+                    "loaded_ms": dict(self.models.loaded), "config": fingerprint()}
+        if op=="search":
+            if req.get("config")!=fingerprint(): raise ValueError("config mismatch: client and daemon settings differ")
+            self.queries+=1
+            return self.models.search(**req.get("params", {}))
+        if op=="shutdown":
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {"pid": os.getpid()}
+        raise ValueError(f"unknown op: {op}")
+    def _preload(self):
+        """Load and warm models in the background; queries arriving meanwhile wait on the model they need."""
+        t0=time.time()
+        try: self.models.preload(self.preload)
+        except Exception: self.logger.exception("Preload failed"); return
+        self.logger.info("Preloaded %s in %.1fs", ", ".join(["embedder"]+self.preload), time.time()-t0)
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            try: call("ping", self.path, timeout=2.0)
+            except (OSError, DaemonError): os.unlink(self.path)  # stale socket from a crashed daemon
+            else: raise RuntimeError(f"a daemon is already listening on {self.path}")
+        old=os.umask(0o177)  # socket readable by this user only
+        try: self._server=socketserver.ThreadingUnixStreamServer(self.path, _Handler)
+        finally: os.umask(old)
+        self._server.owner=self; self._server.daemon_threads=True
+        try:
+            self.logger.info("Query daemon on %s (pid %d)", self.path, os.getpid())
+            if self.preload is not None: threading.Thread(target=self._preload, daemon=True).start()
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path): os.unlink(self.path)
+            self.logger.info("Query daemon stopped after %d queries", self.queries)
@@ -0,0 +1,119 @@
+
+"""Models and clients built on first use and kept warm, shared by the query daemon, the in-process CLI
+fallback and the Streamlit UI.
+
+Every model gets a warmup pass right after loading (one short query and document through it), so the
+first real query does not pay for lazy kernel/graph initialisation either. ``loaded`` records what
+each load cost; ``search`` reports which models a query had to load itself (a cold query).
+"""
+import threading, time
+from typing import Any, Callable, Dict, List
+from ..config import (EMB_MODEL, SPARSE_MODEL, TOPK_SHOW, CASCADE_M, CASCADE_ADAPTIVE, RERANK_MODE, FUSION, HYBRID_PREFETCH)
+from ..logging import get_logger
+logger=get_logger(__name__)
+
+_WARM_Q="warmup query"; _WARM_DOC={"id": "__warmup__", "text": "A short warmup document.", "score": 0.0}
+
+class WarmModels:
+    """Lazy, thread-safe holder of the embedder, Qdrant client, rerankers and query cache."""
+    def __init__(self, cache: bool = True, warmup: bool = True):
+        self.use_cache=cache; self.warmup=warmup
+        self.loaded: Dict[str, float]={}
+        self._objs: Dict[str, Any]={}; self._lock=threading.RLock()
+        # One query at a time: the rerankers keep per-instance caches and history that are not thread-safe.
+        self.query_lock=threading.Lock()
+    def _get(self, key: str, build: Callable[[], Any]) -> Any:
+        obj=self._objs.get(key)
+        if obj is not None: return obj
+        with self._lock:
+            if key not in self._objs:
+                t0=time.perf_counter(); self._objs[key]=build()
+                self.loaded[key]=1000*(time.perf_counter()-t0)
+                logger.info("Loaded %s in %.0f ms", key, self.loaded[key])
+            return self._objs[key]
+    def cache(self, cached: bool = True):
+        from ..cache import get_cache
+        return get_cache() if cached and self.use_cache else None
+    def client(self):
+        def build():
+            from ..qdrant.client import get_client
+            c=get_client(); c.get_collections()
+            return c
+        return self._get("qdrant", build)
+    def embedder(self, cached: bool = True):
+        def build():
+            from ..models.embedder import Embedder
+            emb=Embedder(EMB_MODEL)
+            if self.warmup: emb.encode([_WARM_Q])
+            return emb
+        from ..cache import CachedEmbedder
+        emb=self._get("embedder", build); cache=self.cache(cached)
+        return CachedEmbedder(emb, cache) if cache else emb
+    def _model(self, name: str):
+        def build():
+            from ..models.registry import make_reranker
+            rr=make_reranker(name)
+            if self.warmup: rr.rerank(_WARM_Q, [dict(_WARM_DOC)])
+            return rr
+        return self._get(name, build)
+    def reranker(self, name: str, m: int = CASCADE_M, adaptive: bool = CASCADE_ADAPTIVE, cached: bool = True):
+        """Reranker by CLI name ("none" -> None), wrapped with the query cache; a cascade is assembled
+        from the warm MiniCOIL and ColBERT models."""
+        if name=="none": return None
+        from ..cache import CachedReranker
+        if name=="cascade":
+            from ..models.reranker_cascade import CascadeReranker
+            rr=CascadeReranker(self._model("minicoil"), self._model("colbert"), m=m, adaptive=adaptive)
+        else:
+            rr=self._model(name)
+        cache=self.cache(cached)
+        return CachedReranker(rr, cache) if cache else rr
+    def sparse(self):
+        """MiniCOIL query encoder for hybrid recall."""
+        return self._model("minicoil")
+    def preload(self, names: List[str]):
+        """Load (and warm) the embedder, the Qdrant client and the rerankers ``names`` now."""
+        self.client(); self.embedder()
+        for n in names:
+            if n=="cascade": self._model("minicoil"); self._model("colbert")
+            elif n!="none": self._model(n)
+    def search(self, q: str, k: int = 100, show: int = TOPK_SHOW, reranker: str = "minicoil", rerank_mode: str = RERANK_MODE,
+               recall: str = "dense", fusion: str = FUSION, ids_only: bool = False, m: int = CASCADE_M,
+               adaptive: bool = CASCADE_ADAPTIVE, cached: bool = True) -> Dict[str, Any]:
+        """One query end to end, as ``scripts.query`` prints it: before/after hits (text hydrated) with latencies.
+
+        ``load_ms`` lists the models this call had to load (empty on a warm call)."""
+        from ..qdrant.search import retrieve_rescored, recall_fn, recall_model
+        from ..cache import cached_retrieve_dense
+        from ..data.doc_store import hydrate
+        with self.query_lock:
+            before=dict(self.loaded); t_load=time.perf_counter()
+            client=self.client(); emb=self.embedder(cached); rr=self.reranker(reranker, m=m, adaptive=adaptive, cached=cached)
+            sp=self.sparse() if recall=="hybrid" else None
+            load_ms={k_: v for k_,v in self.loaded.items() if k_ not in before}
+            cache=self.cache(cached); mode=rerank_mode if rr is not None else "text"
+            t0=time.perf_counter(); qvec=emb.encode([q])[0]
+            sv=sp.encode_query(q) if sp is not None else None
+            cands=cached_retrieve_dense(cache, recall_fn(sv, fusion), client, q, qvec, topk=k,
+                                        with_vectors=rr.vector_names if mode=="stored" else None, with_text=not ids_only,
+                                        model=recall_model(EMB_MODEL, SPARSE_MODEL if sv is not None else None, fusion),
+                                        prefetch=HYBRID_PREFETCH if sv is not None else 0)
+            t1=time.perf_counter()
+            if rr is None:
+                post=cands[:show]
+            elif mode=="server":
+                post=retrieve_rescored(client, qvec, rr.server_stages([q])[0], topk=k, limit=show, with_text=not ids_only,
+                                       sparse=sv, fusion=fusion)
+            elif mode=="stored":
+                post=rr.rerank_stored(q, cands)[:show]
+            else:
+                post=rr.rerank(q, cands)[:show]
+            t2=time.perf_counter()
+            hydrate(cands[:show]); hydrate(post)
+            # A cached rerank never reaches the cascade, so its last history entry belongs to another query.
+            hist=(rr.history[-1] if reranker=="cascade" and mode!="server" and rr.history and not getattr(rr, "last_hit", False)
+                  else None)
+        strip=lambda rows: [{k_: c.get(k_) for k_ in ("id","score","rerank_score","text") if k_ in c} for c in rows]
+        return {"before": strip(cands[:show]), "after": strip(post), "cascade": hist,
+                "cache": cache.stats() if cache else None, "load_ms": load_ms,
+                "latency_ms": {"load": 1000*(t0-t_load), "recall": 1000*(t1-t0), "rerank": 1000*(t2-t1), "total": 1000*(t2-t0)}}
@@ -0,0 +1,150 @@
+
+"""Nested timing spans with per-stage latency histograms.
+
+``span(name)`` times a block and ``traced(name)`` a function. Every span feeds a process-wide
+histogram keyed by its name (exported in Prometheus text format by ``prometheus_text``); inside
+``collect()`` the spans of the current thread are also recorded as a tree for a per-query breakdown.
+Tracing is off unless ``TRACE_ENABLED`` is set or ``enable()`` is called; while off, ``span`` returns
+a shared no-op context manager and ``traced`` costs one flag check per call.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+import functools, threading, time
+from .config import TRACE_ENABLED
+
+BUCKETS=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_NOOP=nullcontext()
+_enabled=TRACE_ENABLED
+_local=threading.local()
+_lock=threading.Lock()
+
+class Histogram:
+    """Cumulative-bucket latency histogram in seconds (Prometheus semantics)."""
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets=buckets; self.counts=[0]*(len(buckets)+1); self.sum=0.0; self.count=0
+    def observe(self, s: float):
+        self.counts[bisect_left(self.buckets, s)]+=1; self.sum+=s; self.count+=1
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound below which a fraction ``q`` of observations fall (inf past the last bucket)."""
+        if not self.count: return 0.0
+        seen=0
+        for bound,c in zip(self.buckets+(float("inf"),), self.counts):
+            seen+=c
+            if seen>=q*self.count: return bound
+        return float("inf")
+
+_hist: Dict[str, Histogram]={}
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled=on
+
+def enabled() -> bool:
+    return _enabled
+
+def reset():
+    with _lock: _hist.clear()
+
+def _record(name: str, s: float):
+    with _lock:
+        h=_hist.get(name)
+        if h is None: h=_hist[name]=Histogram()
+        h.observe(s)
+
+class _Span:
+    __slots__=("name","t0","children","ms")
+    def __init__(self, name: str):
+        self.name=name; self.children: List["_Span"]=[]; self.ms=0.0
+    def __enter__(self):
+        stack=getattr(_local, "stack", None)
+        if stack:
+            stack[-1].children.append(self); stack.append(self)
+        self.t0=time.perf_counter(); return self
+    def __exit__(self, *exc):
+        s=time.perf_counter()-self.t0; self.ms=1000*s
+        stack=getattr(_local, "stack", None)
+        if stack and stack[-1] is self: stack.pop()
+        _record(self.name, s)
+        return False
+
+def span(name: str):
+    """Context manager timing the enclosed block as stage ``name`` (a no-op while tracing is off)."""
+    return _Span(name) if _enabled else _NOOP
+
+def traced(name: str) -> Callable:
+    """Decorator form of ``span``."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            if not _enabled: return fn(*a, **kw)
+            with _Span(name): return fn(*a, **kw)
+        return inner
+    return wrap
+
+class Trace:
+    """Span tree recorded by ``collect()``; ``rows()`` flattens it to (depth, name, ms)."""
+    def __init__(self):
+        self.root=_Span("total")
+    @property
+    def total_ms(self) -> float:
+        return self.root.ms
+    def rows(self) -> List[Tuple[int, str, float]]:
+        out=[]
+        def walk(s, depth):
+            out.append((depth, s.name, s.ms))
+            for c in s.children: walk(c, depth+1)
+        walk(self.root, 0)
+        return out
+    def stages(self) -> Dict[str, float]:
+        """Total ms per span path ("total/embed", "total/rerank/colbert.maxsim", ...)."""
+        out: Dict[str, float]={}
+        def walk(s, prefix):
+            path=f"{prefix}/{s.name}" if prefix else s.name
+            out[path]=out.get(path,0.0)+s.ms
+            for c in s.children: walk(c, path)
+        walk(self.root, "")
+        return out
+    def format(self) -> str:
+        return "\n".join(f"{'  '*d}{n:<{32-2*d}} {ms:9.2f} ms" for d,n,ms in self.rows())
+
+@contextmanager
+def collect():
+    """Record spans opened on this thread inside the block; yields a ``Trace`` (empty while tracing is off)."""
+    t=Trace()
+    if not _enabled:
+        yield t; return
+    prev=getattr(_local, "stack", None); _local.stack=[t.root]
+    t.root.t0=time.perf_counter()
+    try:
+        yield t
+    finally:
+        t.root.ms=1000*(time.perf_counter()-t.root.t0); _local.stack=prev
+
+def summary() -> List[Dict[str, Any]]:
+    """Per stage: count, total/mean ms and bucketed p50/p95, slowest total first."""
+    with _lock: items=list(_hist.items())
+    rows=[{"stage": n, "count": h.count, "total_ms": 1000*h.sum, "mean_ms": 1000*h.sum/max(1,h.count),
+           "p50_ms": 1000*h.quantile(0.5), "p95_ms": 1000*h.quantile(0.95)} for n,h in items]
+    return sorted(rows, key=lambda r: -r["total_ms"])
+
+def format_summary(per: Optional[int] = None) -> str:
+    """``summary()`` as a table; with ``per`` (e.g. the number of queries) also shows mean ms per query."""
+    lines=[f"{'stage':<24} {'count':>7} {'mean ms':>9} {'p50≤':>8} {'p95≤':>8}"+(f" {'ms/query':>9}" if per else "")]
+    for r in summary():
+        lines.append(f"{r['stage']:<24} {r['count']:>7} {r['mean_ms']:>9.2f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}"
+                     +(f" {r['total_ms']/per:>9.2f}" if per else ""))
+    return "\n".join(lines)
+
+def prometheus_text(prefix: str = "dense_rerank_stage_seconds") -> str:
+    """All stage histograms in the Prometheus text exposition format."""
+    with _lock: items=sorted((n, list(h.counts), h.sum, h.count, h.buckets) for n,h in _hist.items())
+    lines=[f"# HELP {prefix} Latency of instrumented pipeline stages.", f"# TYPE {prefix} histogram"]
+    for name,counts,total,n,buckets in items:
+        cum=0
+        for b,c in zip(buckets, counts):
+            cum+=c; lines.append(f'{prefix}_bucket{{stage="{name}",le="{b:g}"}} {cum}')
+        lines.append(f'{prefix}_bucket{{stage="{name}",le="+Inf"}} {n}')
+        lines.append(f'{prefix}_sum{{stage="{name}"}} {total:.6f}')
+        lines.append(f'{prefix}_count{{stage="{name}"}} {n}')
+    return "\n".join(lines)+"\n"
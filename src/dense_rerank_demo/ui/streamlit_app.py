@@ -7,31 +7,34 @@ st.title("Dense recall → MiniCOIL / ColBERT rerank (Qdrant)")
 
 @st.cache_resource(show_spinner=False)
 def _load_services():
-    """Import and construct heavy stuff lazily so import errors surface in the UI."""
+    """Import config and the lazy model holder; each model loads (and warms) on first use, so the
+    page comes up without waiting for ColBERT and a MiniCOIL-only session never loads it."""
     try:
         # All project imports go INSIDE this function so errors are caught and shown.
         from dense_rerank_demo.config import (
-            TOPK_RECALL, TOPK_SHOW, EMB_MODEL, SPARSE_MODEL, COLBERT_CKPT, COLLECTION
+            TOPK_RECALL, TOPK_SHOW, EMB_MODEL, SPARSE_MODEL, COLBERT_CKPT, COLLECTION, CASCADE_M, HYBRID_PREFETCH
         )
-        from dense_rerank_demo.qdrant.client import get_client
-        from dense_rerank_demo.models.embedder import Embedder
-        from dense_rerank_demo.qdrant.search import retrieve_dense
-        from dense_rerank_demo.models.reranker_minicoil import MiniCOILReranker
-        from dense_rerank_demo.models.reranker_colbert import ColbertReranker
+        from dense_rerank_demo.qdrant.search import recall_fn, recall_model
+        from dense_rerank_demo.cache import cached_retrieve_dense
+        from dense_rerank_demo.service.warm import WarmModels
+        from dense_rerank_demo import trace
+        from dense_rerank_demo.data.doc_store import get_doc_store, hydrate
 
-        client = get_client()  # make sure prefer_grpc=False in client.py on your Mac
-        emb = Embedder(EMB_MODEL)
-        rr_minicoil = MiniCOILReranker(SPARSE_MODEL)
-        rr_colbert = ColbertReranker(COLBERT_CKPT)
+        models = WarmModels()  # make sure prefer_grpc=False in client.py on your Mac
 
         return {
             "cfg": dict(TOPK_RECALL=TOPK_RECALL, TOPK_SHOW=TOPK_SHOW, COLLECTION=COLLECTION,
-                        EMB_MODEL=EMB_MODEL, SPARSE_MODEL=SPARSE_MODEL, COLBERT_CKPT=COLBERT_CKPT),
-            "client": client,
-            "embedder": emb,
-            "retrieve_dense": retrieve_dense,
-            "rr_minicoil": rr_minicoil,
-            "rr_colbert": rr_colbert,
+                        EMB_MODEL=EMB_MODEL, SPARSE_MODEL=SPARSE_MODEL, COLBERT_CKPT=COLBERT_CKPT,
+                        CASCADE_M=CASCADE_M),
+            "models": models,
+            "retrieve_dense": lambda client, q, qvec, topk, with_text=True, sparse=None, fusion="rrf": cached_retrieve_dense(
+                models.cache(), recall_fn(sparse, fusion), client, q, qvec, topk=topk, with_text=with_text,
+                model=recall_model(EMB_MODEL, SPARSE_MODEL if sparse is not None else None, fusion),
+                prefetch=HYBRID_PREFETCH if sparse is not None else 0),
+            "doc_store": get_doc_store(),
+            "hydrate": hydrate,
+            "cache": models.cache(),
+            "trace": trace,
         }
     except Exception as e:
         # Surface import/initialization errors in the UI instead of a blank page.
@@ -39,24 +42,33 @@ def _load_services():
         st.exception(e)
         st.stop()
 
-svc = _load_services()  # -> dict with client, embedder, retrieve_dense, rerankers, cfg
+svc = _load_services()  # -> dict with cfg, models (lazy), retrieve_dense, cache, trace
+models = svc["models"]
 
 with st.sidebar:
     st.header("Settings")
-    reranker = st.selectbox("Reranker", ["None", "MiniCOIL", "ColBERT"])
+    recall = st.selectbox("Recall", ["Dense", "Hybrid (dense + MiniCOIL, fused in Qdrant)"])
+    fusion = st.selectbox("Fusion", ["rrf", "dbsf"]) if recall != "Dense" else "rrf"
+    reranker = st.selectbox("Reranker", ["None", "MiniCOIL", "ColBERT", "Cascade"])
     k = st.slider("Recall K (candidates)", 10, 300, int(svc["cfg"]["TOPK_RECALL"]), 10)
+    if reranker == "Cascade":
+        cascade_m = st.slider("Cascade M (ColBERT candidates)", 5, 100, int(svc["cfg"]["CASCADE_M"]), 5)
+        adaptive = st.checkbox("Adaptive K/M (from dense score gaps)", False)
     show_n = st.slider("Show top-N", 5, 20, int(svc["cfg"]["TOPK_SHOW"]), 1)
     show_text = st.checkbox("Show full text", False)
+    ids_only = st.checkbox("ID-only recall (text from local doc store)", False, disabled=svc["doc_store"] is None,
+                           help="Needs DOC_STORE built at ingest.")
+    trace_on = st.checkbox("Stage breakdown (tracing)", svc["trace"].enabled())
     st.divider()
     st.caption(f"Collection: `{svc['cfg']['COLLECTION']}`")
     st.caption(f"Embedder: `{svc['cfg']['EMB_MODEL']}`")
-    st.caption("Tip: For ColBERT on CPU, keep K ≤ 50.")
+    st.caption("Tip: For ColBERT on CPU, keep K ≤ 50, or use Cascade to run ColBERT on the MiniCOIL top-M only.")
     if st.button("Health check"):
         try:
             # collection exists?
-            coll = svc["client"].get_collection(svc["cfg"]["COLLECTION"])
+            coll = models.client().get_collection(svc["cfg"]["COLLECTION"])
             # count points
-            count = svc["client"].count(svc["cfg"]["COLLECTION"], exact=True).count
+            count = models.client().count(svc["cfg"]["COLLECTION"], exact=True).count
             st.success(f"Qdrant OK · vectors: {list(coll.config.params.vectors.items())[0][0]} · points: {count}")
         except Exception as e:
             st.error("Qdrant health check failed:")
@@ -65,21 +77,28 @@ with st.sidebar:
 q = st.text_input("Ask a question:", placeholder="e.g., Does vitamin D reduce respiratory infections?")
 if st.button("Search") and q.strip():
     try:
-        t0 = time.time()
-        qvec = svc["embedder"].encode([q])[0]  # list[float]
-        pre = svc["retrieve_dense"](svc["client"], qvec, topk=k)
-        t1 = time.time()
+        svc["trace"].enable(trace_on)
+        rr_name = {"MiniCOIL": "minicoil", "ColBERT": "colbert", "Cascade": "cascade"}.get(reranker, "none")
+        loaded_before = dict(models.loaded)
+        with st.spinner("Loading models (first use only)…"):
+            client, emb = models.client(), models.embedder()
+            rr = models.reranker(rr_name, m=cascade_m, adaptive=adaptive) if rr_name == "cascade" else models.reranker(rr_name)
+            sparse = models.sparse() if recall != "Dense" else None
+        cold = {n: ms for n, ms in models.loaded.items() if n not in loaded_before}
+        with svc["trace"].collect() as tr:
+            t0 = time.time()
+            with svc["trace"].span("recall"):
+                qvec = emb.encode([q])[0]  # list[float]
+                sv = sparse.encode_query(q) if sparse is not None else None  # needs MINICOIL_INGEST=1
+                pre = svc["retrieve_dense"](client, q, qvec, topk=k, with_text=not ids_only, sparse=sv, fusion=fusion)
+            t1 = time.time()
 
-        post = pre
-        t_r = 0.0
-        if reranker == "MiniCOIL":
-            t2 = time.time()
-            post = svc["rr_minicoil"].rerank(q, pre)
-            t3 = time.time(); t_r = (t3 - t2) * 1000.0
-        elif reranker == "ColBERT":
-            t2 = time.time()
-            post = svc["rr_colbert"].rerank(q, pre)
-            t3 = time.time(); t_r = (t3 - t2) * 1000.0
+            post = pre
+            t_r = 0.0
+            if rr is not None:
+                t2 = time.time()
+                with svc["trace"].span("rerank"): post = rr.rerank(q, pre)
+                t3 = time.time(); t_r = (t3 - t2) * 1000.0
 
         recall_ms = (t1 - t0) * 1000.0
         total_ms = recall_ms + t_r
@@ -89,6 +108,23 @@ if st.button("Search") and q.strip():
         c1.metric("Recall (ms)", f"{recall_ms:.1f}")
         c2.metric("Rerank (ms)", f"{t_r:.1f}")
         c3.metric("Total (ms)", f"{total_ms:.1f}")
+        if cold:
+            st.caption("Cold start: loaded " + " · ".join(f"{n} {ms:.0f} ms" for n, ms in cold.items())
+                       + " (later searches reuse the warm models)")
+        if reranker == "Cascade" and getattr(rr, "last_hit", False):
+            st.caption("Cascade: served from the cache (no K/M for this query)")
+        elif reranker == "Cascade" and rr.history:
+            h = rr.history[-1]
+            st.caption(f"Cascade: K={h['k']} → M={h['m']} · MiniCOIL {h['minicoil_ms']:.1f} ms · "
+                       f"ColBERT {h['colbert_ms']:.1f} ms")
+        if svc["cache"]:
+            s = svc["cache"].stats()
+            st.caption(f"Cache: {s['hits']} hits ({s['disk_hits']} from disk) · {s['misses']} misses · "
+                       f"hit rate {s['hit_rate']:.0%} · {s['size']} entries")
+        if trace_on:
+            with st.expander("Stage breakdown", expanded=True):
+                st.dataframe([{"stage": "  " * d + n, "ms": round(ms, 2)} for d, n, ms in tr.rows()],
+                             hide_index=True, use_container_width=True)
 
         def fmt(rows):
             out = []
@@ -98,8 +134,9 @@ if st.button("Search") and q.strip():
                 out.append(f"{i:2d}. ({r['score']:.3f}) — {snip}")
             return "\n".join(out) if out else "(no results)"
 
+        svc["hydrate"](pre[:show_n]); svc["hydrate"](post[:show_n])
         col1, col2 = st.columns(2)
-        col1.markdown("#### Before (dense recall)")
+        col1.markdown(f"#### Before ({'dense' if recall == 'Dense' else 'hybrid ' + fusion} recall)")
         col1.code(fmt(pre), language="text")
 
         title = "After (reranked: **None**)" if reranker == "None" else f"After (reranked: **{reranker}**)"
@@ -0,0 +1,39 @@
+from dense_rerank_demo.cache import CachedReranker, QueryCache
+
+class _Reranker:
+    """Text and stored modes score differently, like a reranker reading quantized stored vectors."""
+    model_name="fake"; backend="torch"
+    def _score(self, cands, offset):
+        out=[dict(c, rerank_score=float(i)+offset) for i,c in enumerate(cands)]
+        return sorted(out, key=lambda c: -c["rerank_score"])
+    def rerank(self, query, cands): return self._score(cands, 0.0)
+    def rerank_stored(self, query, cands): return self._score(cands, 0.5)
+    def rerank_batch(self, queries, lists, stored=False): return [self._score(cs, 0.5 if stored else 0.0) for cs in lists]
+
+def test_cached_reranker_keys_text_and_stored_separately():
+    rr=CachedReranker(_Reranker(), QueryCache(), collection="test")
+    cands=[{"id": str(i), "text": f"doc {i}", "score": 0.0} for i in range(3)]
+    text=[c["rerank_score"] for c in rr.rerank("q", [dict(c) for c in cands])]
+    stored=[c["rerank_score"] for c in rr.rerank_stored("q", [dict(c) for c in cands])]
+    assert text==[2.0, 1.0, 0.0] and stored==[2.5, 1.5, 0.5]
+    batch=rr.rerank_batch(["q","q"], [[dict(c) for c in cands]]*2, stored=True)
+    assert [c["rerank_score"] for c in batch[0]]==stored
+    assert [c["rerank_score"] for c in rr.rerank("q", [dict(c) for c in cands])]==text
+
+def test_cached_retrieve_dense_keys_prefetch_depth():
+    from dense_rerank_demo.cache import cached_retrieve_dense
+    calls=[]
+    def retrieve(client, qvec, topk, with_vectors=None, with_text=True):
+        calls.append(topk); return [{"id": "1", "score": 1.0}]
+    cache=QueryCache()
+    for prefetch in (0, 0, 50, 50):
+        cached_retrieve_dense(cache, retrieve, None, "q", [0.0], topk=10, collection="test", prefetch=prefetch)
+    assert len(calls)==2
+
+def test_cached_reranker_flags_hits():
+    rr=CachedReranker(_Reranker(), QueryCache(), collection="test")
+    cands=[{"id": str(i), "score": 0.0} for i in range(3)]
+    rr.rerank("q", [dict(c) for c in cands]); assert not rr.last_hit
+    rr.rerank("q", [dict(c) for c in cands]); assert rr.last_hit
+    rr.rerank_batch(["q", "other"], [[dict(c) for c in cands]]*2); assert not rr.last_hit
+    rr.rerank_batch(["q", "other"], [[dict(c) for c in cands]]*2); assert rr.last_hit
@@ -0,0 +1,30 @@
+import math
+from dense_rerank_demo.cache import CachedReranker, QueryCache
+from dense_rerank_demo.models.reranker_cascade import CascadeReranker
+
+class _Stage:
+    """Scores candidates by a fixed function of their id, like a reranker that ignores the query."""
+    vector_names=[]
+    def __init__(self, name, fn): self.model_name=name; self.fn=fn
+    def rerank(self, query, cands):
+        for c in cands: c["rerank_score"]=self.fn(int(c["id"]))
+        return sorted(cands, key=lambda c: -c["rerank_score"])
+    rerank_stored=rerank
+    def rerank_batch(self, queries, lists, stored=False): return [self.rerank(q, cs) for q,cs in zip(queries, lists)]
+
+def _cands():
+    # A 0.2 score drop after 20 candidates: adaptive depth cuts K there.
+    return [{"id": str(i), "text": f"doc {i}", "score": 0.9-0.001*i-(0.2 if i>=20 else 0.0)} for i in range(40)]
+
+def test_adaptive_cascade_through_query_cache():
+    cascade=CascadeReranker(_Stage("mc", lambda i: float(i)), _Stage("cb", lambda i: -float(i)), m=10, adaptive=True)
+    rr=CachedReranker(cascade, QueryCache(), collection="test")
+    out=rr.rerank("q", _cands())
+    assert len(out)==40 and cascade.history[-1]["k"]==20
+    assert [c["id"] for c in out[20:]]==[str(i) for i in range(20, 40)]
+    assert all(math.isinf(c["rerank_score"]) and c["rerank_score"]<0 for c in out[20:])
+    assert all(math.isfinite(c["rerank_score"]) for c in out[:20])
+    again=rr.rerank("q", _cands())
+    assert [c["id"] for c in again]==[c["id"] for c in out]
+    batch=rr.rerank_batch(["q2","q2"], [_cands(), _cands()])
+    assert all(len(b)==40 for b in batch)
@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import pytest
+pytest.importorskip("qdrant_client"); pytest.importorskip("tqdm")
+from qdrant_client import QdrantClient
+from dense_rerank_demo.qdrant import index
+
+class _FakeEncoder:
+    def __init__(self, dense=True, colbert=False, minicoil=False): pass
+    def dims(self): return 4, None
+    def encode(self, texts): return np.ones((len(texts),4),np.float32), None, None
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(index, "DocEncoder", _FakeEncoder)
+    return QdrantClient(":memory:")
+
+def _corpus(n):
+    return {f"d{i}": {"title": "", "text": f"document {i}"} for i in range(n)}
+
+def test_select_is_stable_under_corpus_growth(monkeypatch):
+    monkeypatch.setattr(index, "MAX_DOCS", 50)
+    a={d for d,_ in index._select(_corpus(200))}; b={d for d,_ in index._select(_corpus(201))}
+    assert len(a)==50 and len(a-b)<=1
+    assert [d for d,_ in index._select(_corpus(200))]==[d for d,_ in index._select(dict(reversed(list(_corpus(200).items()))))]
+
+def test_shadow_builds_back_to_back_keep_alias(client):
+    for _ in range(2): index.index_corpus_shadow(client, _corpus(30), with_colbert=False, with_minicoil=False, workers=0)
+    assert client.count(index.COLLECTION).count==30
+    assert len([c for c in client.get_collections().collections if c.name.startswith(index.COLLECTION+"__")])==1
+
+def test_incremental_without_manifest_checks_vector_config(client):
+    index.index_corpus_dense(client, _corpus(30), with_colbert=False, with_minicoil=False, workers=0)
+    os.remove(index._manifest_path())
+    with pytest.raises(RuntimeError, match="other vectors"):
+        index.index_corpus_incremental(client, _corpus(30), with_colbert=False, with_minicoil=True, workers=0)
+    corpus=_corpus(31); corpus["d0"]={"title": "", "text": "changed"}
+    counts=index.index_corpus_incremental(client, corpus, with_colbert=False, with_minicoil=False, workers=0)
+    assert (counts["new"], counts["changed"], counts["unchanged"])==(1, 1, 29)
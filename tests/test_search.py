@@ -0,0 +1,33 @@
+import pytest
+pytest.importorskip("qdrant_client")
+from qdrant_client import QdrantClient, models as qm
+from dense_rerank_demo.qdrant import search
+
+@pytest.fixture
+def client():
+    c=QdrantClient(":memory:")
+    c.create_collection(search.COLLECTION, vectors_config={"dense": qm.VectorParams(size=3, distance=qm.Distance.COSINE)})
+    c.upsert(search.COLLECTION, points=[qm.PointStruct(id=i, vector={"dense": [1.0, float(i), 0.5]},
+                                                       payload={"doc_id": str(i), "text": f"doc {i}"}) for i in range(5)])
+    return c
+
+def test_retrieve_dense(client):
+    hits=search.retrieve_dense(client, [1.0, 2.0, 0.5], topk=2)
+    assert [h["id"] for h in hits]==["2","3"] and hits[0]["text"]=="doc 2"
+    hits=search.retrieve_dense(client, [1.0, 2.0, 0.5], topk=1, with_vectors=["dense"], with_text=False)
+    assert hits[0]["text"] is None and len(hits[0]["dense"])==3
+
+def test_retrieve_dense_batch_matches_single(client):
+    qs=[[1.0, 2.0, 0.5], [1.0, 0.0, 0.5]]
+    assert search.retrieve_dense_batch(client, qs, topk=3)==[search.retrieve_dense(client, q, topk=3) for q in qs]
+
+def test_retrieve_dense_async_matches_sync(client):
+    import asyncio
+    from qdrant_client import AsyncQdrantClient
+    async def run():
+        ac=AsyncQdrantClient(":memory:")
+        await ac.create_collection(search.COLLECTION, vectors_config={"dense": qm.VectorParams(size=3, distance=qm.Distance.COSINE)})
+        await ac.upsert(search.COLLECTION, points=[qm.PointStruct(id=i, vector={"dense": [1.0, float(i), 0.5]},
+                                                                  payload={"doc_id": str(i), "text": f"doc {i}"}) for i in range(5)])
+        return await search.retrieve_dense_async(ac, [1.0, 2.0, 0.5], topk=3)
+    assert asyncio.run(run())==search.retrieve_dense(client, [1.0, 2.0, 0.5], topk=3)
@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+pytest.importorskip("aiohttp"); pytest.importorskip("qdrant_client")
+from aiohttp.test_utils import TestClient, TestServer
+from dense_rerank_demo.service.app import make_app
+
+class _Service:
+    """Stands in for ``SearchService``; its "broken" reranker fails inside the search."""
+    rerank={"colbert": None, "broken": None}
+    class client:
+        @staticmethod
+        async def close(): pass
+    async def start(self): pass
+    async def stop(self): pass
+    async def search(self, q, k, show, reranker, timeout_ms):
+        if reranker=="broken": {}["not_there"]
+        return {"q": q, "k": k, "show": show, "reranker": reranker}
+
+def _post(*bodies):
+    async def run():
+        async with TestClient(TestServer(make_app(_Service()))) as c:
+            out=[]
+            for b in bodies:
+                r=await (c.post("/search", data=b) if isinstance(b, str) else c.post("/search", json=b))
+                out.append((r.status, await r.json() if r.status!=500 else None))
+            return out
+    return asyncio.run(run())
+
+def test_search_validates_request_and_keeps_server_errors_500():
+    res=_post({"q": " hi ", "k": 5, "reranker": "ColBERT"}, "not json", {"k": 5}, {"q": "x", "k": "5"},
+              {"q": "x", "k": 2.5}, {"q": "x", "reranker": "nope"}, {"q": "x", "timeout_ms": -1}, {"q": "x", "reranker": "broken"})
+    assert res[0][0]==200 and res[0][1]["q"]=="hi" and res[0][1]["k"]==5 and res[0][1]["reranker"]=="colbert"
+    assert [s for s,_ in res[1:7]]==[400]*6 and "unknown reranker" in res[5][1]["error"]
+    assert res[7][0]==500
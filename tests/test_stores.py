@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from dense_rerank_demo.models.colbert_store import ColbertStore, ColbertStoreWriter
+
+def _toks(n, dim=8, seed=0):
+    return [np.random.default_rng(seed+i).standard_normal((3+i, dim)).astype(np.float32) for i in range(n)]
+
+def test_colbert_store_resumes_interrupted_spool(tmp_path):
+    path=str(tmp_path/"cs"); mats=_toks(3)
+    ColbertStoreWriter(path, 8, mode="fp16").add(["a","b","c"], mats)
+    w=ColbertStoreWriter(path, 8, mode="fp16", resume_docs=2)
+    assert w.n_docs==2
+    w.add(["d"], _toks(1, seed=7)); w.finalize()
+    store=ColbertStore(path)
+    assert len(store)==3 and "c" not in store
+    out,mask=store.decode(["a","b"])
+    np.testing.assert_allclose(out[1][mask[1]], mats[1].astype(np.float16), rtol=1e-3)
+
+def test_colbert_store_resume_after_finalize_keeps_store(tmp_path):
+    path=str(tmp_path/"cs")
+    w=ColbertStoreWriter(path, 8, mode="fp16"); w.add(["a","b"], _toks(2)); w.finalize()
+    with pytest.raises(RuntimeError): ColbertStoreWriter(path, 8, mode="fp16", resume_docs=2)
+    ColbertStoreWriter(path, 8, mode="fp16").finalize()  # nothing added
+    assert len(ColbertStore(path))==2
+
+def test_doc_store_resume_after_finalize_keeps_text(tmp_path):
+    from dense_rerank_demo.data.doc_store import DocStore, DocStoreWriter
+    path=str(tmp_path/"ds")
+    w=DocStoreWriter(path); w.add(["a","b","c"], ["alpha","béta",""]); w.finalize()
+    with pytest.raises(RuntimeError): DocStoreWriter(path, resume_docs=3)
+    assert DocStore(path).get(["b","a","x"])==["béta","alpha",None]
+    w=DocStoreWriter(path); w.add(["a","b"], ["one","two"])
+    w=DocStoreWriter(path, resume_docs=1); w.add(["z"], ["zed"]); w.finalize()
+    assert DocStore(path).get(["a","b","z"])==["one",None,"zed"]
+
+class _FakeEncoder:
+    def __init__(self, dense=True, colbert=False, minicoil=False): pass
+    def dims(self): return 4, 4
+    def encode(self, texts):
+        return np.ones((len(texts),4),np.float32), [np.ones((2,4),np.float32) for _ in texts], None
+
+def test_stream_ingest_rerun_after_completed_run_rebuilds(tmp_path, monkeypatch):
+    import functools
+    pytest.importorskip("qdrant_client"); pytest.importorskip("tqdm")
+    from qdrant_client import QdrantClient
+    from dense_rerank_demo.qdrant import index
+    from dense_rerank_demo.data.doc_store import DocStore
+    monkeypatch.chdir(tmp_path)
+    ds,cs=str(tmp_path/"ds"),str(tmp_path/"cs")
+    monkeypatch.setattr(index, "DocEncoder", _FakeEncoder)
+    monkeypatch.setattr(index, "_Encoders", functools.partial(index._Encoders, doc_store=ds, colbert_store=cs))
+    monkeypatch.setattr(index, "MAX_DOCS", 0)
+    client=QdrantClient(":memory:")
+    docs=[(str(i), {"title": f"t{i}", "text": f"document {i}"}) for i in range(40)]
+    for _ in range(2):
+        index.index_corpus_stream(client, docs, workers=0)
+        assert len(DocStore(ds))==40 and len(ColbertStore(cs))==40
+        assert client.count(index.COLLECTION).count==40
+    assert DocStore(ds).get(["7"])==["t7 document 7"]